@@ -1,6 +1,6 @@
 import os
 import logging
-from flask import Flask, request
+from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
@@ -15,24 +15,25 @@ from .models import db, bcrypt
 
 # Import auth utils
 from .routes.auth import is_token_blacklisted
+from .utils.access_log import init_access_log
 
 def create_app():
     app = Flask(__name__)
     
-    # Configure logging for debug mode
+    # Configure logging (LOG_LEVEL=DEBUG for development)
+    log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
     logging.basicConfig(
-        level=logging.DEBUG,
+        level=log_level,
         format='%(asctime)s %(levelname)s %(name)s %(message)s'
     )
-    app.logger.setLevel(logging.DEBUG)
+    app.logger.setLevel(log_level)
     
-    # Log all incoming requests
-    @app.before_request
-    def log_request_info():
-        app.logger.debug('Request: %s %s', request.method, request.url)
-        app.logger.debug('Headers: %s', dict(request.headers))
-        if request.get_data():
-            app.logger.debug('Body: %s', request.get_data())
+    # One JSON access log line per request: all errors and slow requests, a sample of the rest.
+    # Small JSON/form bodies are included only when ACCESS_LOG_BODY_MAX_BYTES is set
+    app.config['ACCESS_LOG_ENABLED'] = os.getenv('ACCESS_LOG_ENABLED', 'True').lower() == 'true'
+    app.config['ACCESS_LOG_SAMPLE_RATE'] = float(os.getenv('ACCESS_LOG_SAMPLE_RATE', '1.0'))
+    app.config['ACCESS_LOG_SLOW_MS'] = int(os.getenv('ACCESS_LOG_SLOW_MS', '1000'))
+    app.config['ACCESS_LOG_BODY_MAX_BYTES'] = int(os.getenv('ACCESS_LOG_BODY_MAX_BYTES', '0'))
     
     CORS(app)
     CORS(app, resources={r"/api/*": {"origins": ["http://localhost", "http://localhost:3000", "http://localhost:80","http://localhost:8080", "http://dechivo.com", "https://dechivo.com", "http://splash25-frontend:8080", "http://frontend:8080"]}})
@@ -46,6 +47,37 @@ def create_app():
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'dev-secret-key')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 3600  # 1 hour
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = 2592000  # 30 days
+    app.config['JWT_BLOCKLIST_BACKEND'] = os.getenv('JWT_BLOCKLIST_BACKEND', 'database')  # 'database' or 'memory'
+    app.config['JWT_BLOCKLIST_SYNC_SECONDS'] = int(os.getenv('JWT_BLOCKLIST_SYNC_SECONDS', '5'))
+    
+    # Configure email (queued in the email_outbox table and sent by a background worker)
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', '465'))
+    app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', 'True').lower() == 'true'
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
+    app.config['EMAIL_WORKER_ENABLED'] = os.getenv('EMAIL_WORKER_ENABLED', 'True').lower() == 'true'
+    app.config['EMAIL_BATCH_SIZE'] = int(os.getenv('EMAIL_BATCH_SIZE', '50'))
+    
+    # System settings are cached per process and re-checked for changes by other workers this often
+    app.config['SYSTEM_SETTINGS_CHECK_SECONDS'] = int(os.getenv('SYSTEM_SETTINGS_CHECK_SECONDS', '5'))
+    
+    # Admin dashboard counts: 'live' aggregate query or trigger-maintained 'counters' table, cached for a few seconds
+    app.config['DASHBOARD_STATS_SOURCE'] = os.getenv('DASHBOARD_STATS_SOURCE', 'live')
+    app.config['DASHBOARD_STATS_TTL_SECONDS'] = int(os.getenv('DASHBOARD_STATS_TTL_SECONDS', '10'))
+    
+    # Disabling meetings cancels pending ones in the request, or in the background (in batches) above this many
+    app.config['MEETING_EXPIRY_ASYNC_THRESHOLD'] = int(os.getenv('MEETING_EXPIRY_ASYNC_THRESHOLD', '5000'))
+    app.config['MEETING_EXPIRY_BATCH_SIZE'] = int(os.getenv('MEETING_EXPIRY_BATCH_SIZE', '1000'))
+    
+    # Uploaded images are re-encoded and sent to external storage by this many background threads
+    app.config['IMAGE_UPLOAD_WORKERS'] = int(os.getenv('IMAGE_UPLOAD_WORKERS', '4'))
+    app.config['EXTERNAL_STORAGE_POOL_SIZE'] = int(os.getenv('EXTERNAL_STORAGE_POOL_SIZE', '10'))
+    
+    # Requests with a larger body are refused before anything is read; uploaded files are
+    # spooled to UPLOAD_SPOOL_DIR (system temp dir by default) until they are processed
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024)))
+    app.config['UPLOAD_SPOOL_DIR'] = os.getenv('UPLOAD_SPOOL_DIR') or None
     
     # Initialize extensions
     db.init_app(app)
@@ -53,6 +85,8 @@ def create_app():
     jwt = JWTManager(app)
     migrate = Migrate(app, db)
     
+    init_access_log(app)
+    
     # Register token blacklist loader
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
@@ -63,6 +97,7 @@ def create_app():
     from .routes.health import health_bp
     from .routes.stall import stall
     from .routes.stall_types import stall_types
+    from .routes.uploads import uploads
     
     app.register_blueprint(main)
     app.register_blueprint(auth)
@@ -75,14 +110,24 @@ def create_app():
     app.register_blueprint(buyers)
     app.register_blueprint(stall)
     app.register_blueprint(stall_types)
+    app.register_blueprint(uploads)
     app.register_blueprint(health_bp, url_prefix='/api')
     
-    # Create database tables (only if database is available)
-    with app.app_context():
-        try:
-            db.create_all()
-        except Exception as e:
-            # Database not available - this is fine for testing configuration
-            app.logger.warning(f"Database not available during initialization: {e}")
+    @app.errorhandler(413)
+    def request_too_large(e):
+        return jsonify({'error': f"Request exceeds the {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)}MB upload limit"}), 413
+    
+    # Register CLI commands
+    from .utils.email_worker import email_worker_command
+    from .utils.booking import reconcile_meeting_quotas_command
+    app.cli.add_command(email_worker_command)
+    app.cli.add_command(reconcile_meeting_quotas_command)
+    
+    # Tables are created by `flask init-db` (run by docker-entrypoint.sh), not on every app start
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create any missing database tables."""
+        db.create_all()
+        print('Database tables created/verified')
     
     return app
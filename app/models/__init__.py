@@ -3,7 +3,7 @@ from .models import (
     UserRole, MeetingStatus, ListingStatus,
     TravelPlan, Transportation, Accommodation, GroundTransportation,
     Meeting, Listing, ListingDate, User, InvitedBuyer, PendingBuyer, DomainRestriction,
-    SellerProfile, BuyerProfile, SystemSetting, TimeSlot, Stall,
+    SellerProfile, BuyerProfile, SystemSetting, RevokedToken, EmailOutbox, DashboardCounter, MeetingDayCount, ImageUpload, TimeSlot, Stall,
     BuyerCategory, PropertyType, Interest, StallType, StallInventory, HostProperty, TransportType,
     SellerAttendee, SellerBusinessInfo, SellerFinancialInfo, SellerReferences,
     BuyerBusinessInfo, BuyerFinancialInfo, BuyerReferences,
@@ -15,7 +15,7 @@ __all__ = [
     'UserRole', 'MeetingStatus', 'ListingStatus',
     'TravelPlan', 'Transportation', 'Accommodation', 'GroundTransportation',
     'Meeting', 'Listing', 'ListingDate', 'User', 'InvitedBuyer', 'PendingBuyer', 'DomainRestriction',
-    'SellerProfile', 'BuyerProfile', 'SystemSetting', 'TimeSlot', 'Stall',
+    'SellerProfile', 'BuyerProfile', 'SystemSetting', 'RevokedToken', 'EmailOutbox', 'DashboardCounter', 'MeetingDayCount', 'ImageUpload', 'TimeSlot', 'Stall',
     'BuyerCategory', 'PropertyType', 'Interest', 'StallType', 'StallInventory', 'HostProperty', 'TransportType',
     'SellerAttendee', 'SellerBusinessInfo', 'SellerFinancialInfo', 'SellerReferences',
     'BuyerBusinessInfo', 'BuyerFinancialInfo', 'BuyerReferences',
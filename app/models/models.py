@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from sqlalchemy.orm import joinedload, selectinload, configure_mappers
 from datetime import datetime
 import enum
 
@@ -199,6 +200,9 @@ class User(db.Model):
             if hasattr(self, key):
                 setattr(self, key, value)
     
+    def set_password(self, password):
+        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+    
     def check_password(self, password):
         return bcrypt.check_password_hash(self.password_hash, password)
     
@@ -315,8 +319,8 @@ class SellerProfile(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     business_name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    seller_type = db.Column(db.String(200), nullable=True)
-    target_market = db.Column(db.String(200), nullable=True)
+    seller_type = db.Column(db.String(200), nullable=True, index=True)
+    target_market = db.Column(db.String(200), nullable=True, index=True)
     
     # Contact Information
     contact_email = db.Column(db.String(100), nullable=True)
@@ -448,6 +452,11 @@ class Stall(db.Model):
 
 class Meeting(db.Model):
     __tablename__ = 'meetings'
+    __table_args__ = (
+        # A time slot can hold only one meeting that is not rejected or cancelled
+        db.Index('uq_meetings_active_time_slot', 'time_slot_id', unique=True,
+                 postgresql_where=db.text("status IN ('PENDING', 'ACCEPTED', 'COMPLETED')")),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     buyer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -502,9 +511,41 @@ class Meeting(db.Model):
             'attendee': self.attendee.to_dict() if self.attendee else None,
             'time_slot': self.time_slot.to_dict() if self.time_slot else []
         }
+    
+    @staticmethod
+    def serialization_options():
+        """Loader options that fetch everything to_dict() touches in a fixed number of queries.
+        
+        Participants, time slot and attendee are joined into the meeting query;
+        buyer and seller profiles are loaded with one extra query each.
+        """
+        # Backref attributes such as User.buyer_profile exist only once mappers are configured
+        configure_mappers()
+        return [
+            joinedload(Meeting.buyer).selectinload(User.buyer_profile),
+            joinedload(Meeting.seller).selectinload(User.seller_profile),
+            joinedload(Meeting.requestor),
+            joinedload(Meeting.time_slot),
+            joinedload(Meeting.attendee)
+        ]
+    
+    @classmethod
+    def to_dict_many(cls, meetings):
+        """Serialize a list of meetings, batch-loading their relationships first.
+        
+        Produces the same output as calling to_dict() on each meeting.
+        """
+        meeting_ids = [m.id for m in meetings]
+        if meeting_ids:
+            # Populates the relationships of the already-loaded instances in the identity map
+            cls.query.options(*cls.serialization_options()).filter(cls.id.in_(meeting_ids)).all()
+        return [m.to_dict() for m in meetings]
 
 class TimeSlot(db.Model):
     __tablename__ = 'time_slots'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'start_time', name='uq_time_slots_user_start'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -544,6 +585,110 @@ class SystemSetting(db.Model):
             'description': self.description
         }
 
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    
+    jti = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'jti': self.jti,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(36), nullable=True, index=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    text_body = db.Column(db.Text, nullable=False)
+    html_body = db.Column(db.Text, nullable=True)
+    # Login details for this user are issued by the worker when the email is sent (never stored here)
+    credentials_user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'recipient': self.recipient,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+class DashboardCounter(db.Model):
+    __tablename__ = 'dashboard_counters'
+    
+    # Maintained by the triggers in db-migration-add-dashboard-counters.sql
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'value': self.value,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class MeetingDayCount(db.Model):
+    __tablename__ = 'meeting_day_counts'
+    
+    # Meetings holding a time slot per participant and day, maintained by app/utils/booking.py
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    meetings = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'day': self.day.isoformat(),
+            'meetings': self.meetings
+        }
+
+class ImageUpload(db.Model):
+    __tablename__ = 'image_uploads'
+    
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # seller_images, seller_logo, buyer_profile
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, processing, done, failed
+    file_count = db.Column(db.Integer, nullable=False, default=1)
+    replace_existing = db.Column(db.Boolean, nullable=False, default=False)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'kind': self.kind,
+            'status': self.status,
+            'file_count': self.file_count,
+            'replace_existing': self.replace_existing,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
 class TravelPlan(db.Model):
     __tablename__ = 'travel_plans'
     
@@ -575,6 +720,33 @@ class TravelPlan(db.Model):
             'accommodation': self.accommodation.to_dict() if self.accommodation else None,
             'ground_transportation': self.ground_transportation.to_dict() if self.ground_transportation else None
         }
+    
+    @staticmethod
+    def serialization_options():
+        """Loader options that fetch everything to_dict() touches in a fixed number of queries.
+        
+        Transportation, ground transportation with its vehicle types and the
+        accommodation with its property and buyer are all to-one, so they are
+        joined into the plan query; buyer profiles take one extra query.
+        """
+        configure_mappers()
+        return [
+            joinedload(TravelPlan.transportation),
+            joinedload(TravelPlan.ground_transportation).joinedload(GroundTransportation.pickup_transport),
+            joinedload(TravelPlan.ground_transportation).joinedload(GroundTransportation.dropoff_transport),
+            joinedload(TravelPlan.accommodation).options(*Accommodation.serialization_options())
+        ]
+    
+    @classmethod
+    def itineraries(cls, user_ids=None):
+        """Travel plans of the given users (all users when None), ready for to_dict().
+        
+        Plans are ordered by user, then by creation time.
+        """
+        query = cls.query.options(*cls.serialization_options())
+        if user_ids is not None:
+            query = query.filter(cls.user_id.in_(user_ids))
+        return query.order_by(cls.user_id, cls.created_at, cls.id).all()
 
 class Transportation(db.Model):
     __tablename__ = 'transportation'
@@ -680,6 +852,16 @@ class Accommodation(db.Model):
                 'organization': self.buyer.buyer_profile.organization if self.buyer and self.buyer.buyer_profile else None
             } if self.buyer else None
         }
+    
+    @staticmethod
+    def serialization_options():
+        """Loader options for everything to_dict() touches: the property and buyer
+        are joined in, buyer profiles take one extra query"""
+        configure_mappers()
+        return [
+            joinedload(Accommodation.host_property),
+            joinedload(Accommodation.buyer).selectinload(User.buyer_profile)
+        ]
 
 class GroundTransportation(db.Model):
     __tablename__ = 'ground_transportation'
@@ -688,17 +870,21 @@ class GroundTransportation(db.Model):
     travel_plan_id = db.Column(db.Integer, db.ForeignKey('travel_plans.id'), nullable=False)
     
     # Pickup details
-    pickup_location = db.Column(db.String(200), nullable=False)
-    pickup_datetime = db.Column(db.DateTime, nullable=False)
+    pickup_location = db.Column(db.String(200), nullable=True)
+    pickup_datetime = db.Column(db.DateTime, nullable=True)
     pickup_vehicle_type = db.Column(db.Integer, db.ForeignKey('transport_types.transport_type_id'), nullable=True)
     pickup_driver_contact = db.Column(db.String(50), nullable=True)
     
     # Dropoff details
-    dropoff_location = db.Column(db.String(200), nullable=False)
-    dropoff_datetime = db.Column(db.DateTime, nullable=False)
+    dropoff_location = db.Column(db.String(200), nullable=True)
+    dropoff_datetime = db.Column(db.DateTime, nullable=True)
     dropoff_vehicle_type = db.Column(db.Integer, db.ForeignKey('transport_types.transport_type_id'), nullable=True)
     dropoff_driver_contact = db.Column(db.String(50), nullable=True)
     
+    # Shared vehicle the buyer was pooled into by the transfer scheduler
+    pickup_group = db.Column(db.String(64), nullable=True)
+    dropoff_group = db.Column(db.String(64), nullable=True)
+    
     # Relationships
     pickup_transport = db.relationship('TransportType', foreign_keys=[pickup_vehicle_type], backref=db.backref('pickup_ground_transportations', lazy=True))
     dropoff_transport = db.relationship('TransportType', foreign_keys=[dropoff_vehicle_type], backref=db.backref('dropoff_ground_transportations', lazy=True))
@@ -712,14 +898,16 @@ class GroundTransportation(db.Model):
                 'datetime': self.pickup_datetime.isoformat() if self.pickup_datetime else None,
                 'vehicle_type_id': self.pickup_vehicle_type,
                 'vehicle_type': self.pickup_transport.to_dict() if self.pickup_transport else None,
-                'driver_contact': self.pickup_driver_contact
+                'driver_contact': self.pickup_driver_contact,
+                'group': self.pickup_group
             },
             'dropoff': {
                 'location': self.dropoff_location,
                 'datetime': self.dropoff_datetime.isoformat() if self.dropoff_datetime else None,
                 'vehicle_type_id': self.dropoff_vehicle_type,
                 'vehicle_type': self.dropoff_transport.to_dict() if self.dropoff_transport else None,
-                'driver_contact': self.dropoff_driver_contact
+                'driver_contact': self.dropoff_driver_contact,
+                'group': self.dropoff_group
             }
         }
 
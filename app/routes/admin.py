@@ -1,13 +1,21 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import pandas as pd
 import re
 import secrets
 from datetime import datetime, timedelta
 from ..utils.auth import admin_required
-from ..models import db, User, UserRole, InvitedBuyer, PendingBuyer, DomainRestriction, Meeting, Listing, SellerProfile, BuyerProfile, BuyerCategory, HostProperty, TravelPlan, Accommodation, TransportType, SellerFinancialInfo
+from ..models import db, User, UserRole, InvitedBuyer, PendingBuyer, DomainRestriction, Meeting, Listing, SellerProfile, BuyerProfile, BuyerCategory, HostProperty, TravelPlan, Accommodation, TransportType, SellerFinancialInfo, EmailOutbox
 from sqlalchemy import func
-from ..utils.email_service import send_invitation_email, send_approval_email, send_rejection_email
+from sqlalchemy.orm import selectinload, joinedload
+from ..utils.email_service import send_invitation_email, send_approval_email, send_rejection_email, new_email_job_id
+from ..utils.invite_import import import_invites
+from ..utils.system_settings import get_setting, get_date_setting
+from ..utils.dashboard_stats import get_dashboard_stats, format_system_stats, count_dashboard_stats
+from ..utils.accommodation import (
+    allocate_accommodations, AllocationError, lock_host_properties, allocation_counts,
+    room_usage, refresh_property_usage, auto_assign_rooms
+)
+from ..utils.ground_transport import schedule_transfers, DEFAULT_WINDOW_MINUTES, DEFAULT_DEPARTURE_BUFFER_MINUTES
 
 admin = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -18,25 +26,13 @@ def dashboard():
     Endpoint for admin dashboard data with real database queries
     """
     try:
-        # Get real user statistics
-        total_users = User.query.count()
-        
-        # Count users by role
-        buyer_count = User.query.filter_by(role=UserRole.BUYER.value).count()
-        seller_count = User.query.filter_by(role=UserRole.SELLER.value).count()
-        admin_count = User.query.filter_by(role=UserRole.ADMIN.value).count()
-        
-        # Get real listing statistics
-        total_listings = Listing.query.filter_by(status='active').count() if hasattr(Listing, 'status') else Listing.query.count()
-        
-        # Get real meeting statistics (total bookings)
-        total_bookings = Meeting.query.count()
-        
-        # Get pending verifications (sellers not verified)
-        pending_verifications = SellerProfile.query.filter_by(is_verified=False).count()
+        # Counts come from one aggregate query (or the counters table), cached for a few seconds
+        system_stats = get_dashboard_stats()
         
         # Get recent activities (last 10 users registered)
-        recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
+        recent_users = User.query.options(
+            selectinload(User.seller_profile), selectinload(User.buyer_profile)
+        ).order_by(User.created_at.desc()).limit(5).all()
         recent_activities = []
         
         for user in recent_users:
@@ -72,35 +68,22 @@ def dashboard():
         
         return jsonify({
             'message': 'Welcome to the Admin Dashboard',
-            'system_stats': {
-                'total_users': total_users,
-                'users_by_role': {
-                    'buyer': buyer_count,
-                    'seller': seller_count,
-                    'admin': admin_count
-                },
-                'total_listings': total_listings,
-                'total_bookings': total_bookings,
-                'pending_verifications': pending_verifications
-            },
+            'system_stats': system_stats,
             'recent_activities': recent_activities
         }), 200
         
     except Exception as e:
-        # Fallback to basic stats if there's an error
+        # Fall back to uncached live counts; zeros would pass for an empty event
+        db.session.rollback()
+        current_app.logger.error(f"Error loading dashboard stats: {str(e)}")
+        try:
+            system_stats = format_system_stats(count_dashboard_stats())
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': f'Failed to load dashboard stats: {str(e)}'}), 500
         return jsonify({
             'message': 'Welcome to the Admin Dashboard',
-            'system_stats': {
-                'total_users': User.query.count(),
-                'users_by_role': {
-                    'buyer': User.query.filter_by(role='buyer').count(),
-                    'seller': User.query.filter_by(role='seller').count(),
-                    'admin': User.query.filter_by(role='admin').count()
-                },
-                'total_listings': 0,
-                'total_bookings': 0,
-                'pending_verifications': 0
-            },
+            'system_stats': system_stats,
             'recent_activities': []
         }), 200
 
@@ -293,7 +276,7 @@ def get_user(user_id):
         
         # Add travel plans for buyers
         if user.is_buyer() and hasattr(user, 'travel_plans'):
-            user_data['travel_plans'] = [plan.to_dict() for plan in user.travel_plans]
+            user_data['travel_plans'] = [plan.to_dict() for plan in TravelPlan.itineraries([user.id])]
         
         return jsonify({
             'message': f'User details for ID: {user_id}',
@@ -754,6 +737,9 @@ def upload_invites():
         return jsonify({'error': 'File must be an Excel file (.xlsx or .xls)'}), 400
     
     try:
+        # pandas is only needed here, so it is not imported with the blueprint
+        import pandas as pd
+        
         # Read Excel file
         df = pd.read_excel(file)
         
@@ -763,61 +749,21 @@ def upload_invites():
             if column not in df.columns:
                 return jsonify({'error': f'Missing required column: {column}'}), 400
         
-        # Process each row
         admin_id = get_jwt_identity()
-        processed = 0
-        skipped = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            name = row['Name']
-            email = row['Email']
-            
-            # Validate email format
-            if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
-                errors.append({
-                    'row': index + 2,  # +2 because Excel is 1-indexed and has a header row
-                    'email': email,
-                    'error': 'Invalid email format'
-                })
-                continue
-            
-            # Check if email already exists in invited_buyers
-            if InvitedBuyer.query.filter_by(email=email).first():
-                skipped += 1
-                continue
-            
-            # Check if email already exists in users
-            if User.query.filter_by(email=email).first():
-                skipped += 1
-                continue
-            
-            # Generate invitation token
-            token = secrets.token_urlsafe(32)
-            
-            # Create invited buyer
-            invited_buyer = InvitedBuyer(
-                name=name,
-                email=email,
-                invitation_token=token,
-                invited_by=admin_id,
-                expires_at=datetime.utcnow() + timedelta(days=7)  # Token expires in 7 days
-            )
-            
-            db.session.add(invited_buyer)
-            processed += 1
+        invited_buyers, skipped, errors = import_invites(df, admin_id)
         
+        # Queue invitation emails for the new invites only, committed together with them
+        email_job_id = new_email_job_id()
+        for invited_buyer in invited_buyers:
+            send_invitation_email(invited_buyer, job_id=email_job_id, commit=False)
         db.session.commit()
         
-        # Send invitation emails
-        for invited_buyer in InvitedBuyer.query.filter_by(invited_by=admin_id, is_registered=False).all():
-            send_invitation_email(invited_buyer)
-        
         return jsonify({
             'message': 'Invites processed successfully',
-            'processed': processed,
+            'processed': len(invited_buyers),
             'skipped': skipped,
-            'errors': errors
+            'errors': errors,
+            'email_job_id': email_job_id
         }), 200
     
     except Exception as e:
@@ -847,12 +793,38 @@ def resend_invitation(buyer_id):
     invited_buyer.expires_at = datetime.utcnow() + timedelta(days=7)
     db.session.commit()
     
-    # Send invitation email
-    send_invitation_email(invited_buyer)
+    # Queue invitation email
+    email_job_id = new_email_job_id()
+    send_invitation_email(invited_buyer, job_id=email_job_id)
     
     return jsonify({
         'message': 'Invitation resent successfully',
-        'invited_buyer': invited_buyer.to_dict()
+        'invited_buyer': invited_buyer.to_dict(),
+        'email_job_id': email_job_id
+    }), 200
+
+@admin.route('/email-jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_email_job(job_id):
+    """Get delivery progress of the emails queued by one request"""
+    status_counts = dict(
+        db.session.query(EmailOutbox.status, func.count(EmailOutbox.id))
+        .filter(EmailOutbox.job_id == job_id)
+        .group_by(EmailOutbox.status)
+        .all()
+    )
+    if not status_counts:
+        return jsonify({'error': 'Email job not found'}), 404
+    
+    failed = EmailOutbox.query.filter_by(job_id=job_id, status='failed').all()
+    
+    return jsonify({
+        'job_id': job_id,
+        'total': sum(status_counts.values()),
+        'pending': status_counts.get('pending', 0) + status_counts.get('sending', 0),
+        'sent': status_counts.get('sent', 0),
+        'failed': status_counts.get('failed', 0),
+        'failures': [{'recipient': e.recipient, 'error': e.last_error} for e in failed]
     }), 200
 
 @admin.route('/invited-buyers/<int:buyer_id>', methods=['DELETE'])
@@ -905,7 +877,7 @@ def approve_buyer(buyer_id):
     if pending_buyer.status != 'pending':
         return jsonify({'error': f'Buyer is already {pending_buyer.status}'}), 400
     
-    # Generate a random password
+    # A random password that is never sent; the approval email issues the one the buyer gets
     password = secrets.token_urlsafe(10)
     
     # Create a new user
@@ -927,7 +899,7 @@ def approve_buyer(buyer_id):
     db.session.commit()
     
     # Send approval email with login details
-    send_approval_email(user, password)
+    send_approval_email(user)
     
     return jsonify({
         'message': 'Buyer approved successfully',
@@ -1712,6 +1684,11 @@ def allocate_accommodation_to_buyer(buyer_id):
         if field not in data or data[field] is None:
             return jsonify({'error': f'Missing required field: {field}'}), 400
     
+    try:
+        host_property_id = int(data['host_property_id'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid host property ID format'}), 400
+    
     try:
         # Find the buyer
         buyer = User.query.get(buyer_id)
@@ -1721,10 +1698,11 @@ def allocate_accommodation_to_buyer(buyer_id):
         if not buyer.is_buyer():
             return jsonify({'error': f'User with ID {buyer_id} is not a buyer (role: {buyer.role})'}), 404
         
-        # Verify host property exists
-        host_property = HostProperty.query.get(data['host_property_id'])
+        # Verify host property exists, locking its row until the allocation is committed
+        host_property = lock_host_properties([host_property_id]).get(host_property_id)
         if not host_property:
-            return jsonify({'error': f'Host property with ID {data["host_property_id"]} not found'}), 404
+            db.session.rollback()
+            return jsonify({'error': f'Host property with ID {host_property_id} not found'}), 404
         
         # Validate room type
         valid_room_types = ['single', 'shared']
@@ -1748,28 +1726,12 @@ def allocate_accommodation_to_buyer(buyer_id):
         travel_plan = TravelPlan.query.filter_by(user_id=buyer_id).order_by(TravelPlan.created_at.asc()).first()
         
         if not travel_plan:
-            # Helper function to get system setting
-            def get_system_setting(key, default_value=None):
-                from ..models import SystemSetting
-                setting = SystemSetting.query.filter_by(key=key).first()
-                return setting.value if setting and setting.value else default_value
-            
-            # Helper function to parse date from setting
-            def parse_date_from_setting(key, fallback_date):
-                date_str = get_system_setting(key)
-                if date_str:
-                    try:
-                        return datetime.strptime(date_str, '%Y-%m-%d').date()
-                    except ValueError:
-                        pass
-                return fallback_date
-            
             # Get dynamic event configuration from system settings
             from datetime import date
-            event_start_date = parse_date_from_setting('event_start_date', date(2025, 6, 25))
-            event_end_date = parse_date_from_setting('event_end_date', date(2025, 6, 28))
-            event_name = get_system_setting('event_name', 'Splash25 Event')
-            event_venue = get_system_setting('event_venue', 'Wayanad, Kerala')
+            event_start_date = get_date_setting('event_start_date', date(2025, 6, 25))
+            event_end_date = get_date_setting('event_end_date', date(2025, 6, 28))
+            event_name = get_setting('event_name', 'Splash25 Event')
+            event_venue = get_setting('event_venue', 'Wayanad, Kerala')
             
             # Create a default travel plan using system settings
             travel_plan = TravelPlan(
@@ -1791,14 +1753,25 @@ def allocate_accommodation_to_buyer(buyer_id):
         ).first()
         
         if existing_accommodation:
+            db.session.rollback()
             return jsonify({
                 'error': f'Buyer already has accommodation allocated for travel plan "{travel_plan.event_name}"'
             }), 400
         
+        # Check capacity against the counts taken under the property lock
+        counts = allocation_counts([host_property.property_id])[host_property.property_id]
+        counts[data['room_type']] += 1
+        rooms_allocated, _ = room_usage(counts['shared'], counts['single'])
+        if rooms_allocated > host_property.rooms_allotted:
+            db.session.rollback()
+            return jsonify({
+                'error': 'Cannot allocate room: exceeds available room capacity'
+            }), 400
+        
         # Create new accommodation allocation
         new_accommodation = Accommodation(
             travel_plan_id=travel_plan.id,
-            host_property_id=data['host_property_id'],
+            host_property_id=host_property_id,
             buyer_id=buyer_id,
             check_in_datetime=check_in_datetime,
             check_out_datetime=check_out_datetime,
@@ -1810,44 +1783,10 @@ def allocate_accommodation_to_buyer(buyer_id):
         )
         
         db.session.add(new_accommodation)
-        db.session.commit()
         
-        # Update host property statistics
-        try:
-            # Count accommodations by room type for this property
-            shared_count = Accommodation.query.filter_by(
-                host_property_id=data['host_property_id'],
-                room_type='shared'
-            ).count()
-            
-            single_count = Accommodation.query.filter_by(
-                host_property_id=data['host_property_id'],
-                room_type='single'
-            ).count()
-            
-            # Calculate number_rooms_allocated using new formula
-            # Formula: (shared_count // 2) + single_count
-            host_property.number_rooms_allocated = (shared_count // 2) + single_count
-            
-            # Validation: Check if allocated rooms exceed available rooms
-            if host_property.number_rooms_allocated > host_property.rooms_allotted:
-                db.session.rollback()
-                return jsonify({
-                    'error': 'Cannot allocate room: exceeds available room capacity'
-                }), 400
-            
-            # Update number_current_guests using the specified formula
-            # Formula: (1 * shared_count) + (2 * single_count)
-            host_property.number_current_guests = (1 * shared_count) + (2 * single_count)
-            
-            # Commit the host property updates
-            db.session.commit()
-            
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({
-                'error': f'Failed to update host property statistics: {str(e)}'
-            }), 500
+        # Update host property statistics in the same transaction
+        refresh_property_usage(host_property, counts)
+        db.session.commit()
         
         # Return success response with accommodation details
         return jsonify({
@@ -1862,6 +1801,96 @@ def allocate_accommodation_to_buyer(buyer_id):
         db.session.rollback()
         return jsonify({'error': f'Failed to allocate accommodation: {str(e)}'}), 500
 
+@admin.route('/accommodations/bulk-allocate', methods=['POST'])
+@admin_required
+def bulk_allocate_accommodations():
+    """
+    Allocate accommodation to many buyers in one transaction (admin only)
+    
+    Expects {"allocations": [{"buyer_id", "host_property_id", "room_type",
+    "check_in_datetime", "check_out_datetime", "special_notes"?}, ...]}.
+    Either every allocation is made or none is.
+    """
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get('allocations'), list) or not data['allocations']:
+        return jsonify({'error': 'allocations must be a non-empty list'}), 400
+    
+    try:
+        accommodation_ids = [accommodation.id for accommodation in allocate_accommodations(data['allocations'])]
+        db.session.commit()
+    except AllocationError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Allocation failed, nothing was allocated', 'details': e.errors}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to allocate accommodations: {str(e)}'}), 500
+    
+    # Reload the committed rows with everything to_dict() needs in a fixed number of queries
+    accommodations = Accommodation.query.options(
+        *Accommodation.serialization_options()
+    ).filter(Accommodation.id.in_(accommodation_ids)).order_by(Accommodation.id).all()
+    
+    return jsonify({
+        'message': f'{len(accommodations)} accommodations allocated successfully',
+        'accommodations': [accommodation.to_dict() for accommodation in accommodations],
+        'total_count': len(accommodations)
+    }), 201
+
+@admin.route('/accommodations/auto-assign', methods=['POST'])
+@admin_required
+def auto_assign_accommodations():
+    """
+    Plan rooms for every hosted buyer without accommodation (admin only)
+    
+    Optional body: {"default_room_type": "shared", "room_types": {buyer_id: room_type},
+    "property_ids": [...], "commit": false}. Returns the plan as a preview; with
+    "commit": true the plan is allocated in the same transaction. A preview can
+    also be committed later by posting its assignments to /accommodations/bulk-allocate.
+    """
+    data = request.get_json(silent=True) or {}
+    commit = bool(data.get('commit', False))
+    
+    try:
+        assignments, unassigned, properties = auto_assign_rooms(
+            default_room_type=data.get('default_room_type', 'shared'),
+            room_types=data.get('room_types'),
+            property_ids=data.get('property_ids'),
+            lock=commit
+        )
+        if commit and assignments:
+            allocate_accommodations(assignments)
+            db.session.commit()
+        else:
+            db.session.rollback()
+    except AllocationError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Automatic assignment failed, nothing was allocated', 'details': e.errors}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to assign accommodations: {str(e)}'}), 500
+    
+    property_names = {p['property_id']: p['property_name'] for p in properties}
+    return jsonify({
+        'committed': commit and bool(assignments),
+        'assignments': [
+            {
+                'buyer_id': a['buyer_id'],
+                'buyer_name': a['buyer_name'],
+                'host_property_id': a['host_property_id'],
+                'property_name': property_names[a['host_property_id']],
+                'room_type': a['room_type'],
+                'check_in_datetime': a['check_in_datetime'].isoformat(),
+                'check_out_datetime': a['check_out_datetime'].isoformat()
+            }
+            for a in assignments
+        ],
+        'unassigned': unassigned,
+        'properties': properties,
+        'total_assigned': len(assignments),
+        'total_unassigned': len(unassigned)
+    }), 201 if commit and assignments else 200
+
 @admin.route('/buyers/<int:buyer_id>/accommodations', methods=['GET'])
 @admin_required
 def get_buyer_accommodations(buyer_id):
@@ -1875,7 +1904,9 @@ def get_buyer_accommodations(buyer_id):
             return jsonify({'error': 'Buyer not found or user is not a buyer'}), 404
         
         # Get all accommodations for this buyer
-        accommodations = Accommodation.query.filter_by(buyer_id=buyer_id).all()
+        accommodations = Accommodation.query.options(
+            *Accommodation.serialization_options()
+        ).filter_by(buyer_id=buyer_id).all()
         
         return jsonify({
             'buyer_id': buyer_id,
@@ -1902,10 +1933,14 @@ def deallocate_accommodation(accommodation_id):
         
         # Store buyer and property info for response
         buyer_name = accommodation.buyer.buyer_profile.name if accommodation.buyer and accommodation.buyer.buyer_profile else 'Unknown Buyer'
-        property_name = accommodation.host_property.property_name if accommodation.host_property else 'Unknown Property'
+        host_property = lock_host_properties([accommodation.host_property_id]).get(accommodation.host_property_id)
+        property_name = host_property.property_name if host_property else 'Unknown Property'
         
-        # Delete the accommodation allocation
+        # Delete the accommodation allocation and release its room
         db.session.delete(accommodation)
+        db.session.flush()
+        if host_property:
+            refresh_property_usage(host_property)
         db.session.commit()
         
         return jsonify({
@@ -1923,7 +1958,7 @@ def get_all_accommodations():
     Get all accommodation allocations (admin only)
     """
     try:
-        accommodations = Accommodation.query.all()
+        accommodations = Accommodation.query.options(*Accommodation.serialization_options()).all()
         
         accommodations_data = []
         for accommodation in accommodations:
@@ -1952,6 +1987,38 @@ def get_all_accommodations():
     except Exception as e:
         return jsonify({'error': f'Failed to fetch accommodations: {str(e)}'}), 500
 
+@admin.route('/travel-plans', methods=['GET'])
+@admin_required
+def get_all_travel_plans():
+    """
+    Get every buyer's travel itinerary for logistics planning (admin only)
+    """
+    try:
+        travel_plans = TravelPlan.query.options(
+            *TravelPlan.serialization_options(),
+            joinedload(TravelPlan.user).selectinload(User.buyer_profile)
+        ).order_by(TravelPlan.user_id, TravelPlan.created_at, TravelPlan.id).all()
+        
+        travel_plans_data = []
+        for plan in travel_plans:
+            plan_dict = plan.to_dict()
+            buyer_profile = plan.user.buyer_profile if plan.user else None
+            plan_dict['buyer'] = {
+                'id': plan.user_id,
+                'username': plan.user.username if plan.user else None,
+                'name': buyer_profile.name if buyer_profile else None,
+                'organization': buyer_profile.organization if buyer_profile else None
+            }
+            travel_plans_data.append(plan_dict)
+        
+        return jsonify({
+            'travel_plans': travel_plans_data,
+            'total_count': len(travel_plans_data)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to fetch travel plans: {str(e)}'}), 500
+
 # Transport Types Management Endpoints
 
 @admin.route('/transport-types', methods=['GET'])
@@ -2320,28 +2387,12 @@ def allocate_transportation_to_buyer(buyer_id):
         travel_plan = TravelPlan.query.filter_by(user_id=buyer_id).order_by(TravelPlan.created_at.asc()).first()
         
         if not travel_plan:
-            # Helper function to get system setting
-            def get_system_setting(key, default_value=None):
-                from ..models import SystemSetting
-                setting = SystemSetting.query.filter_by(key=key).first()
-                return setting.value if setting and setting.value else default_value
-            
-            # Helper function to parse date from setting
-            def parse_date_from_setting(key, fallback_date):
-                date_str = get_system_setting(key)
-                if date_str:
-                    try:
-                        return datetime.strptime(date_str, '%Y-%m-%d').date()
-                    except ValueError:
-                        pass
-                return fallback_date
-            
             # Get dynamic event configuration from system settings
             from datetime import date
-            event_start_date = parse_date_from_setting('event_start_date', date(2025, 6, 25))
-            event_end_date = parse_date_from_setting('event_end_date', date(2025, 6, 28))
-            event_name = get_system_setting('event_name', 'Splash25 Event')
-            event_venue = get_system_setting('event_venue', 'Wayanad, Kerala')
+            event_start_date = get_date_setting('event_start_date', date(2025, 6, 25))
+            event_end_date = get_date_setting('event_end_date', date(2025, 6, 28))
+            event_name = get_setting('event_name', 'Splash25 Event')
+            event_venue = get_setting('event_venue', 'Wayanad, Kerala')
             
             # Create a default travel plan using system settings
             travel_plan = TravelPlan(
@@ -2394,6 +2445,56 @@ def allocate_transportation_to_buyer(buyer_id):
         db.session.rollback()
         return jsonify({'error': f'Failed to allocate ground transportation: {str(e)}'}), 500
 
+@admin.route('/transportation/schedule', methods=['POST'])
+@admin_required
+def schedule_ground_transportation():
+    """
+    Pool buyers into shared arrival and departure vehicles (admin only)
+    
+    Optional body: {"buyer_ids": [...], "window_minutes": 60,
+    "departure_buffer_minutes": 180, "commit": false}. Without buyer_ids every
+    buyer with hosted transfers, entered journeys and no ground transportation
+    is scheduled. Returns the vehicles as a preview; with "commit": true a
+    ground transportation row is written for every scheduled buyer at once.
+    """
+    data = request.get_json(silent=True) or {}
+    commit = bool(data.get('commit', False))
+    
+    try:
+        window_minutes = int(data.get('window_minutes', DEFAULT_WINDOW_MINUTES))
+        departure_buffer_minutes = int(data.get('departure_buffer_minutes', DEFAULT_DEPARTURE_BUFFER_MINUTES))
+        buyer_ids = [int(buyer_id) for buyer_id in data['buyer_ids']] if data.get('buyer_ids') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'window_minutes, departure_buffer_minutes and buyer_ids must be integers'}), 400
+    
+    if window_minutes <= 0 or departure_buffer_minutes < 0:
+        return jsonify({'error': 'window_minutes must be positive and departure_buffer_minutes not negative'}), 400
+    
+    try:
+        vehicles, warnings, skipped = schedule_transfers(
+            buyer_ids=buyer_ids,
+            window_minutes=window_minutes,
+            departure_buffer_minutes=departure_buffer_minutes,
+            commit=commit
+        )
+        if commit:
+            db.session.commit()
+        else:
+            db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to schedule ground transportation: {str(e)}'}), 500
+    
+    scheduled = {buyer_id for vehicle in vehicles for buyer_id in vehicle['buyer_ids']}
+    return jsonify({
+        'committed': commit and bool(vehicles),
+        'vehicles': [dict(vehicle, time=vehicle['time'].isoformat()) for vehicle in vehicles],
+        'warnings': warnings,
+        'skipped': skipped,
+        'total_buyers': len(scheduled),
+        'total_vehicles': len(vehicles)
+    }), 201 if commit and vehicles else 200
+
 @admin.route('/buyers/<int:buyer_id>/transportation', methods=['GET'])
 @admin_required
 def get_buyer_transportation(buyer_id):
@@ -2467,11 +2568,11 @@ def update_transportation(transportation_id):
             except (ValueError, AttributeError) as e:
                 return jsonify({'error': f'Invalid dropoff datetime format: {str(e)}'}), 400
         
-        # Validate pickup is before dropoff (if both are being updated)
+        # Validate pickup is before dropoff (scheduled rows may have only one leg)
         final_pickup = pickup_datetime if pickup_datetime else transportation.pickup_datetime
         final_dropoff = dropoff_datetime if dropoff_datetime else transportation.dropoff_datetime
         
-        if final_dropoff <= final_pickup:
+        if final_pickup and final_dropoff and final_dropoff <= final_pickup:
             return jsonify({'error': 'Dropoff datetime must be after pickup datetime'}), 400
         
         # Validate vehicle type IDs if provided
@@ -10,13 +10,10 @@ from datetime import datetime, timedelta
 import re
 from ..models import db, User, UserRole, InvitedBuyer, PendingBuyer, DomainRestriction
 from ..utils.email_service import send_registration_confirmation_email
+from ..utils.token_blocklist import get_token_blocklist
 
 auth = Blueprint('auth', __name__, url_prefix='/api/auth')
 
-# Token blacklist for logout functionality
-# In a production environment, this should be stored in Redis or another persistent store
-token_blacklist = set()
-
 @auth.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -151,14 +148,14 @@ def get_current_user():
 @auth.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    jti = get_jwt()['jti']
-    token_blacklist.add(jti)
+    claims = get_jwt()
+    get_token_blocklist().revoke(claims['jti'], claims['exp'])
     return jsonify({'message': 'Successfully logged out'}), 200
 
-# Helper function to check if a token is blacklisted
+# Helper function to check if a token is blacklisted (shared across workers, see utils/token_blocklist.py)
 def is_token_blacklisted(jwt_header, jwt_payload):
     jti = jwt_payload['jti']
-    return jti in token_blacklist
+    return get_token_blocklist().is_revoked(jti)
 
 @auth.route('/validate-invite/<token>', methods=['GET'])
 def validate_invite(token):
@@ -1,17 +1,17 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-from nc_py_api import Nextcloud, NextcloudException
-from io import BytesIO
-from PIL import Image
-import base64
-import requests
-from urllib.parse import urlparse
-from werkzeug.utils import secure_filename
 import os
 import logging
+from sqlalchemy.orm import selectinload
 from ..utils.auth import buyer_required
-from ..models import db, User, TravelPlan, Transportation, Accommodation, GroundTransportation, Meeting, MeetingStatus, UserRole, TimeSlot, SystemSetting, BuyerProfile, BuyerCategory, PropertyType, Interest, StallType
+from ..utils.system_settings import get_bool_setting, get_setting
+from ..utils.booking import book_meeting, set_meeting_status, BookingError
+from ..utils.external_storage import get_external_storage
+from ..utils.image_pipeline import (
+    spool_upload, discard_spooled, validate_image, InvalidImage, FileTooLarge, queue_image_upload
+)
+from ..models import db, User, TravelPlan, Transportation, Accommodation, GroundTransportation, Meeting, MeetingStatus, UserRole, TimeSlot, BuyerProfile, BuyerCategory, PropertyType, Interest, StallType
 
 buyer = Blueprint('buyer', __name__, url_prefix='/api/buyer')
 
@@ -89,15 +89,15 @@ def dashboard():
         # If no upcoming meetings, show general event info
         if not upcoming_events:
             # Check system settings for event info
-            event_start = SystemSetting.query.filter_by(key='event_start_date').first()
-            venue_name = SystemSetting.query.filter_by(key='venue_name').first()
+            event_start = get_setting('event_start_date')
+            venue_name = get_setting('venue_name')
             
             if event_start and venue_name:
                 upcoming_events.append({
                     'id': 1,
                     'name': 'Splash25 Event',
-                    'date': event_start.value,
-                    'location': venue_name.value
+                    'date': event_start,
+                    'location': venue_name
                 })
     except Exception as e:
         # Fallback in case of database error
@@ -331,8 +331,8 @@ def get_travel_plans():
         except ValueError:
             return jsonify({'error': 'Invalid user ID'}), 400
     
-    # Fetch travel plans for the user
-    travel_plans = TravelPlan.query.filter_by(user_id=user_id).all()
+    # Fetch travel plans for the user with their transport and accommodation details
+    travel_plans = TravelPlan.itineraries([user_id])
     
     if not travel_plans:
         # if no travel plan found, create a new one 
@@ -348,8 +348,8 @@ def get_travel_plans():
         db.session.add(travel_plan);
         db.session.commit()
 
-        # Refetch the details
-        travel_plans = TravelPlan.query.filter_by(user_id=user_id).all()
+        # A new plan has no transport or accommodation yet
+        travel_plans = [travel_plan]
     
     return jsonify({
         'travel_plans': [plan.to_dict() for plan in travel_plans]
@@ -820,7 +820,7 @@ def get_meetings():
     to_date = request.args.get('to_date')
     
     # Build query
-    query = Meeting.query.filter_by(buyer_id=user_id)
+    query = Meeting.query.options(*Meeting.serialization_options()).filter_by(buyer_id=user_id)
     
     # Apply filters if provided
     if status:
@@ -861,56 +861,25 @@ def create_meeting():
             return jsonify({'error': f'Missing required field: {field}'}), 400
     
     # Check if meetings are enabled
-    meetings_enabled = SystemSetting.query.filter_by(key='meetings_enabled').first()
-    if not meetings_enabled or meetings_enabled.value != 'true':
+    if not get_bool_setting('meetings_enabled'):
         return jsonify({
             'error': 'Meeting requests are currently disabled'
         }), 400
 
-    # Check if the seller exists
-    seller = User.query.get(data['seller_id'])
-    if not seller or seller.role != UserRole.SELLER:
-        return jsonify({
-            'error': 'Invalid seller'
-        }), 400
-    
-    # Check if the time slot exists and is available
-    time_slot = TimeSlot.query.get(data['time_slot_id'])
-    if not time_slot:
-        return jsonify({
-            'error': 'Time slot not found'
-        }), 404
-    
-    if not time_slot.is_available:
-        return jsonify({
-            'error': 'Time slot is not available'
-        }), 400
-    
-    # Check if the time slot belongs to the seller
-    if time_slot.user_id != data['seller_id']:
-        return jsonify({
-            'error': 'Time slot does not belong to the specified seller'
-        }), 400
-
-    # Create the meeting
-    meeting = Meeting(
-        buyer_id=user_id,
-        seller_id=data['seller_id'],
-        time_slot_id=data['time_slot_id'],
-        notes=data.get('notes', ''),
-        status=MeetingStatus.PENDING
-    )
+    try:
+        seller_id = int(data['seller_id'])
+        time_slot_id = int(data['time_slot_id'])
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid seller or time slot ID format'}), 400
     
-    # Mark the time slot as unavailable
-    time_slot.is_available = False
+    # Claims the slot atomically, so concurrent requests cannot double-book it
+    try:
+        meeting = book_meeting(user_id, seller_id, requestor_id=user_id,
+                               time_slot_id=time_slot_id, notes=data.get('notes', ''))
+    except BookingError as e:
+        return jsonify({'error': e.message}), e.status_code
     
-    db.session.add(meeting)
     db.session.commit()
-
-    # Link meeting_id to time_slot if supported
-    if hasattr(time_slot, 'meeting_id'):
-        time_slot.meeting_id = meeting.id
-        db.session.commit()
     
     return jsonify({
         'message': 'Meeting request created successfully',
@@ -943,13 +912,18 @@ def update_meeting(meeting_id):
     if not meeting:
         return jsonify({'error': 'Meeting not found or access denied'}), 404
     
-    # Update meeting status
+    # Update meeting status, keeping the time slot and daily quotas in step
     try:
-        meeting.status = MeetingStatus(data['status'])
-        db.session.commit()
+        new_status = MeetingStatus(data['status'])
     except ValueError:
         return jsonify({'error': f'Invalid status: {data["status"]}'}), 400
     
+    try:
+        set_meeting_status(meeting, new_status)
+    except BookingError as e:
+        return jsonify({'error': e.message}), e.status_code
+    db.session.commit()
+    
     return jsonify({
         'message': 'Meeting updated successfully',
         'meeting': meeting.to_dict()
@@ -985,162 +959,36 @@ def upload_profile_image():
     if not '.' in file.filename or file.filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
         return jsonify({'error': 'Invalid file type. Only JPG, JPEG, and PNG files are allowed'}), 400
     
-    # Check file size (1MB limit)
-    file.seek(0, os.SEEK_END)
-    file_size = file.tell()
-    file.seek(0)  # Reset file pointer
+    # Get buyer profile
+    buyer_profile = BuyerProfile.query.filter_by(user_id=user_id).first()
+    if not buyer_profile:
+        return jsonify({'error': 'Buyer profile not found'}), 404
     
-    if file_size > 1 * 1024 * 1024:  # 1MB
+    if get_external_storage() is None:
+        return jsonify({'error': 'External storage configuration missing'}), 500
+    
+    # Copy to a temporary file in chunks, stopping as soon as the 1MB limit is passed
+    try:
+        path = spool_upload(file, 1 * 1024 * 1024)
+    except FileTooLarge:
         return jsonify({'error': 'File size exceeds 1MB limit'}), 400
+    spooled = [(file.filename, file.content_type, path)]
     
+    # Check that the content really is an image
     try:
-        # Get buyer profile
-        buyer_profile = BuyerProfile.query.filter_by(user_id=user_id).first()
-        if not buyer_profile:
-            return jsonify({'error': 'Buyer profile not found'}), 404
-        
-        # Get external storage credentials from environment
-        storage_url = os.getenv('EXTERNAL_STORAGE_URL')+"index.php"
-        storage_user = os.getenv('EXTERNAL_STORAGE_USER')
-        storage_password = os.getenv('EXTERNAL_STORAGE_PASSWORD')
-        ocs_url = os.getenv("EXTERNAL_STORAGE_URL")+'ocs/v2.php/apps/files_sharing/api/v1/shares'
-        ocs_headers = {'OCS-APIRequest': 'true',"Accept": "application/json"}
-        ocs_auth = (storage_user, storage_password)  # Use app password or user/pass
-        
-        if not all([storage_url, storage_user, storage_password]):
-            return jsonify({'error': 'External storage configuration missing'}), 500
-        
-        nc = Nextcloud(nextcloud_url=storage_url, nc_auth_user=storage_user, nc_auth_pass=storage_password)
-
-        # Save file to uploads directory
-        # upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'profile_images')
-        buyer_base_dir_available = False
-        buyer_image_profile_dir_available = False
-        buyer_dir = f"buyer_{user_id}/"
-        remote_dir_path = f"/Photos/{buyer_dir}"
-        remote_base_profile_images_path = f"/Photos/{buyer_dir}/profile"
-        # Make base dir for buyer
-        try:
-            nc.files.listdir(remote_dir_path)
-            logging.debug(f"Found remote path:: {remote_dir_path}")
-            buyer_base_dir_available = True
-        except NextcloudException as e:
-            if e.status_code != 404:
-                raise e
-            else:
-                try:
-                    logging.info(f"Could not locate remote directory::: {remote_dir_path}::: Proceeding to create")
-                    nc.files.mkdir(remote_dir_path)
-                    logging.debug(f"Created remote directory {remote_dir_path} successfully")
-                    logging.debug("Now setting sharing permissions...")
-                    dir_sharing_data = {
-                        'path': remote_dir_path,         # Folder you created
-                        'shareType': 3,                  # Public link
-                        'permissions': 1                 # Read-only
-                    }
-                    response = requests.post(ocs_url, headers=ocs_headers, data=dir_sharing_data, auth=ocs_auth)
-
-                    if response.status_code == 200:
-                        logging.info(f"Response Text is:: {response}")
-                        share_info = response.json()
-                        link = share_info['ocs']['data']['url']
-                        logging.debug(f"Public Share URL: {link}")
-                        buyer_base_dir_available = True
-                    else:
-                        logging.debug("Failed to create share:", response.text)
-                except Exception as e:
-                    logging.debug(f"Exception while creating buyer base directory:{str(e)}")
-                    return jsonify({"Exception": f"Failed to create buyer base directory -- {remote_dir_path} - the error is ::::{str(e)}"}), 500
-
-        # If we have buyer base directory, check if we have buyer profile image directory
-        if buyer_base_dir_available: 
-            try:
-                nc.files.listdir(remote_base_profile_images_path)
-                logging.debug(f"Found remote path:: {remote_dir_path}")
-                buyer_image_profile_dir_available = True
-            except NextcloudException as e:
-                if e.status_code != 404:
-                    raise e
-                else:
-                    try:
-                        logging.info(f"Could not locate buyer profile image directory::: {remote_base_profile_images_path}::: Proceeding to create")
-                        nc.files.mkdir(remote_base_profile_images_path)
-                        logging.debug(f"Created remote directory {remote_dir_path} successfully")
-                        logging.debug("Now setting sharing permissions...")
-                        dir_sharing_data = {
-                            'path': remote_base_profile_images_path,         # Folder you created
-                            'shareType': 3,                  # Public link
-                            'permissions': 1                 # Read-only
-                        }
-                        response = requests.post(ocs_url, headers=ocs_headers, data=dir_sharing_data, auth=ocs_auth)
-                        if response.status_code == 200:
-                            logging.info(f"Response Text is:: {response}")
-                            share_info = response.json()
-                            link = share_info['ocs']['data']['url']
-                            logging.debug(f"Public Share URL: {link}")
-                            buyer_image_profile_dir_available = True
-                        else:
-                            logging.debug("Failed to create buyer profile image directtory:", response.text)
-                    except Exception as e:
-                        logging.debug(f"Exception while creating buyer buyer profile images directory:{str(e)}")
-                        return jsonify({"Exception": f"Failed to create buyer bprofile imagesase directory -- {remote_base_profile_images_path} - the error is ::::{str(e)}"}), 500
-
-
-        # Generate unique filename
-        filename = secure_filename(f"buyer_{user_id}_{int(datetime.now().timestamp())}.{file.filename.rsplit('.', 1)[1].lower()}")
-
-        # Prepare file data for upload
-        file_data = file.read()
-        file.seek(0)  # Reset for potential retry
-            
-        # Create basic auth header
-        auth_string = f"{storage_user}:{storage_password}"
-        auth_bytes = auth_string.encode('ascii')
-        auth_b64 = base64.b64encode(auth_bytes).decode('ascii')
-
-        # File upload URL
-        upload_url = f"{remote_base_profile_images_path}/{filename}"
-        
-        # Public URL for storage and reading
-        file_public_url=""
-        
-        # Upload file
-        try:        
-            buf = BytesIO(file_data)  
-            buf.seek(0)
-            logging.info(f"Uploading file :::: {upload_url}")
-            uploaded_file = nc.files.upload_stream(upload_url, buf)
-            logging.info(f"The uploaded file data is::: {(uploaded_file.name)}")
-            # Now give it a publicly available link 
-            seller_file_sharing_data = {
-                'path': upload_url,              # Uploaded file
-                'shareType': 3,                  # Public link
-                'permissions': 1                 # Read-only
-            }
-            response = requests.post(ocs_url, headers=ocs_headers, data=seller_file_sharing_data, auth=ocs_auth)
-            if response.status_code == 200:
-                result = response.json()
-                if result["ocs"]["meta"]["status"] == "ok":
-                    file_public_url = result["ocs"]["data"]["url"]
-                    logging.debug(f"Public share URL: {file_public_url}")
-                else:
-                    logging.error(f"Share API error: {result['ocs']['meta']['message']}")
-            else:
-                print("HTTP error:", response.status_code, response.text)
-        except Exception as e:
-            logging.debug(f"Exception while uploading file:{e}")
-            return jsonify({'Exception': f'Failed to upload file {upload_url}:::{str(e)}'}), 500
-        
-        # Update profile with image URL
-        image_url = file_public_url
-        buyer_profile.profile_image = image_url
-        
-        db.session.commit()
+        validate_image(path)
+    except InvalidImage:
+        discard_spooled(spooled)
+        return jsonify({'error': 'File is not a valid image'}), 400
+    
+    try:
+        # Re-encoding and the upload to external storage happen in the background
+        upload = queue_image_upload(user_id, 'buyer_profile', spooled)
         
         return jsonify({
-            'message': 'Profile image uploaded successfully',
-            'profile': buyer_profile.to_dict()
-        }), 200
+            'message': 'Profile image is being processed',
+            'upload': upload.to_dict()
+        }), 202
         
     except Exception as e:
         db.session.rollback()
@@ -1157,14 +1005,26 @@ def get_sellers():
     import os
     from ..models.models import SellerProfile
     
+    user_id = get_jwt_identity()
+    
+    # Convert to int if it's a string
+    if isinstance(user_id, str):
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            user_id = None
+    
     # Get query parameters for filtering
     search = request.args.get('search', '')
     specialty = request.args.get('specialty', '')
     
-    # Build query to join users with seller_profiles
+    # Build query to join users with seller_profiles; target markets are loaded
+    # for all returned profiles in a single batched query
     query = db.session.query(User, SellerProfile).join(
         SellerProfile, User.id == SellerProfile.user_id
-    ).filter(User.role == UserRole.SELLER.value)
+    ).filter(User.role == UserRole.SELLER.value).options(
+        selectinload(SellerProfile.target_market_relationships)
+    )
     
     # Apply search filter if provided
     if search:
@@ -1174,9 +1034,18 @@ def get_sellers():
             (SellerProfile.business_name.ilike(f'%{search}%'))
         )
     
+    # Filter by specialty if provided
+    if specialty:
+        query = query.filter(
+            SellerProfile.target_market_relationships.any(Interest.name == specialty)
+        )
+    
     # Execute query
     results = query.all()
     
+    # Latest meeting status per seller for the current buyer, in one round trip
+    meeting_statuses = _latest_meeting_statuses(user_id) if user_id else {}
+    
     # Get PUBLIC_SITE_URL from environment
     public_site_url = os.getenv('PUBLIC_SITE_URL', 'http://localhost:3000')
     
@@ -1206,32 +1075,26 @@ def get_sellers():
             'website': profile.website or '',
             'microsite_url': microsite_url,
             'contactEmail': profile.contact_email or user.email,
-            'contactPhone': profile.contact_phone or ''
+            'contactPhone': profile.contact_phone or '',
+            'meetingStatus': meeting_statuses.get(user.id, 'none')
         }
         
-        # Filter by specialty if provided (placeholder logic)
-        if specialty and specialty not in seller_data['specialties']:
-            continue
-        
-        # Check meeting status
-        user_id = get_jwt_identity()
-        if isinstance(user_id, str):
-            try:
-                user_id = int(user_id)
-            except ValueError:
-                user_id = None
-        
-        if user_id:
-            meeting = Meeting.query.filter_by(buyer_id=user_id, seller_id=user.id).order_by(Meeting.created_at.desc()).first()
-            if meeting:
-                seller_data['meetingStatus'] = meeting.status.value
-            else:
-                seller_data['meetingStatus'] = 'none'
-        else:
-            seller_data['meetingStatus'] = 'none'
-        
         seller_list.append(seller_data)
     
     return jsonify({
         'sellers': seller_list
     }), 200
+
+def _latest_meeting_statuses(buyer_id):
+    """Map seller_id -> status of the buyer's most recent meeting with that seller.
+    
+    Uses DISTINCT ON so the whole directory costs a single query instead of
+    one lookup per seller.
+    """
+    rows = db.session.query(Meeting.seller_id, Meeting.status).filter(
+        Meeting.buyer_id == buyer_id
+    ).distinct(Meeting.seller_id).order_by(
+        Meeting.seller_id, Meeting.created_at.desc()
+    ).all()
+    
+    return {seller_id: status.value for seller_id, status in rows}
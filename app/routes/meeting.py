@@ -1,12 +1,36 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-from ..models import db, Meeting, TimeSlot, User, UserRole, MeetingStatus, SystemSetting
-from ..utils.auth import buyer_required, seller_required
+from ..models import db, Meeting, TimeSlot, User, UserRole, MeetingStatus
+from ..utils.auth import buyer_required, seller_required, admin_required
+from ..utils.system_settings import get_bool_setting
+from ..utils.booking import book_meeting, set_meeting_status, bulk_set_meeting_status, BookingError
+from ..utils.matchmaking import schedule_meetings
+import csv
+import io
+import json
 import logging
 
 meeting = Blueprint('meeting', __name__, url_prefix='/api/meetings')
 
+# Meetings per page of GET /api/meetings when only a cursor is given, and the most that can be asked for
+DEFAULT_MEETING_PAGE_SIZE = 100
+MAX_MEETING_PAGE_SIZE = 500
+
+# Rows fetched per round trip from the server-side cursor when exporting
+EXPORT_BATCH_SIZE = 1000
+
+# Most meetings a single bulk status request may change
+MAX_BULK_STATUS_MEETINGS = 500
+
+# Column order of the CSV export
+EXPORT_CSV_COLUMNS = [
+    'id', 'status', 'buyer_id', 'buyer_username', 'buyer_email', 'buyer_organization',
+    'seller_id', 'seller_username', 'seller_email', 'seller_business_name',
+    'requestor_id', 'time_slot_id', 'start_time', 'end_time', 'attendee_id', 'attendee_name',
+    'meeting_date', 'meeting_time', 'notes', 'created_at', 'updated_at'
+]
+
 @meeting.route('', methods=['GET'])
 @jwt_required()
 def get_meetings():
@@ -19,23 +43,186 @@ def get_meetings():
             'error': 'User not found'
         }), 404
     
+    # Optional keyset pagination: pass limit and/or cursor (the last meeting id seen)
+    limit = request.args.get('limit', None, type=int)
+    cursor = request.args.get('cursor', None, type=int)
+    paginate = limit is not None or cursor is not None
+    
+    # Load participants, profiles, slots and attendees up front instead of per meeting
+    query = Meeting.query.options(*Meeting.serialization_options())
+    
     # Get meetings based on user role
     if user.role == UserRole.BUYER.value:
-        meetings = Meeting.query.filter_by(buyer_id=user_id).all()
+        query = query.filter_by(buyer_id=user_id)
     elif user.role == UserRole.SELLER.value:
-        meetings = Meeting.query.filter_by(seller_id=user_id).all()
+        query = query.filter_by(seller_id=user_id)
     elif user.role == UserRole.ADMIN.value:
         # Admins can see all meetings
-        meetings = Meeting.query.all()
+        pass
     else:
         return jsonify({
             'error': 'Invalid user role'
         }), 400
     
+    if not paginate:
+        meetings = query.all()
+        return jsonify({
+            'meetings': [m.to_dict() for m in meetings]
+        }), 200
+    
+    # Validate pagination parameters
+    if limit is None:
+        limit = DEFAULT_MEETING_PAGE_SIZE
+    elif limit < 1:
+        return jsonify({
+            'error': 'limit must be at least 1'
+        }), 400
+    limit = min(limit, MAX_MEETING_PAGE_SIZE)
+    
+    if cursor:
+        query = query.filter(Meeting.id > cursor)
+    
+    # Fetch one extra row to know whether another page exists
+    meetings = query.order_by(Meeting.id.asc()).limit(limit + 1).all()
+    has_next = len(meetings) > limit
+    meetings = meetings[:limit]
+    
     return jsonify({
-        'meetings': [m.to_dict() for m in meetings]
+        'meetings': [m.to_dict() for m in meetings],
+        'pagination': {
+            'limit': limit,
+            'next_cursor': meetings[-1].id if has_next else None,
+            'has_next': has_next
+        }
     }), 200
 
+@meeting.route('/export', methods=['GET'])
+@admin_required
+def export_meetings():
+    """Stream all meetings as NDJSON or CSV (admin only)
+    
+    Rows are read through a server-side cursor in batches of EXPORT_BATCH_SIZE
+    and written to the response as they arrive, so the worker never holds the
+    full result set. Pass cursor=<last id> to resume an interrupted export.
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    cursor = request.args.get('cursor', None, type=int)
+    
+    if export_format not in ['ndjson', 'csv']:
+        return jsonify({
+            'error': 'Invalid format. Must be "ndjson" or "csv"'
+        }), 400
+    
+    query = Meeting.query.options(*Meeting.serialization_options())
+    if cursor:
+        query = query.filter(Meeting.id > cursor)
+    query = query.order_by(Meeting.id.asc()).yield_per(EXPORT_BATCH_SIZE)
+    
+    def generate_ndjson():
+        for m in query:
+            yield json.dumps(m.to_dict()) + '\n'
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_COLUMNS)
+        writer.writeheader()
+        for m in query:
+            writer.writerow(_meeting_csv_row(m.to_dict()))
+            # Flush the buffered line(s) to the client
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+    
+    if export_format == 'csv':
+        generator, mimetype = generate_csv, 'text/csv'
+    else:
+        generator, mimetype = generate_ndjson, 'application/x-ndjson'
+    
+    return Response(
+        stream_with_context(generator()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=meetings.{export_format}'}
+    )
+
+def _meeting_csv_row(meeting_dict):
+    """Flatten a serialized meeting into a CSV export row"""
+    time_slot = meeting_dict['time_slot'] or {}
+    attendee = meeting_dict['attendee'] or {}
+    return {
+        'id': meeting_dict['id'],
+        'status': meeting_dict['status'],
+        'buyer_id': meeting_dict['buyer_id'],
+        'buyer_username': meeting_dict['buyer']['username'],
+        'buyer_email': meeting_dict['buyer']['email'],
+        'buyer_organization': meeting_dict['buyer']['organization'],
+        'seller_id': meeting_dict['seller_id'],
+        'seller_username': meeting_dict['seller']['username'],
+        'seller_email': meeting_dict['seller']['email'],
+        'seller_business_name': meeting_dict['seller']['business_name'],
+        'requestor_id': meeting_dict['requestor_id'],
+        'time_slot_id': meeting_dict['time_slot_id'],
+        'start_time': time_slot.get('start_time'),
+        'end_time': time_slot.get('end_time'),
+        'attendee_id': meeting_dict['attendee_id'],
+        'attendee_name': attendee.get('name'),
+        'meeting_date': meeting_dict['meeting_date'],
+        'meeting_time': meeting_dict['meeting_time'],
+        'notes': meeting_dict['notes'],
+        'created_at': meeting_dict['created_at'],
+        'updated_at': meeting_dict['updated_at']
+    }
+
+@meeting.route('/auto-schedule', methods=['POST'])
+@admin_required
+def auto_schedule_meetings():
+    """Plan buyer/seller meetings into free seller time slots by matching interests (admin only)
+    
+    Optional body: {"buyer_ids": [...], "seller_ids": [...], "commit": false}. Returns the
+    timetable as a preview; with "commit": true the meetings are created as pending
+    requests in the same transaction.
+    """
+    data = request.get_json(silent=True) or {}
+    commit = bool(data.get('commit', False))
+    
+    for field in ('buyer_ids', 'seller_ids'):
+        if data.get(field) is not None and (
+            not isinstance(data[field], list) or not all(isinstance(i, int) for i in data[field])
+        ):
+            return jsonify({
+                'error': f'{field} must be a list of user ids'
+            }), 400
+    
+    try:
+        assignments, summary = schedule_meetings(
+            buyer_ids=data.get('buyer_ids'),
+            seller_ids=data.get('seller_ids'),
+            commit=commit,
+            requestor_id=int(get_jwt_identity())
+        )
+        if commit and assignments:
+            db.session.commit()
+        else:
+            db.session.rollback()
+    except BookingError as e:
+        return jsonify({
+            'error': e.message
+        }), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'error': f'Failed to schedule meetings: {str(e)}'
+        }), 500
+    
+    return jsonify({
+        'committed': commit and bool(assignments),
+        'meetings': [
+            dict(a, start_time=a['start_time'].isoformat(), end_time=a['end_time'].isoformat())
+            for a in assignments
+        ],
+        'summary': summary
+    }), 201 if commit and assignments else 200
+
 @meeting.route('/<int:meeting_id>', methods=['GET'])
 @jwt_required()
 def get_meeting(meeting_id):
@@ -87,8 +274,7 @@ def create_buyer_meeting_request():
             }), 400
     
     # Check if meetings are enabled
-    meetings_enabled = SystemSetting.query.filter_by(key='meetings_enabled').first()
-    if not meetings_enabled or meetings_enabled.value != 'true':
+    if not get_bool_setting('meetings_enabled'):
         return jsonify({
             'error': 'Meeting requests are currently disabled'
         }), 400
@@ -101,64 +287,13 @@ def create_buyer_meeting_request():
             'error': 'Invalid seller ID format'
         }), 400
     
-    # Check if the seller exists
-    seller = User.query.get(seller_id)
-    if not seller or seller.role != UserRole.SELLER.value:
-        return jsonify({
-            'error': 'Invalid seller'
-        }), 400
-    """
-    # Check if the time slot exists and is available
-    time_slot = TimeSlot.query.get(data['time_slot_id'])
-    if not time_slot:
-        return jsonify({
-            'error': 'Time slot not found'
-        }), 404
-    
-    if not time_slot.is_available:
+    try:
+        meeting = book_meeting(buyer_id, seller_id, requestor_id=buyer_id, notes=data.get('notes', ''))
+    except BookingError as e:
         return jsonify({
-            'error': 'Time slot is not available'
-        }), 400
+            'error': e.message
+        }), e.status_code
     
-    # Check if the time slot belongs to the seller
-    if time_slot.user_id != data['seller_id']:
-        return jsonify({
-            'error': 'Time slot does not belong to the specified seller'
-        }), 400
-    """
-    # Check for existing meeting
-    meeting = Meeting.query.filter_by(buyer_id=buyer_id, seller_id=seller_id).first()
-    if meeting:
-        # ✅ ENHANCEMENT: Check if existing meeting status allows new request
-        # Get status as lowercase string for case-insensitive comparison
-        if hasattr(meeting.status, 'value'):
-            status_lower = meeting.status.value.lower()
-        else:
-            status_lower = str(meeting.status).lower()
-        
-        # Allow new meeting if previous was cancelled or expired
-        if status_lower not in ['cancelled', 'expired']:
-            return jsonify({
-                'error': f'Meeting request already exists with status: {meeting.status.value if hasattr(meeting.status, "value") else meeting.status}'
-            }), 400
-        
-        # If cancelled or expired, we'll create a new meeting (continue with creation)
-    
-    # Create the meeting
-    meeting = Meeting(
-        buyer_id=buyer_id,
-        seller_id=seller_id,
-        requestor_id=buyer_id,  # Set requestor_id to current buyer
-        #time_slot_id=data['time_slot_id'],
-        notes=data.get('notes', ''),
-        status=MeetingStatus.PENDING
-    )
-    
-    # Mark the time slot as unavailable
-    #time_slot.is_available = False
-    #time_slot.meeting_id = meeting.id
-    
-    db.session.add(meeting)
     db.session.commit()
     
     return jsonify({
@@ -183,8 +318,7 @@ def create_seller_meeting_request():
             }), 400
     
     # Check if meetings are enabled
-    meetings_enabled = SystemSetting.query.filter_by(key='meetings_enabled').first()
-    if not meetings_enabled or meetings_enabled.value != 'true':
+    if not get_bool_setting('meetings_enabled'):
         return jsonify({
             'error': 'Meeting requests are currently disabled'
         }), 400
@@ -197,46 +331,13 @@ def create_seller_meeting_request():
             'error': 'Invalid buyer ID format'
         }), 400
     
-    # Check if the buyer exists
-    buyer = User.query.get(buyer_id)
-    if not buyer or buyer.role != UserRole.BUYER.value:
+    try:
+        meeting = book_meeting(buyer_id, seller_id, requestor_id=seller_id, notes=data.get('notes', ''))
+    except BookingError as e:
         return jsonify({
-            'error': 'Invalid buyer'
-        }), 400
-
-    # Check for existing meeting
-    meeting = Meeting.query.filter_by(buyer_id=buyer_id, seller_id=seller_id).first()
-    if meeting:
-        # ✅ ENHANCEMENT: Check if existing meeting status allows new request
-        # Get status as lowercase string for case-insensitive comparison
-        if hasattr(meeting.status, 'value'):
-            status_lower = meeting.status.value.lower()
-        else:
-            status_lower = str(meeting.status).lower()
-        
-        # Allow new meeting if previous was cancelled or expired
-        if status_lower not in ['cancelled', 'expired']:
-            return jsonify({
-                'error': f'Meeting request already exists with status: {meeting.status.value if hasattr(meeting.status, "value") else meeting.status}'
-            }), 400
-        
-        # If cancelled or expired, we'll create a new meeting (continue with creation)
-    
-    # Create the meeting
-    meeting = Meeting(
-        buyer_id=buyer_id,
-        seller_id=seller_id,
-        requestor_id=seller_id,  # Set requestor_id to current seller
-        #time_slot_id=data['time_slot_id'],
-        notes=data.get('notes', ''),
-        status=MeetingStatus.PENDING
-    )
+            'error': e.message
+        }), e.status_code
     
-    # Mark the time slot as unavailable
-    #time_slot.is_available = False
-    #time_slot.meeting_id = meeting.id
-    
-    db.session.add(meeting)
     db.session.commit()
     
     return jsonify({
@@ -309,14 +410,13 @@ def update_meeting_status(meeting_id):
             'error': f'Cannot update meeting status. Current status: {meeting.status.value}'
         }), 400
     
-    # Update the meeting status
-    meeting.status = new_status
-    
-    # If rejected, free up the time slot
-    if new_status == MeetingStatus.REJECTED and meeting.time_slot:
-        meeting.time_slot.is_available = True
-        meeting.time_slot.meeting_id = None
-    
+    # Update the meeting status (a rejected meeting frees its time slot and quota place)
+    try:
+        set_meeting_status(meeting, new_status)
+    except BookingError as e:
+        return jsonify({
+            'error': e.message
+        }), e.status_code
     db.session.commit()
     
     return jsonify({
@@ -324,11 +424,62 @@ def update_meeting_status(meeting_id):
         'meeting': meeting.to_dict()
     }), 200
 
+@meeting.route('/status', methods=['PUT'])
+@jwt_required()
+def bulk_update_meeting_status():
+    """Accept, reject or cancel many meetings at once
+    
+    Body: {"meeting_ids": [...], "status": "accepted" | "rejected" | "cancelled"}. Each id
+    is checked as by the single-meeting routes; the response lists a result per id.
+    """
+    data = request.get_json(silent=True) or {}
+    user_id = int(get_jwt_identity())
+    
+    meeting_ids = data.get('meeting_ids')
+    if not isinstance(meeting_ids, list) or not meeting_ids or not all(
+        isinstance(i, int) and not isinstance(i, bool) for i in meeting_ids
+    ):
+        return jsonify({
+            'error': 'meeting_ids must be a non-empty list of meeting ids'
+        }), 400
+    meeting_ids = list(dict.fromkeys(meeting_ids))
+    if len(meeting_ids) > MAX_BULK_STATUS_MEETINGS:
+        return jsonify({
+            'error': f'At most {MAX_BULK_STATUS_MEETINGS} meetings can be updated at once'
+        }), 400
+    
+    try:
+        new_status = MeetingStatus(data.get('status'))
+    except ValueError:
+        new_status = None
+    if new_status not in (MeetingStatus.ACCEPTED, MeetingStatus.REJECTED, MeetingStatus.CANCELLED):
+        return jsonify({
+            'error': 'Invalid status. Must be "accepted", "rejected" or "cancelled"'
+        }), 400
+    
+    user = db.session.get(User, user_id)
+    if not user:
+        return jsonify({
+            'error': 'User not found'
+        }), 404
+    
+    results = bulk_set_meeting_status(meeting_ids, new_status, user_id, is_admin=user.role == UserRole.ADMIN.value)
+    db.session.commit()
+    
+    return jsonify({
+        'updated': sum(1 for refusal in results.values() if refusal is None),
+        'results': [
+            {'id': meeting_id, 'status': new_status.value} if refusal is None
+            else {'id': meeting_id, 'error': refusal[0], 'code': refusal[1]}
+            for meeting_id, refusal in results.items()
+        ]
+    }), 200
+
 @meeting.route('/<int:meeting_id>', methods=['DELETE'])
 @jwt_required()
 def cancel_meeting(meeting_id):
     """Cancel a meeting"""
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     
     # Get the meeting
     meeting = Meeting.query.get(meeting_id)
@@ -350,14 +501,13 @@ def cancel_meeting(meeting_id):
             'error': f'Cannot cancel meeting with status: {meeting.status.value}'
         }), 400
     
-    # Update the meeting status
-    meeting.status = MeetingStatus.CANCELLED
-    
-    # Free up the time slot
-    if meeting.time_slot:
-        meeting.time_slot.is_available = True
-        meeting.time_slot.meeting_id = None
-    
+    # Cancel the meeting, freeing its time slot and quota place
+    try:
+        set_meeting_status(meeting, MeetingStatus.CANCELLED)
+    except BookingError as e:
+        return jsonify({
+            'error': e.message
+        }), e.status_code
     db.session.commit()
     
     return jsonify({
@@ -1,8 +1,6 @@
-from nc_py_api import Nextcloud, NextcloudException
-from io import BytesIO
-from PIL import Image
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import selectinload
 from urllib.parse import urlparse
 
 import logging
@@ -17,40 +15,82 @@ from ..models import (
     MigrationMappingSellers, SystemSetting
 )
 from ..utils.auth import seller_required, admin_required
+from ..utils.external_storage import get_external_storage
+from ..utils.image_pipeline import (
+    spool_upload, discard_spooled, validate_image, InvalidImage, FileTooLarge, queue_image_upload
+)
 
 seller = Blueprint('seller', __name__, url_prefix='/api/sellers')
 
+# Sellers per page of GET /api/sellers when only a cursor is given, and the most that can be asked for
+DEFAULT_SELLER_PAGE_SIZE = 50
+MAX_SELLER_PAGE_SIZE = 100
+
 @seller.route('', methods=['GET'])
 @jwt_required()
 def get_sellers():
-    """Get all sellers with optional filtering"""
+    """Get sellers with optional filtering; keyset-paginated by profile id when limit or cursor is given"""
     # Get query parameters
     name = request.args.get('name', '')
     seller_type = request.args.get('seller_type', '')
     target_market = request.args.get('target_market', '')
     
-    # Get all seller profiles and filter by user role in Python to avoid JOIN issues
-    all_profiles = SellerProfile.query.all()
+    # Optional keyset pagination: pass limit and/or cursor (the last profile id seen)
+    limit = request.args.get('limit', None, type=int)
+    cursor = request.args.get('cursor', None, type=int)
+    paginate = limit is not None or cursor is not None
     
-    # Filter profiles where the associated user has role='seller'
-    seller_profiles = []
-    for profile in all_profiles:
-        user = User.query.get(profile.user_id)
-        if user and user.role == 'seller':
-            seller_profiles.append(profile)
+    # Validate pagination parameters
+    if limit is None:
+        limit = DEFAULT_SELLER_PAGE_SIZE
+    elif limit < 1:
+        return jsonify({
+            'error': 'limit must be at least 1'
+        }), 400
+    limit = min(limit, MAX_SELLER_PAGE_SIZE)
+    
+    # Only profiles whose associated user has role='seller'
+    query = SellerProfile.query.join(
+        User, User.id == SellerProfile.user_id
+    ).filter(
+        User.role == UserRole.SELLER.value
+    ).options(
+        selectinload(SellerProfile.property_type),
+        selectinload(SellerProfile.target_market_relationships)
+    )
     
     # Apply filters if provided
     if name:
-        seller_profiles = [s for s in seller_profiles if name.lower() in s.business_name.lower()]
+        query = query.filter(SellerProfile.business_name.ilike(f'%{name}%'))
     
     if seller_type:
-        seller_profiles = [s for s in seller_profiles if s.seller_type == seller_type]
+        query = query.filter(SellerProfile.seller_type == seller_type)
     
     if target_market:
-        seller_profiles = [s for s in seller_profiles if s.target_market == target_market]
+        query = query.filter(SellerProfile.target_market == target_market)
+    
+    if not paginate:
+        seller_profiles = query.order_by(SellerProfile.id.asc()).all()
+        return jsonify({
+            'sellers': [s.to_dict() for s in seller_profiles]
+        }), 200
+    
+    # Resume after the last profile of the previous page
+    if cursor:
+        query = query.filter(SellerProfile.id > cursor)
+    
+    # Fetch one extra row to know whether another page exists
+    seller_profiles = query.order_by(SellerProfile.id.asc()).limit(limit + 1).all()
+    has_next = len(seller_profiles) > limit
+    seller_profiles = seller_profiles[:limit]
     
     return jsonify({
-        'sellers': [s.to_dict() for s in seller_profiles]
+        'sellers': [s.to_dict() for s in seller_profiles],
+        'pagination': {
+            'limit': limit,
+            'next_cursor': seller_profiles[-1].id if has_next else None,
+            'has_next': has_next
+        }
     }), 200
 
 @seller.route('/<int:seller_id>', methods=['GET'])
@@ -219,13 +259,6 @@ def generate_microsite_url():
 @seller_required
 def upload_seller_images():
     """Upload multiple business images for the current seller"""
-    import os
-    import requests
-    import uuid
-    from datetime import datetime
-    from werkzeug.utils import secure_filename
-    import base64
-    
     user_id = get_jwt_identity()
     # Convert to int if it's a string
     if isinstance(user_id, str):
@@ -251,19 +284,9 @@ def upload_seller_images():
     if len(files) > 5:
         return jsonify({'error': 'Maximum 5 images allowed'}), 400
     
-    # Get external storage credentials from environment
-    storage_url = os.getenv('EXTERNAL_STORAGE_URL')+"index.php"
-    storage_user = os.getenv('EXTERNAL_STORAGE_USER')
-    storage_password = os.getenv('EXTERNAL_STORAGE_PASSWORD')
-    ocs_url = os.getenv("EXTERNAL_STORAGE_URL")+'ocs/v2.php/apps/files_sharing/api/v1/shares'
-    ocs_headers = {'OCS-APIRequest': 'true',"Accept": "application/json"}
-    ocs_auth = (storage_user, storage_password)  # Use app password or user/pass
-    
-    if not all([storage_url, storage_user, storage_password]):
+    if get_external_storage() is None:
         return jsonify({'error': 'External storage configuration missing'}), 500
     
-    nc = Nextcloud(nextcloud_url=storage_url, nc_auth_user=storage_user, nc_auth_pass=storage_password)
-    
     # Validate files
     allowed_extensions = {'jpg', 'jpeg', 'png'}
     max_size = 2 * 1024 * 1024  # 2MB
@@ -280,18 +303,25 @@ def upload_seller_images():
             errors.append(f"File '{file.filename}' has invalid format. Only JPEG and PNG are allowed.")
             continue
         
-        # Check file size
-        file.seek(0, 2)  # Seek to end
-        file_size = file.tell()
-        file.seek(0)  # Reset to beginning
-        
-        if file_size > max_size:
+        # Copy to a temporary file in chunks, stopping as soon as the size limit is passed
+        try:
+            path = spool_upload(file, max_size)
+        except FileTooLarge:
             errors.append(f"File '{file.filename}' exceeds 2MB limit.")
             continue
+        
+        # Check that the content really is an image
+        try:
+            validate_image(path)
+        except InvalidImage:
+            discard_spooled([(file.filename, file.content_type, path)])
+            errors.append(f"File '{file.filename}' is not a valid image.")
+            continue
             
-        valid_files.append(file)
+        valid_files.append((file.filename, file.content_type, path))
     
     if errors:
+        discard_spooled(valid_files)
         return jsonify({'error': 'File validation failed', 'details': errors}), 400
     
     if not valid_files:
@@ -299,144 +329,16 @@ def upload_seller_images():
     
     # If total images would exceed 5, replace all existing images
     existing_images = seller_profile.business_images or []
-    if len(existing_images) + len(valid_files) > 5:
-        # Replace all existing images
-        seller_profile.business_images = []
-        db.session.commit()
-    
-    # Upload files to external storage
-    uploaded_images = []
-    upload_errors = []
-    
-    # Create seller directory path
-    seller_dir = f"seller_{user_id}"
-    #remote_dir_path = f"{storage_url}/{seller_dir}"
-    remote_dir_path = f"/Photos/{seller_dir}"
-    try:
-        nc.files.listdir(remote_dir_path)
-        logging.debug(f"Found remote path:: {remote_dir_path}")
-    except NextcloudException as e:
-        if e.status_code != 404:
-            raise e
-        else:
-            try:
-                logging.info(f"Could not locate remote directory::: {remote_dir_path}::: Proceeding to create")
-                nc.files.mkdir(remote_dir_path)
-                logging.debug(f"Created remote directory {remote_dir_path} successfully")
-                logging.debug("Now setting sharing permissions...")
-                seller_dir_sharing_data = {
-                    'path': remote_dir_path,         # Folder you created
-                    'shareType': 3,                  # Public link
-                    'permissions': 1                 # Read-only
-                }
-                response = requests.post(ocs_url, headers=ocs_headers, data=seller_dir_sharing_data, auth=ocs_auth)
-
-                if response.status_code == 200:
-                    logging.info(f"Response Text is:: {response}")
-                    share_info = response.json()
-                    link = share_info['ocs']['data']['url']
-                    logging.debug(f"Public Share URL: {link}")
-                else:
-                    logging.debug("Failed to create share:", response.text)
-            except Exception as e:
-                logging.debug(f"Exception while creating seller directory:{str(e)}")
-                return jsonify({"Exception": f"Failed to create seller directory -- {remote_dir_path} - the error is ::::{str(e)}"}), 500
-
-    for file in valid_files:
-        try:
-            # Generate unique filename
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-            unique_id = str(uuid.uuid4())[:8]
-            secure_name = secure_filename(file.filename)
-            filename = f"{timestamp}{unique_id}{secure_name}"
-            
-            # Prepare file data for upload
-            file_data = file.read()
-            file.seek(0)  # Reset for potential retry
-            
-            # Create basic auth header
-            auth_string = f"{storage_user}:{storage_password}"
-            auth_bytes = auth_string.encode('ascii')
-            auth_b64 = base64.b64encode(auth_bytes).decode('ascii')
-            
-            # Upload to external storage
-            upload_url = f"{remote_dir_path}/{filename}"
-            """
-            headers = {
-                'Authorization': f'Basic {auth_b64}',
-                'Content-Type': file.content_type or 'application/octet-stream'
-            }
-            """
-            # Upload file
-            try:
-                #with open(file, 'rb') as f:
-                    #nc.files.upload_stream(upload_url, f)
-                buf = BytesIO(file_data)  
-                buf.seek(0)
-                logging.info(f"Uploading file :::: {upload_url}")
-                uploaded_file = nc.files.upload_stream(upload_url, buf)
-                logging.info(f"The uploaded file data is::: {(uploaded_file.name)}")
-                # Now give it a publicly available link 
-                seller_file_sharing_data = {
-                    'path': upload_url,              # Uploaded file
-                    'shareType': 3,                  # Public link
-                    'permissions': 1                 # Read-only
-                }
-                response = requests.post(ocs_url, headers=ocs_headers, data=seller_file_sharing_data, auth=ocs_auth)
-                file_public_url=""
-                if response.status_code == 200:
-                    result = response.json()
-                    if result["ocs"]["meta"]["status"] == "ok":
-                        file_public_url = result["ocs"]["data"]["url"]
-                        logging.debug(f"Public share URL: {file_public_url}")
-                    else:
-                        logging.error(f"Share API error: {result['ocs']['meta']['message']}")
-                else:
-                    print("HTTP error:", response.status_code, response.text)
-                image_record = {
-                    'id': str(uuid.uuid4()),
-                    'filename': file.filename,
-                    'url': file_public_url+"/download",
-                    'size': len(file_data),
-                    'uploaded_at': datetime.utcnow().isoformat(),
-                    'mime_type': file.content_type or 'image/jpeg'
-                }
-                uploaded_images.append(image_record)
-
-            except Exception as e:
-                logging.debug(f"Exception while uploading file:{e}")
-                return jsonify({'Exception': f'Failed to upload file {upload_url}:::{str(e)}'}), 500
-
-            
-        except Exception as e:
-            upload_errors.append(f"Error uploading '{file.filename}': {str(e)}")
-    
-    if not uploaded_images and upload_errors:
-        return jsonify({'error': 'All uploads failed', 'details': upload_errors}), 500
+    replace_existing = len(existing_images) + len(valid_files) > 5
     
-    # Update seller profile with new images
-    current_images = seller_profile.business_images or []
-    updated_images = current_images + uploaded_images
-    seller_profile.business_images = updated_images
+    # Re-encoding, thumbnails and the upload to external storage happen in the background
+    upload = queue_image_upload(user_id, 'seller_images', valid_files, replace_existing=replace_existing)
     
-    try:
-        db.session.commit()
-        
-        response_data = {
-            'message': 'Images uploaded successfully',
-            'uploaded_images': uploaded_images,
-            'total_images': len(updated_images),
-            'replaced_existing': len(existing_images) + len(valid_files) > 5
-        }
-        
-        if upload_errors:
-            response_data['warnings'] = upload_errors
-            
-        return jsonify(response_data), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': 'Failed to save image records', 'message': str(e)}), 500
+    return jsonify({
+        'message': 'Images are being processed',
+        'upload': upload.to_dict(),
+        'replaced_existing': replace_existing
+    }), 202
 
 @seller.route('/profile', methods=['PUT'])
 @jwt_required()
@@ -893,14 +795,6 @@ def get_seller_by_microsite(microsite_path):
 @seller_required
 def upload_seller_logo():
     """Upload business logo for the current seller"""
-    import os
-    import requests
-    import uuid
-    from datetime import datetime
-    from werkzeug.utils import secure_filename
-    import base64
-    import logging
-    
     user_id = get_jwt_identity()
     # Convert to int if it's a string
     if isinstance(user_id, str):
@@ -929,157 +823,27 @@ def upload_seller_logo():
     if file_ext not in allowed_extensions:
         return jsonify({'error': 'Invalid file type. Only JPEG, PNG, and ICO files are allowed'}), 400
     
-    # Check file size (1MB limit)
-    file.seek(0, 2)  # Seek to end
-    file_size = file.tell()
-    file.seek(0)  # Reset to beginning
+    if get_external_storage() is None:
+        return jsonify({'error': 'External storage configuration missing'}), 500
     
-    if file_size > 1 * 1024 * 1024:  # 1MB
+    # Copy to a temporary file in chunks, stopping as soon as the 1MB limit is passed
+    try:
+        path = spool_upload(file, 1 * 1024 * 1024)
+    except FileTooLarge:
         return jsonify({'error': 'File size exceeds 1MB limit'}), 400
+    spooled = [(file.filename, file.content_type, path)]
     
-    # Get external storage credentials from environment
-    storage_url = os.getenv('EXTERNAL_STORAGE_URL')+"index.php"
-    storage_user = os.getenv('EXTERNAL_STORAGE_USER')
-    storage_password = os.getenv('EXTERNAL_STORAGE_PASSWORD')
-    ocs_url = os.getenv("EXTERNAL_STORAGE_URL")+'ocs/v2.php/apps/files_sharing/api/v1/shares'
-    ocs_headers = {'OCS-APIRequest': 'true',"Accept": "application/json"}
-    ocs_auth = (storage_user, storage_password)  # Use app password or user/pass
-    
-    if not all([storage_url, storage_user, storage_password]):
-        return jsonify({'error': 'External storage configuration missing'}), 500
+    # Check that the content really is an image
+    try:
+        validate_image(path)
+    except InvalidImage:
+        discard_spooled(spooled)
+        return jsonify({'error': 'File is not a valid image'}), 400
     
-    nc = Nextcloud(nextcloud_url=storage_url, nc_auth_user=storage_user, nc_auth_pass=storage_password)
+    # Re-encoding and the upload to external storage happen in the background
+    upload = queue_image_upload(user_id, 'seller_logo', spooled)
     
-    try:
-        seller_base_dir_available = False
-        seller_logo_dir_available = False
-        # Create seller directory path if it doesn't exist
-        seller_dir = f"seller_{user_id}"
-        remote_dir_path = f"/Photos/{seller_dir}"
-        remote_logo_dir_path = f"{remote_dir_path}/logo"
-        try:
-            nc.files.listdir(remote_dir_path)
-            logging.debug(f"Found remote path:: {remote_dir_path}")
-            seller_base_dir_available = True
-        except NextcloudException as e:
-            if e.status_code != 404:
-                raise e
-            else:
-                try:
-                    logging.info(f"Could not locate remote directory::: {remote_dir_path}::: Proceeding to create")
-                    nc.files.mkdir(remote_dir_path)
-                    logging.debug(f"Created remote directory {remote_dir_path} successfully")
-                    logging.debug("Now setting sharing permissions...")
-                    seller_dir_sharing_data = {
-                        'path': remote_dir_path,         # Folder you created
-                        'shareType': 3,                  # Public link
-                        'permissions': 1                 # Read-only
-                    }
-                    response = requests.post(ocs_url, headers=ocs_headers, data=seller_dir_sharing_data, auth=ocs_auth)
-
-                    if response.status_code == 200:
-                        logging.info(f"Response Text is:: {response}")
-                        share_info = response.json()
-                        link = share_info['ocs']['data']['url']
-                        logging.debug(f"Public Share URL: {link}")
-                        seller_base_dir_available = True
-                    else:
-                        seller_base_dir_available = False
-                        logging.debug("Failed to create share:", response.text)
-                except Exception as e:
-                    logging.debug(f"Exception while creating seller directory:{str(e)}")
-                    return jsonify({"Exception": f"Failed to create base seller directory -- {remote_dir_path} - the error is ::::{str(e)}"}), 500
-        
-        # Now check if logo directory exists and if not, create it
-        if seller_base_dir_available: 
-            try:
-                nc.files.listdir(remote_logo_dir_path)
-                logging.debug(f"Found remote logo dir path:: {remote_logo_dir_path}")
-                seller_logo_dir_available = True
-            except NextcloudException as e:
-                if e.status_code != 404:
-                    raise e
-                else:
-                    try:
-                        logging.info(f"Could not locate remote logo directory::: {remote_logo_dir_path}::: Proceeding to create")
-                        nc.files.mkdir(remote_logo_dir_path)
-                        logging.debug(f"Created remote directory {remote_logo_dir_path} successfully")
-                        logging.debug("Now setting sharing permissions...")
-                        seller_dir_sharing_data = {
-                            'path': remote_dir_path,         # Folder you created
-                            'shareType': 3,                  # Public link
-                            'permissions': 1                 # Read-only
-                        }
-                        response = requests.post(ocs_url, headers=ocs_headers, data=seller_dir_sharing_data, auth=ocs_auth)
-
-                        if response.status_code == 200:
-                            logging.info(f"Response Text is:: {response}")
-                            share_info = response.json()
-                            link = share_info['ocs']['data']['url']
-                            logging.debug(f"Public Share URL: {link}")
-                            seller_logo_dir_available = True
-                        else:
-                            seller_logo_dir_available = False
-                            logging.debug("Failed to create share:", response.text)
-                    except Exception as e:
-                        logging.debug(f"Exception while creating seller logo directory:{str(e)}")
-                        return jsonify({"Exception": f"Failed to create seller logo directory -- {remote_logo_dir_path} - the error is ::::{str(e)}"}), 500
-
-        # Generate unique filename for logo
-        secure_name = secure_filename(file.filename)
-        filename = f"logo_{user_id}_{secure_name}"
-        
-        # Prepare file data for upload
-        file_data = file.read()
-        file.seek(0)  # Reset for potential retry
-        
-        # Upload to external storage
-        upload_url = f"{remote_logo_dir_path}/{filename}"
-        
-        try:
-            buf = BytesIO(file_data)  
-            buf.seek(0)
-            logging.info(f"Uploading logo file :::: {upload_url}")
-            uploaded_file = nc.files.upload_stream(upload_url, buf)
-            logging.info(f"The uploaded file data is::: {(uploaded_file.name)}")
-            
-            # Now give it a publicly available link 
-            seller_file_sharing_data = {
-                'path': upload_url,              # Uploaded file
-                'shareType': 3,                  # Public link
-                'permissions': 1                 # Read-only
-            }
-            response = requests.post(ocs_url, headers=ocs_headers, data=seller_file_sharing_data, auth=ocs_auth)
-            file_public_url = ""
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result["ocs"]["meta"]["status"] == "ok":
-                    file_public_url = result["ocs"]["data"]["url"]
-                    logging.debug(f"Public share URL: {file_public_url}")
-                else:
-                    logging.error(f"Share API error: {result['ocs']['meta']['message']}")
-                    return jsonify({'error': 'Failed to create public share for logo'}), 500
-            else:
-                logging.error(f"HTTP error: {response.status_code} {response.text}")
-                return jsonify({'error': 'Failed to create public share for logo'}), 500
-            
-            # Update seller profile with new logo URL
-            seller_profile.logo_url = file_public_url + "/download"
-            
-            try:
-                db.session.commit()
-                return jsonify({
-                    'message': 'Logo uploaded successfully',
-                    'seller': seller_profile.to_dict()
-                }), 200
-            except Exception as e:
-                db.session.rollback()
-                return jsonify({'error': f'Failed to update profile with logo URL: {str(e)}'}), 500
-                
-        except Exception as e:
-            logging.debug(f"Exception while uploading logo file:{e}")
-            return jsonify({'error': f'Failed to upload logo file {upload_url}:::{str(e)}'}), 500
-            
-    except Exception as e:
-        return jsonify({'error': f'Failed to upload logo: {str(e)}'}), 500
\ No newline at end of file
+    return jsonify({
+        'message': 'Logo is being processed',
+        'upload': upload.to_dict()
+    }), 202
@@ -1,7 +1,9 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..utils.auth import admin_required
 from ..models import db, SystemSetting
+from ..utils.system_settings import load_meeting_metadata, invalidate_settings, get_bool_setting
+from ..utils.booking import expire_pending_meetings, queue_pending_meeting_expiry
 import json
 
 system = Blueprint('system', __name__, url_prefix='/api/system')
@@ -34,6 +36,7 @@ def update_system_settings():
             db.session.add(setting)
     
     db.session.commit()
+    invalidate_settings()
     
     return jsonify({
         'message': 'Settings updated successfully',
@@ -74,6 +77,7 @@ def initialize_system_settings():
         db.session.add(setting)
     
     db.session.commit()
+    invalidate_settings()
     
     return jsonify({
         'message': 'Default settings initialized successfully',
@@ -100,65 +104,7 @@ def get_system_setting(key):
 def get_meeting_metadata():
     """Get meeting metadata configuration"""
     try:
-        # Get all meeting-related settings
-        meeting_keys = [
-            'meeting_duration',
-            'meeting_interval', 
-            'day_start_time',
-            'day_end_time',
-            'meeting_breaks',
-            'max_seller_attendees_per_day',
-            'max_buyer_meetings_per_day'
-        ]
-        
-        metadata = {}
-        for key in meeting_keys:
-            setting = SystemSetting.query.filter_by(key=key).first()
-            if setting:
-                if key == 'meeting_breaks':
-                    # Parse JSON for breaks
-                    try:
-                        metadata[key] = json.loads(setting.value)
-                    except (json.JSONDecodeError, TypeError):
-                        metadata[key] = []
-                elif key in ['meeting_duration', 'meeting_interval', 'max_seller_attendees_per_day', 'max_buyer_meetings_per_day']:
-                    # Convert to integer
-                    try:
-                        metadata[key] = int(setting.value)
-                    except (ValueError, TypeError):
-                        if key == 'meeting_duration':
-                            metadata[key] = 10
-                        elif key == 'meeting_interval':
-                            metadata[key] = 5
-                        elif key == 'max_seller_attendees_per_day':
-                            metadata[key] = 230
-                        elif key == 'max_buyer_meetings_per_day':
-                            metadata[key] = 30
-                else:
-                    metadata[key] = setting.value
-            else:
-                # Set defaults if not found
-                if key == 'meeting_duration':
-                    metadata[key] = 10
-                elif key == 'meeting_interval':
-                    metadata[key] = 5
-                elif key == 'day_start_time':
-                    metadata[key] = "9:00 AM"
-                elif key == 'day_end_time':
-                    metadata[key] = "5:00 PM"
-                elif key == 'meeting_breaks':
-                    metadata[key] = [
-                        {
-                            "id": 1,
-                            "label": "Lunch Break",
-                            "startTime": "12:00 PM",
-                            "endTime": "1:00 PM"
-                        }
-                    ]
-                elif key == 'max_seller_attendees_per_day':
-                    metadata[key] = 230
-                elif key == 'max_buyer_meetings_per_day':
-                    metadata[key] = 30
+        metadata = load_meeting_metadata()
         
         return jsonify({
             'metadata': metadata
@@ -264,6 +210,7 @@ def update_meeting_metadata():
                 db.session.add(setting)
         
         db.session.commit()
+        invalidate_settings()
         
         # Prepare response metadata
         response_metadata = {
@@ -335,6 +282,7 @@ def initialize_meeting_metadata():
             db.session.add(setting)
         
         db.session.commit()
+        invalidate_settings()
         
         return jsonify({
             'message': 'Meeting metadata initialized successfully',
@@ -386,34 +334,29 @@ def toggle_meetings():
             )
             db.session.add(setting)
         
-        # If meetings are being disabled, expire all pending meetings
-        if not enabled:
-            from ..models import Meeting, MeetingStatus, TimeSlot
-            
-            # Get all pending meetings
-            pending_meetings = Meeting.query.filter_by(status=MeetingStatus.PENDING).all()
-            
-            expired_count = 0
-            for meeting in pending_meetings:
-                # Change status to cancelled (we'll use this as "expired")
-                meeting.status = MeetingStatus.CANCELLED
-                
-                # Free up the associated time slot
-                if meeting.time_slot:
-                    meeting.time_slot.is_available = True
-                    meeting.time_slot.meeting_id = None
-                
-                expired_count += 1
-        
-        db.session.commit()
-        
         response_data = {
             'message': f'Meeting requests {"enabled" if enabled else "disabled"} successfully',
             'meetings_enabled': enabled
         }
         
-        if not enabled and 'expired_count' in locals():
-            response_data['expired_meetings'] = expired_count
+        # If meetings are being disabled, expire all pending meetings (cancelled, freeing their
+        # time slots and quota places). Large sets are expired in the background, after the
+        # setting is committed so no new requests arrive meanwhile.
+        if not enabled:
+            from ..models import Meeting, MeetingStatus
+            
+            pending_count = Meeting.query.filter_by(status=MeetingStatus.PENDING).count()
+            if pending_count > current_app.config.get('MEETING_EXPIRY_ASYNC_THRESHOLD', 5000):
+                db.session.commit()
+                invalidate_settings()
+                queue_pending_meeting_expiry()
+                response_data['expiring_meetings'] = pending_count
+                return jsonify(response_data), 202
+            
+            response_data['expired_meetings'] = expire_pending_meetings()
+        
+        db.session.commit()
+        invalidate_settings()
         
         return jsonify(response_data), 200
         
@@ -428,13 +371,8 @@ def toggle_meetings():
 def get_meetings_status():
     """Get the current status of meeting requests"""
     try:
-        setting = SystemSetting.query.filter_by(key='meetings_enabled').first()
-        
-        if not setting:
-            # Default to enabled if setting doesn't exist
-            enabled = True
-        else:
-            enabled = setting.value == 'true'
+        # Default to enabled if setting doesn't exist
+        enabled = get_bool_setting('meetings_enabled', True)
         
         return jsonify({
             'meetings_enabled': enabled
@@ -2,7 +2,8 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from ..models import db, TimeSlot, User, UserRole
-from ..utils.auth import seller_required
+from ..utils.auth import seller_required, admin_required
+from ..utils.slot_planner import get_schedule_template, slot_grid, insert_slots, regenerate_slots
 
 timeslot = Blueprint('timeslot', __name__, url_prefix='/api/timeslots')
 
@@ -45,88 +46,60 @@ def get_timeslots():
         'timeslots': [t.to_dict() for t in timeslots]
     }), 200
 
-@timeslot.route('', methods=['POST'])
-@jwt_required()
-@seller_required
-def create_timeslots():
-    """Create time slots for a seller"""
-    data = request.get_json()
-    user_id = get_jwt_identity()
-    
+def _parse_slot_date_range(data):
+    """Parse and validate start_date/end_date. Returns (start_date, end_date, error response)."""
     # Validate required fields
     required_fields = ['start_date', 'end_date']
     for field in required_fields:
         if field not in data:
-            return jsonify({
+            return None, None, (jsonify({
                 'error': f'Missing required field: {field}'
-            }), 400
+            }), 400)
     
     try:
         # Parse dates
         start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
         end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
-        
-        # Validate date range
-        if start_date > end_date:
-            return jsonify({
-                'error': 'Start date must be before end date'
-            }), 400
-        
-        if start_date < datetime.now():
-            return jsonify({
-                'error': 'Start date cannot be in the past'
-            }), 400
-        
-        # Limit to 90 days in the future
-        max_date = datetime.now() + timedelta(days=90)
-        if end_date > max_date:
-            return jsonify({
-                'error': 'End date cannot be more than 90 days in the future'
-            }), 400
-        
-        # Create time slots for each day in the range
-        current_date = start_date
-        created_slots = 0
-        
-        while current_date <= end_date:
-            # Start at 9 AM
-            start_hour = 9
-            
-            # Create slots until 5 PM (17:00)
-            while start_hour < 17:
-                for minute in [0, 15, 30, 45]:
-                    # Create the start and end times for this slot
-                    slot_start = datetime.combine(current_date.date(), datetime.min.time().replace(hour=start_hour, minute=minute))
-                    slot_end = slot_start + timedelta(minutes=15)
-                    
-                    # Skip if this slot is in the past
-                    if slot_start < datetime.now():
-                        continue
-                    
-                    # Check if this slot already exists
-                    existing_slot = TimeSlot.query.filter_by(
-                        user_id=user_id,
-                        start_time=slot_start,
-                        end_time=slot_end
-                    ).first()
-                    
-                    if not existing_slot:
-                        # Create the time slot
-                        time_slot = TimeSlot(
-                            user_id=user_id,
-                            start_time=slot_start,
-                            end_time=slot_end,
-                            is_available=True
-                        )
-                        db.session.add(time_slot)
-                        created_slots += 1
-                
-                # Move to the next hour
-                start_hour += 1
-            
-            # Move to the next day
-            current_date += timedelta(days=1)
-        
+    except ValueError as e:
+        return None, None, (jsonify({
+            'error': f'Invalid date format: {str(e)}'
+        }), 400)
+    
+    # Validate date range
+    if start_date > end_date:
+        return None, None, (jsonify({
+            'error': 'Start date must be before end date'
+        }), 400)
+    
+    if start_date < datetime.now():
+        return None, None, (jsonify({
+            'error': 'Start date cannot be in the past'
+        }), 400)
+    
+    # Limit to 90 days in the future
+    max_date = datetime.now() + timedelta(days=90)
+    if end_date > max_date:
+        return None, None, (jsonify({
+            'error': 'End date cannot be more than 90 days in the future'
+        }), 400)
+    
+    return start_date, end_date, None
+
+@timeslot.route('', methods=['POST'])
+@jwt_required()
+@seller_required
+def create_timeslots():
+    """Create time slots for a seller"""
+    data = request.get_json()
+    user_id = int(get_jwt_identity())
+    
+    start_date, end_date, error = _parse_slot_date_range(data)
+    if error:
+        return error
+    
+    try:
+        grid = slot_grid(get_schedule_template(), start_date, end_date)
+        created_slots = insert_slots([user_id], grid)[user_id]
         db.session.commit()
         
         return jsonify({
@@ -134,16 +107,96 @@ def create_timeslots():
             'created_slots': created_slots
         }), 201
         
-    except ValueError as e:
+    except Exception as e:
+        db.session.rollback()
         return jsonify({
-            'error': f'Invalid date format: {str(e)}'
-        }), 400
+            'error': f'Error creating time slots: {str(e)}'
+        }), 500
+
+def _resolve_seller_ids(data):
+    """Return (seller ids, error response): the requested seller_ids, or all sellers if none were given"""
+    requested = data.get('seller_ids')
+    if requested is not None and (
+        not isinstance(requested, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in requested)
+    ):
+        return None, (jsonify({
+            'error': 'seller_ids must be a list of user ids'
+        }), 400)
+    
+    seller_query = db.session.query(User.id).filter(User.role == UserRole.SELLER.value)
+    if requested is not None:
+        seller_query = seller_query.filter(User.id.in_(requested))
+    seller_ids = [seller_id for seller_id, in seller_query.order_by(User.id).all()]
+    if not seller_ids:
+        return None, (jsonify({
+            'error': 'No matching sellers found'
+        }), 404)
+    return seller_ids, None
+
+@timeslot.route('/bulk-create', methods=['POST'])
+@admin_required
+def bulk_create_timeslots():
+    """Create time slots for several sellers (all sellers if seller_ids is not given)"""
+    data = request.get_json()
+    
+    start_date, end_date, error = _parse_slot_date_range(data)
+    if error:
+        return error
+    
+    seller_ids, error = _resolve_seller_ids(data)
+    if error:
+        return error
+    
+    try:
+        created = insert_slots(seller_ids, slot_grid(get_schedule_template(), start_date, end_date))
+        db.session.commit()
+        
+        created_slots = sum(created.values())
+        return jsonify({
+            'message': f'Successfully created {created_slots} time slots for {len(seller_ids)} sellers',
+            'created_slots': created_slots,
+            'created_slots_by_seller': {str(seller_id): count for seller_id, count in created.items()}
+        }), 201
+        
     except Exception as e:
         db.session.rollback()
         return jsonify({
             'error': f'Error creating time slots: {str(e)}'
         }), 500
 
+@timeslot.route('/regenerate', methods=['POST'])
+@admin_required
+def regenerate_timeslots():
+    """Rebuild free time slots from the current meeting metadata (all sellers if seller_ids is not given)"""
+    data = request.get_json()
+    
+    start_date, end_date, error = _parse_slot_date_range(data)
+    if error:
+        return error
+    
+    seller_ids, error = _resolve_seller_ids(data)
+    if error:
+        return error
+    
+    try:
+        template = get_schedule_template()
+        created, deleted_slots = regenerate_slots(seller_ids, start_date, end_date, template)
+        db.session.commit()
+        
+        created_slots = sum(created.values())
+        return jsonify({
+            'message': f'Regenerated time slots for {len(seller_ids)} sellers',
+            'created_slots': created_slots,
+            'deleted_slots': deleted_slots,
+            'slots_per_day': len(template.slots)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'error': f'Error regenerating time slots: {str(e)}'
+        }), 500
+
 @timeslot.route('/<int:timeslot_id>', methods=['DELETE'])
 @jwt_required()
 @seller_required
@@ -0,0 +1,19 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from ..models import ImageUpload, UserRole
+
+uploads = Blueprint('uploads', __name__, url_prefix='/api/uploads')
+
+@uploads.route('/<string:upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """Get the processing status of an image upload"""
+    upload = ImageUpload.query.get(upload_id)
+    
+    # Users can only see their own uploads, admins can see all
+    if not upload or (upload.user_id != int(get_jwt_identity()) and get_jwt().get('role') != UserRole.ADMIN.value):
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    return jsonify({
+        'upload': upload.to_dict()
+    }), 200
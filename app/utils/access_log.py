@@ -0,0 +1,101 @@
+import json
+import logging
+import random
+import re
+import time
+from datetime import datetime, timezone
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('app.access')
+
+# Only bodies of these types are ever logged; file uploads (multipart) never are
+LOGGED_BODY_TYPES = ('application/json', 'application/x-www-form-urlencoded')
+SECRET_FIELD = re.compile(r'password|token|secret', re.IGNORECASE)
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.access_log_queries = g.get('access_log_queries', 0) + 1
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {key: '***' if SECRET_FIELD.search(str(key)) else _redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item) for item in value]
+    return value
+
+def _request_body(max_bytes):
+    """The request body if it is a small JSON or form payload, with secrets masked; None otherwise"""
+    if not max_bytes or request.mimetype not in LOGGED_BODY_TYPES:
+        return None
+    if request.content_length is None or request.content_length > max_bytes:
+        return None
+    if request.mimetype == 'application/json':
+        body = request.get_json(silent=True)
+    else:
+        body = request.form.to_dict()
+    return _redact(body)
+
+def access_log_entry(response, latency):
+    """The access log fields of the current request"""
+    entry = {
+        'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+        'method': request.method,
+        'route': request.url_rule.rule if request.url_rule else None,
+        'path': request.path,
+        'status': response.status_code,
+        'latency_ms': round(latency * 1000, 1),
+        'db_queries': g.get('access_log_queries', 0),
+        # Streamed responses have no length and are not buffered to measure one
+        'response_bytes': response.content_length,
+        'remote_addr': request.remote_addr
+    }
+    body = _request_body(g.access_log_body_max_bytes)
+    if body is not None:
+        entry['body'] = body
+    return entry
+
+def init_access_log(app):
+    """Log one JSON line per request to the 'app.access' logger.
+
+    ACCESS_LOG_SAMPLE_RATE of successful requests are logged. Requests
+    that fail (status 500 or more) or take longer than ACCESS_LOG_SLOW_MS
+    are always logged. With ACCESS_LOG_BODY_MAX_BYTES set, JSON and form
+    bodies up to that size are included with password/token fields masked.
+    """
+    if not app.config.get('ACCESS_LOG_ENABLED', True):
+        return
+
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+
+    @app.before_request
+    def start_access_log():
+        g.access_log_start = time.perf_counter()
+        # g outlives the request when an app context was already pushed (tests, CLI)
+        g.access_log_queries = 0
+        g.access_log_body_max_bytes = app.config.get('ACCESS_LOG_BODY_MAX_BYTES', 0)
+
+    @app.after_request
+    def write_access_log(response):
+        start = g.get('access_log_start')
+        if start is None:
+            return response
+        latency = time.perf_counter() - start
+        if (response.status_code < 500 and latency * 1000 < app.config.get('ACCESS_LOG_SLOW_MS', 1000)
+                and random.random() >= app.config.get('ACCESS_LOG_SAMPLE_RATE', 1.0)):
+            return response
+        try:
+            logger.info(json.dumps(access_log_entry(response, latency), default=str))
+        except Exception:
+            # Logging must never turn a response into an error
+            logger.exception('Could not write access log entry')
+        return response
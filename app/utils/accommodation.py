@@ -0,0 +1,373 @@
+from collections import Counter
+from datetime import date, datetime, time
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from ..models import db, User, UserRole, HostProperty, TravelPlan, Accommodation, BuyerProfile, BuyerCategory
+from .system_settings import get_setting, get_date_setting
+
+VALID_ROOM_TYPES = ['single', 'shared']
+
+# Stay window used when a buyer has not entered arrival/departure journeys yet
+DEFAULT_CHECK_IN_TIME = time(14, 0)
+DEFAULT_CHECK_OUT_TIME = time(11, 0)
+
+class AllocationError(ValueError):
+    """Raised when a bulk allocation cannot be applied; errors lists every problem found"""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} allocation(s) failed validation')
+        self.errors = errors
+
+def room_usage(shared_count, single_count):
+    """Return (rooms allocated, current guests) for a property's allocations.
+
+    Two shared allocations fill one room. Guests are counted as 1 per shared
+    and 2 per single allocation.
+    """
+    return (shared_count // 2) + single_count, (1 * shared_count) + (2 * single_count)
+
+def lock_host_properties(property_ids):
+    """Load host properties with SELECT ... FOR UPDATE, keyed by property_id.
+
+    Rows are locked in id order so concurrent allocations cannot deadlock.
+    The locks are held until the transaction ends.
+    """
+    if not property_ids:
+        return {}
+    properties = HostProperty.query.filter(
+        HostProperty.property_id.in_(property_ids)
+    ).order_by(HostProperty.property_id).with_for_update().all()
+    return {p.property_id: p for p in properties}
+
+def allocation_counts(property_ids):
+    """Return {property_id: Counter(room_type -> allocations)} in one query"""
+    counts = {property_id: Counter() for property_id in property_ids}
+    if not property_ids:
+        return counts
+    rows = db.session.query(
+        Accommodation.host_property_id, Accommodation.room_type, func.count(Accommodation.id)
+    ).filter(
+        Accommodation.host_property_id.in_(property_ids)
+    ).group_by(Accommodation.host_property_id, Accommodation.room_type).all()
+    for property_id, room_type, count in rows:
+        counts[property_id][room_type] = count
+    return counts
+
+def refresh_property_usage(host_property, counts=None):
+    """Recompute number_rooms_allocated and number_current_guests from the allocations"""
+    counts = counts if counts is not None else allocation_counts([host_property.property_id])[host_property.property_id]
+    host_property.number_rooms_allocated, host_property.number_current_guests = room_usage(
+        counts['shared'], counts['single']
+    )
+
+def parse_allocation_datetime(value):
+    """Parse an ISO datetime as sent by the admin UI (a trailing Z is accepted)"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def first_travel_plans(buyer_ids):
+    """Return {buyer_id: earliest TravelPlan} for the buyers that have one (one query)"""
+    if not buyer_ids:
+        return {}
+    plans = TravelPlan.query.filter(
+        TravelPlan.user_id.in_(buyer_ids)
+    ).distinct(TravelPlan.user_id).order_by(TravelPlan.user_id, TravelPlan.created_at.asc()).all()
+    return {plan.user_id: plan for plan in plans}
+
+def default_travel_plan(buyer_id):
+    """A travel plan for the configured event, for buyers that have none yet"""
+    return TravelPlan(
+        user_id=buyer_id,
+        event_name=get_setting('event_name', 'Splash25 Event'),
+        event_start_date=get_date_setting('event_start_date', date(2025, 6, 25)),
+        event_end_date=get_date_setting('event_end_date', date(2025, 6, 28)),
+        venue=get_setting('event_venue', 'Wayanad, Kerala'),
+        status="active",
+        created_at=datetime.utcnow()
+    )
+
+def _validate_assignment(index, assignment):
+    """Check one assignment's fields; returns (parsed assignment, error message)"""
+    for field in ['buyer_id', 'host_property_id', 'room_type', 'check_in_datetime', 'check_out_datetime']:
+        if assignment.get(field) is None:
+            return None, f'Missing required field: {field}'
+
+    if assignment['room_type'] not in VALID_ROOM_TYPES:
+        return None, f'Invalid room type. Must be one of: {VALID_ROOM_TYPES}'
+
+    try:
+        buyer_id = int(assignment['buyer_id'])
+        property_id = int(assignment['host_property_id'])
+        check_in = assignment['check_in_datetime']
+        check_out = assignment['check_out_datetime']
+        check_in = check_in if isinstance(check_in, datetime) else parse_allocation_datetime(check_in)
+        check_out = check_out if isinstance(check_out, datetime) else parse_allocation_datetime(check_out)
+    except (TypeError, ValueError, AttributeError) as e:
+        return None, f'Invalid data format: {str(e)}'
+
+    if check_out <= check_in:
+        return None, 'Check-out datetime must be after check-in datetime'
+
+    return {
+        'index': index,
+        'buyer_id': buyer_id,
+        'host_property_id': property_id,
+        'room_type': assignment['room_type'],
+        'check_in_datetime': check_in,
+        'check_out_datetime': check_out,
+        'special_notes': assignment.get('special_notes', '')
+    }, None
+
+def allocate_accommodations(assignments):
+    """Allocate host property rooms to many buyers in one transaction.
+
+    assignments is a list of dicts with buyer_id, host_property_id,
+    room_type, check_in_datetime and check_out_datetime (ISO strings or
+    datetimes), plus optional special_notes. Each buyer gets an accommodation
+    on their earliest travel plan. A default plan is created for buyers
+    that have none.
+
+    The affected host_properties rows are locked once. Capacity is checked in
+    memory against the counts taken under that lock. All rows are then
+    written in one flush. The call is all or nothing: if any assignment is
+    invalid, AllocationError lists every problem and nothing is written.
+    The caller commits.
+
+    Returns the new Accommodation rows in the order of assignments.
+    """
+    errors = []
+    parsed = []
+    for index, assignment in enumerate(assignments):
+        result, error = _validate_assignment(index, assignment)
+        if error:
+            errors.append({'index': index, 'buyer_id': assignment.get('buyer_id'), 'error': error})
+        else:
+            parsed.append(result)
+
+    buyer_ids = [a['buyer_id'] for a in parsed]
+    for buyer_id, count in Counter(buyer_ids).items():
+        if count > 1:
+            errors.append({'index': None, 'buyer_id': buyer_id, 'error': 'Buyer appears more than once in the request'})
+
+    property_ids = sorted({a['host_property_id'] for a in parsed})
+    properties = lock_host_properties(property_ids)
+    counts = allocation_counts(list(properties))
+
+    buyers = {
+        user.id: user for user in User.query.filter(
+            User.id.in_(buyer_ids), User.role == UserRole.BUYER.value
+        ).all()
+    } if buyer_ids else {}
+    travel_plans = first_travel_plans(list(buyers))
+
+    # Buyers already holding an accommodation on their first travel plan
+    plan_ids = [plan.id for plan in travel_plans.values()]
+    already_allocated = {
+        buyer_id for (buyer_id,) in db.session.query(Accommodation.buyer_id).filter(
+            Accommodation.travel_plan_id.in_(plan_ids), Accommodation.buyer_id.in_(buyer_ids)
+        ).distinct()
+    } if plan_ids else set()
+
+    for assignment in parsed:
+        buyer_id, property_id = assignment['buyer_id'], assignment['host_property_id']
+        if buyer_id not in buyers:
+            errors.append({'index': assignment['index'], 'buyer_id': buyer_id, 'error': f'User with ID {buyer_id} not found or not a buyer'})
+        elif property_id not in properties:
+            errors.append({'index': assignment['index'], 'buyer_id': buyer_id, 'error': f'Host property with ID {property_id} not found'})
+        elif buyer_id in already_allocated:
+            errors.append({'index': assignment['index'], 'buyer_id': buyer_id, 'error': 'Buyer already has accommodation allocated'})
+        else:
+            counts[property_id][assignment['room_type']] += 1
+
+    for property_id, host_property in properties.items():
+        rooms_allocated, _ = room_usage(counts[property_id]['shared'], counts[property_id]['single'])
+        if rooms_allocated > host_property.rooms_allotted:
+            errors.append({
+                'index': None,
+                'host_property_id': property_id,
+                'error': f'Allocations need {rooms_allocated} rooms at "{host_property.property_name}" '
+                         f'but only {host_property.rooms_allotted} are allotted'
+            })
+
+    if errors:
+        raise AllocationError(errors)
+
+    new_plans = [default_travel_plan(buyer_id) for buyer_id in buyer_ids if buyer_id not in travel_plans]
+    if new_plans:
+        db.session.add_all(new_plans)
+        db.session.flush()
+        travel_plans.update({plan.user_id: plan for plan in new_plans})
+
+    now = datetime.utcnow()
+    accommodations = [
+        Accommodation(
+            travel_plan_id=travel_plans[a['buyer_id']].id,
+            host_property_id=a['host_property_id'],
+            buyer_id=a['buyer_id'],
+            check_in_datetime=a['check_in_datetime'],
+            check_out_datetime=a['check_out_datetime'],
+            room_type=a['room_type'],
+            booking_reference='',
+            special_notes=a['special_notes'],
+            created_at=now,
+            updated_at=now
+        )
+        for a in parsed
+    ]
+    db.session.add_all(accommodations)
+
+    for property_id, host_property in properties.items():
+        refresh_property_usage(host_property, counts[property_id])
+
+    db.session.flush()
+    return accommodations
+
+def hosted_buyers_without_accommodation():
+    """Buyers whose category has hosted accommodation and who have no accommodation yet.
+
+    Returns (buyer profiles with their users, {buyer_id: earliest travel plan
+    with transportation loaded}) using two queries.
+    """
+    profiles = BuyerProfile.query.join(
+        BuyerCategory, BuyerProfile.category_id == BuyerCategory.id
+    ).join(User, User.id == BuyerProfile.user_id).filter(
+        BuyerCategory.accommodation_hosted.is_(True),
+        User.role == UserRole.BUYER.value,
+        ~db.session.query(Accommodation.id).filter(Accommodation.buyer_id == BuyerProfile.user_id).exists()
+    ).options(joinedload(BuyerProfile.user)).order_by(BuyerProfile.user_id).all()
+
+    buyer_ids = [profile.user_id for profile in profiles]
+    plans = TravelPlan.query.options(joinedload(TravelPlan.transportation)).filter(
+        TravelPlan.user_id.in_(buyer_ids)
+    ).distinct(TravelPlan.user_id).order_by(TravelPlan.user_id, TravelPlan.created_at.asc()).all() if buyer_ids else []
+    return profiles, {plan.user_id: plan for plan in plans}
+
+def stay_window(plan, event_start, event_end):
+    """(check in, check out) for a buyer: their arrival and return departure when
+    known, otherwise the event dates at the default check-in/check-out times"""
+    transportation = plan.transportation if plan else None
+    check_in = transportation.outbound_arrival_datetime if transportation else None
+    check_out = transportation.return_departure_datetime if transportation else None
+    if check_in is None:
+        check_in = datetime.combine(plan.event_start_date if plan else event_start, DEFAULT_CHECK_IN_TIME)
+    if check_out is None or check_out <= check_in:
+        check_out = datetime.combine(plan.event_end_date if plan else event_end, DEFAULT_CHECK_OUT_TIME)
+    return check_in, check_out
+
+def plan_room_assignments(stays, properties):
+    """Assign buyers to host properties in one pass.
+
+    stays is a list of dicts with buyer_id, room_type, check_in_datetime,
+    check_out_datetime and an optional priority flag (VIPs). properties is a
+    list of (property_id, rooms_allotted, Counter of existing allocations by
+    room type) in the order they should be filled.
+
+    Buyers are swept in check-in order, priority first. Shared buyers are
+    paired with the next shared buyer in that order, so roommates have the
+    closest stay windows, and a pair is always placed in the same property.
+    Each stay (a single or a shared pair) goes to the first property that
+    still has room for it. Unlike room_usage(), an unpaired shared guest
+    needs a whole room here, so a property is never filled past its
+    allotted rooms even before the guest's roommate arrives.
+
+    Returns (assignments, unassigned). Each assignment is an input dict with
+    host_property_id added, ready for allocate_accommodations(). unassigned
+    lists {buyer_id, room_type, reason} for buyers that did not fit.
+    """
+    order = sorted(stays, key=lambda s: (not s.get('priority'), s['check_in_datetime'], s['check_out_datetime'], s['buyer_id']))
+
+    # A shared buyer starts a unit and the next shared buyer joins it
+    units = []
+    open_pair = None
+    for stay in order:
+        if stay['room_type'] == 'shared':
+            if open_pair is None:
+                open_pair = [stay]
+                units.append(open_pair)
+            else:
+                open_pair.append(stay)
+                open_pair = None
+        else:
+            units.append([stay])
+
+    remaining = [[property_id, rooms_allotted, Counter(counts)] for property_id, rooms_allotted, counts in properties]
+    assignments = []
+    unassigned = []
+    for unit in units:
+        room_type = unit[0]['room_type']
+        for entry in remaining:
+            property_id, rooms_allotted, counts = entry
+            shared = counts['shared'] + (len(unit) if room_type == 'shared' else 0)
+            single = counts['single'] + (1 if room_type == 'single' else 0)
+            # An odd shared guest takes a room of their own until paired
+            rooms_needed = (shared + 1) // 2 + single
+            if rooms_needed <= rooms_allotted:
+                counts[room_type] += len(unit)
+                assignments.extend(dict(stay, host_property_id=property_id) for stay in unit)
+                break
+        else:
+            unassigned.extend(
+                {'buyer_id': stay['buyer_id'], 'room_type': room_type, 'reason': 'No host property has room left'}
+                for stay in unit
+            )
+
+    return assignments, unassigned
+
+def auto_assign_rooms(default_room_type='shared', room_types=None, property_ids=None, lock=False):
+    """Plan room assignments for every hosted buyer without accommodation.
+
+    VIP buyers get single rooms; everyone else gets default_room_type unless
+    room_types ({buyer_id: room type}) says otherwise. Properties are filled
+    in id order, limited to property_ids when given. With lock=True the
+    host_properties rows are locked first, so the plan can be committed
+    with allocate_accommodations() in the same transaction.
+
+    Returns (assignments, unassigned, properties) where properties
+    summarizes each considered property's rooms before and after the plan.
+    """
+    room_types = {int(buyer_id): room_type for buyer_id, room_type in (room_types or {}).items()}
+    invalid = {room_type for room_type in list(room_types.values()) + [default_room_type] if room_type not in VALID_ROOM_TYPES}
+    if invalid:
+        raise AllocationError([{'index': None, 'error': f'Invalid room type. Must be one of: {VALID_ROOM_TYPES}'}])
+
+    query = HostProperty.query.order_by(HostProperty.property_id)
+    if property_ids is not None:
+        query = query.filter(HostProperty.property_id.in_(property_ids))
+    if lock:
+        query = query.with_for_update()
+    properties = {p.property_id: p for p in query.all()}
+    counts = allocation_counts(list(properties))
+
+    profiles, plans = hosted_buyers_without_accommodation()
+    event_start = get_date_setting('event_start_date', date(2025, 6, 25))
+    event_end = get_date_setting('event_end_date', date(2025, 6, 28))
+
+    stays = []
+    for profile in profiles:
+        check_in, check_out = stay_window(plans.get(profile.user_id), event_start, event_end)
+        stays.append({
+            'buyer_id': profile.user_id,
+            'buyer_name': profile.name,
+            'room_type': room_types.get(profile.user_id, 'single' if profile.vip else default_room_type),
+            'priority': bool(profile.vip),
+            'check_in_datetime': check_in,
+            'check_out_datetime': check_out
+        })
+
+    assignments, unassigned = plan_room_assignments(
+        stays, [(property_id, p.rooms_allotted, counts[property_id]) for property_id, p in properties.items()]
+    )
+
+    planned = {property_id: Counter(counts[property_id]) for property_id in properties}
+    for assignment in assignments:
+        planned[assignment['host_property_id']][assignment['room_type']] += 1
+    summary = [
+        {
+            'property_id': property_id,
+            'property_name': p.property_name,
+            'rooms_allotted': p.rooms_allotted,
+            'rooms_allocated_before': room_usage(counts[property_id]['shared'], counts[property_id]['single'])[0],
+            'rooms_allocated_after': room_usage(planned[property_id]['shared'], planned[property_id]['single'])[0]
+        }
+        for property_id, p in properties.items()
+    ]
+    return assignments, unassigned, summary
@@ -0,0 +1,394 @@
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import any_, bindparam, func, text, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from ..models import db, Meeting, MeetingStatus, MeetingDayCount, TimeSlot, User, UserRole
+from .system_settings import load_meeting_metadata
+
+# Meetings in these statuses hold their time slot (see uq_meetings_active_time_slot)
+# and count towards the participants' per-day quotas
+SLOT_HOLDING_STATUSES = (MeetingStatus.PENDING, MeetingStatus.ACCEPTED, MeetingStatus.COMPLETED)
+
+class BookingError(ValueError):
+    """Raised when a meeting cannot be booked; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+def lock_participants(buyer_id, seller_id):
+    """Check the buyer and seller and lock the buyer's users row until the transaction ends.
+
+    Every booking for a buyer takes this lock first, so two requests for the
+    same buyer/seller pair cannot both pass the existing-meeting check.
+    """
+    # FOR NO KEY UPDATE: does not block inserts elsewhere that only reference the buyer
+    buyer = User.query.filter_by(id=buyer_id).with_for_update(key_share=True).first()
+    if not buyer or buyer.role != UserRole.BUYER.value:
+        raise BookingError('Invalid buyer')
+    seller = db.session.get(User, seller_id)
+    if not seller or seller.role != UserRole.SELLER.value:
+        raise BookingError('Invalid seller')
+
+def claim_time_slot(time_slot_id, seller_id):
+    """Mark a seller's time slot unavailable if it is still available; returns its start time.
+
+    A single UPDATE ... WHERE is_available RETURNING is atomic. When two
+    transactions race for the same slot, the second waits for the first's
+    row lock, re-checks is_available and updates nothing.
+    """
+    start_time = db.session.execute(
+        update(TimeSlot)
+        .where(TimeSlot.id == time_slot_id, TimeSlot.user_id == seller_id, TimeSlot.is_available.is_(True))
+        .values(is_available=False)
+        .returning(TimeSlot.start_time)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if start_time is not None:
+        return start_time
+
+    # Nothing was claimed: find out why for the error message
+    time_slot = db.session.get(TimeSlot, time_slot_id)
+    if not time_slot:
+        raise BookingError('Time slot not found', 404)
+    if time_slot.user_id != seller_id:
+        raise BookingError('Time slot does not belong to the specified seller')
+    raise BookingError('Time slot is not available')
+
+def meeting_day(meeting):
+    """The day a meeting counts towards: its time slot's date (None without a slot)"""
+    return meeting.time_slot.start_time.date() if meeting.time_slot is not None else None
+
+def reserve_meeting_quota(buyer_id, seller_id, day):
+    """Count a meeting on day for both participants, refusing it if either is at their daily limit.
+
+    Each counter is incremented with one INSERT ... ON CONFLICT DO UPDATE
+    ... WHERE meetings < limit RETURNING. The row lock taken by the upsert
+    makes the check and the increment atomic; nothing is returned when the
+    counter is full. Limits are max_buyer_meetings_per_day and
+    max_seller_attendees_per_day.
+    """
+    metadata = load_meeting_metadata()
+    # Counters are locked in user id order, as release_meeting_quota does, so they cannot deadlock
+    for user_id, limit, who in sorted([
+        (buyer_id, metadata['max_buyer_meetings_per_day'], 'Buyer'),
+        (seller_id, metadata['max_seller_attendees_per_day'], 'Seller')
+    ]):
+        statement = pg_insert(MeetingDayCount).values(user_id=user_id, day=day, meetings=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id', 'day'],
+            set_={'meetings': MeetingDayCount.meetings + 1},
+            where=MeetingDayCount.meetings < limit
+        ).returning(MeetingDayCount.meetings)
+        if limit < 1 or db.session.execute(statement).scalar() is None:
+            raise BookingError(f'{who} has reached the limit of {limit} meetings on {day.isoformat()}')
+
+def release_meeting_quota(meetings):
+    """Stop counting meetings (no longer holding their slot) towards their participants' daily quotas.
+
+    meetings is an iterable of Meeting objects or of (buyer_id, seller_id,
+    day) tuples. The decrements are grouped per (user, day) and sent as
+    one executemany UPDATE.
+    """
+    deltas = Counter()
+    for meeting in meetings:
+        if isinstance(meeting, Meeting):
+            meeting = (meeting.buyer_id, meeting.seller_id, meeting_day(meeting))
+        buyer_id, seller_id, day = meeting
+        if day is not None:
+            deltas[buyer_id, day] += 1
+            deltas[seller_id, day] += 1
+    if not deltas:
+        return
+    db.session.execute(
+        update(MeetingDayCount.__table__)
+        .where(MeetingDayCount.user_id == bindparam('b_user_id'), MeetingDayCount.day == bindparam('b_day'))
+        .values(meetings=func.greatest(MeetingDayCount.meetings - bindparam('b_delta'), 0)),
+        [{'b_user_id': user_id, 'b_day': day, 'b_delta': delta} for (user_id, day), delta in sorted(deltas.items())]
+    )
+
+def book_meeting(buyer_id, seller_id, requestor_id, time_slot_id=None, notes=''):
+    """Create a pending meeting, claiming its time slot if one is given.
+
+    A new meeting is refused while the pair has a meeting that was not
+    cancelled. The participants are locked (lock_participants) before the
+    check, and the slot is claimed with a conditional UPDATE
+    (claim_time_slot). The uq_meetings_active_time_slot index refuses a
+    second active meeting on a slot even if it bypassed this function.
+    A meeting with a slot also counts towards both participants' quotas
+    for the slot's day (reserve_meeting_quota); one without a slot has no
+    day and is not counted.
+
+    The meeting is flushed and the caller commits. On failure the session
+    is rolled back and BookingError is raised.
+    """
+    buyer_id, seller_id = int(buyer_id), int(seller_id)
+    try:
+        lock_participants(buyer_id, seller_id)
+
+        existing = Meeting.query.filter(
+            Meeting.buyer_id == buyer_id,
+            Meeting.seller_id == seller_id,
+            Meeting.status != MeetingStatus.CANCELLED
+        ).first()
+        if existing:
+            raise BookingError(f'Meeting request already exists with status: {existing.status.value}')
+
+        if time_slot_id is not None:
+            start_time = claim_time_slot(time_slot_id, seller_id)
+            reserve_meeting_quota(buyer_id, seller_id, start_time.date())
+
+        meeting = Meeting(
+            buyer_id=buyer_id,
+            seller_id=seller_id,
+            requestor_id=requestor_id,
+            time_slot_id=time_slot_id,
+            notes=notes,
+            status=MeetingStatus.PENDING
+        )
+        db.session.add(meeting)
+        db.session.flush()
+
+        if time_slot_id is not None:
+            db.session.execute(
+                update(TimeSlot).where(TimeSlot.id == time_slot_id).values(meeting_id=meeting.id)
+                .execution_options(synchronize_session=False)
+            )
+    except BookingError:
+        db.session.rollback()
+        raise
+    except IntegrityError:
+        db.session.rollback()
+        raise BookingError('Time slot is not available')
+    return meeting
+
+def set_meeting_status(meeting, status):
+    """Change a meeting's status, keeping its time slot and the daily quotas in step.
+
+    The status is changed with a conditional UPDATE ... WHERE status = (the
+    status the caller saw) RETURNING, so of two concurrent requests only
+    one changes the meeting; the other gets BookingError 409 (after
+    rolling back) and frees or claims nothing. A meeting that stops
+    holding its slot (rejected or cancelled) frees the slot and is released
+    from the quotas. A meeting that starts holding it again claims the slot
+    and a quota place anew, or raises BookingError (after rolling back) if
+    either is gone. The caller commits.
+    """
+    was_holding = meeting.status in SLOT_HOLDING_STATUSES
+    holding = status in SLOT_HOLDING_STATUSES
+    changed = db.session.execute(
+        update(Meeting)
+        .where(Meeting.id == meeting.id, Meeting.status == meeting.status)
+        .values(status=status)
+        .returning(Meeting.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if changed is None:
+        db.session.rollback()
+        raise BookingError('Meeting status was changed by another request', 409)
+    set_committed_value(meeting, 'status', status)
+
+    if was_holding and not holding:
+        release_meeting_quota([meeting])
+        if meeting.time_slot:
+            meeting.time_slot.is_available = True
+            meeting.time_slot.meeting_id = None
+    elif holding and not was_holding and meeting.time_slot_id is not None:
+        try:
+            claim_time_slot(meeting.time_slot_id, meeting.seller_id)
+            reserve_meeting_quota(meeting.buyer_id, meeting.seller_id, meeting_day(meeting))
+            meeting.time_slot.meeting_id = meeting.id
+        except BookingError:
+            db.session.rollback()
+            raise
+
+# The statuses each bulk transition may start from
+BULK_TRANSITIONS = {
+    MeetingStatus.ACCEPTED: (MeetingStatus.PENDING,),
+    MeetingStatus.REJECTED: (MeetingStatus.PENDING,),
+    MeetingStatus.CANCELLED: (MeetingStatus.PENDING, MeetingStatus.ACCEPTED)
+}
+
+def _bulk_refusal(row, status, user_id, is_admin):
+    """Why user_id may not move the meeting in row to status, as (message, HTTP status); None if they may"""
+    if status == MeetingStatus.CANCELLED or not is_admin:
+        if user_id not in (row.buyer_id, row.seller_id):
+            return 'You do not have permission to update this meeting', 403
+        if status != MeetingStatus.CANCELLED and row.requestor_id == user_id:
+            return 'You cannot accept or reject your own meeting request', 403
+    if row.status not in BULK_TRANSITIONS[status]:
+        return f'Cannot change a meeting with status: {row.status.value}', 400
+    return None
+
+def bulk_set_meeting_status(meeting_ids, status, user_id, is_admin=False):
+    """Move many meetings to status (accepted, rejected or cancelled) at once.
+
+    The same rules as the single-meeting routes apply: participants only
+    (admins may also accept or reject any meeting), requestors cannot
+    accept or reject their own requests, and only pending meetings (or
+    accepted ones, for cancelling) can change. The meetings are checked
+    with one query and changed with one UPDATE ... WHERE id = ANY(...)
+    that re-checks the status, so a meeting changed concurrently is
+    reported instead of overwritten. Rejected and cancelled meetings free
+    their time slots and quota places in two more statements.
+
+    Returns {meeting_id: (message, HTTP status) or None when changed},
+    in meeting_ids order. The caller commits.
+    """
+    allowed = BULK_TRANSITIONS[status]
+    rows = db.session.query(
+        Meeting.id, Meeting.buyer_id, Meeting.seller_id, Meeting.requestor_id,
+        Meeting.status, Meeting.time_slot_id, TimeSlot.start_time
+    ).outerjoin(TimeSlot, TimeSlot.id == Meeting.time_slot_id).filter(
+        Meeting.id == any_(bindparam('meeting_ids', list(meeting_ids), type_=ARRAY(db.Integer)))
+    ).all()
+    found = {row.id: row for row in rows}
+
+    results = {}
+    for meeting_id in meeting_ids:
+        row = found.get(meeting_id)
+        results[meeting_id] = _bulk_refusal(row, status, user_id, is_admin) if row else ('Meeting not found', 404)
+    permitted = [meeting_id for meeting_id, refusal in results.items() if refusal is None]
+    if not permitted:
+        return results
+
+    changed = set(db.session.execute(
+        update(Meeting)
+        .where(
+            Meeting.id == any_(bindparam('permitted_ids', permitted, type_=ARRAY(db.Integer))),
+            Meeting.status.in_(allowed)
+        )
+        .values(status=status)
+        .returning(Meeting.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    for meeting_id in permitted:
+        if meeting_id not in changed:
+            results[meeting_id] = ('Meeting status was changed by another request', 409)
+
+    if status not in SLOT_HOLDING_STATUSES and changed:
+        freed = [found[meeting_id] for meeting_id in changed]
+        slot_ids = [row.time_slot_id for row in freed if row.time_slot_id is not None]
+        if slot_ids:
+            db.session.execute(
+                update(TimeSlot)
+                .where(TimeSlot.id == any_(bindparam('slot_ids', slot_ids, type_=ARRAY(db.Integer))))
+                .values(is_available=True, meeting_id=None)
+                .execution_options(synchronize_session=False)
+            )
+        release_meeting_quota(
+            (row.buyer_id, row.seller_id, row.start_time.date() if row.start_time else None) for row in freed
+        )
+    return results
+
+# Cancels pending meetings (the oldest :limit of them; all when NULL), frees
+# their time slots and releases their quota places in a single statement
+EXPIRE_PENDING_MEETINGS_SQL = text("""
+    WITH expired AS (
+        UPDATE meetings m
+        SET status = 'CANCELLED', updated_at = now() AT TIME ZONE 'utc'
+        WHERE m.id IN (
+            SELECT id FROM meetings WHERE status = 'PENDING' ORDER BY id LIMIT :limit FOR UPDATE
+        ) AND m.status = 'PENDING'
+        RETURNING m.buyer_id, m.seller_id, m.time_slot_id
+    ), freed AS (
+        UPDATE time_slots ts
+        SET is_available = true, meeting_id = NULL
+        FROM expired e
+        WHERE ts.id = e.time_slot_id
+        RETURNING e.buyer_id, e.seller_id, ts.start_time::date AS day
+    ), released AS (
+        UPDATE meeting_day_counts c
+        SET meetings = GREATEST(c.meetings - d.meetings, 0)
+        FROM (
+            SELECT participant.user_id, f.day, COUNT(*) AS meetings
+            FROM freed f
+            CROSS JOIN LATERAL (VALUES (f.buyer_id), (f.seller_id)) AS participant(user_id)
+            GROUP BY participant.user_id, f.day
+        ) d
+        WHERE c.user_id = d.user_id AND c.day = d.day
+    )
+    SELECT COUNT(*) FROM expired
+""")
+
+def expire_pending_meetings(limit=None):
+    """Cancel pending meetings (at most limit of them), freeing their slots and quota places.
+
+    Runs EXPIRE_PENDING_MEETINGS_SQL; returns the number cancelled. The
+    caller commits.
+    """
+    return db.session.execute(EXPIRE_PENDING_MEETINGS_SQL, {'limit': limit}).scalar()
+
+def expire_all_pending_meetings(batch_size):
+    """Cancel every pending meeting in batches of batch_size, committing after each; returns the total"""
+    total = 0
+    while True:
+        expired = expire_pending_meetings(batch_size)
+        db.session.commit()
+        total += expired
+        if expired < batch_size:
+            return total
+
+def _run_pending_meeting_expiry(app, batch_size):
+    with app.app_context():
+        try:
+            expired = expire_all_pending_meetings(batch_size)
+            logging.info(f'Expired {expired} pending meetings')
+            return expired
+        except Exception:
+            db.session.rollback()
+            logging.exception('Failed to expire pending meetings')
+            raise
+        finally:
+            db.session.remove()
+
+def queue_pending_meeting_expiry():
+    """Cancel all pending meetings in a background thread, in batches of MEETING_EXPIRY_BATCH_SIZE.
+
+    Returns the Future of the number cancelled.
+    """
+    executor = current_app.extensions.get('meeting_expiry')
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='meeting-expiry')
+        current_app.extensions['meeting_expiry'] = executor
+    return executor.submit(
+        _run_pending_meeting_expiry, current_app._get_current_object(), current_app.config.get('MEETING_EXPIRY_BATCH_SIZE', 1000)
+    )
+
+def rebuild_meeting_day_counts():
+    """Recount meeting_day_counts from the meetings holding a time slot, with one grouped query.
+
+    The table is locked against concurrent bookings while it is rebuilt.
+    Returns (counters written, counters that had drifted).
+    """
+    db.session.execute(text('LOCK TABLE meeting_day_counts IN EXCLUSIVE MODE'))
+    before = {(row.user_id, row.day): row.meetings for row in db.session.query(MeetingDayCount).all()}
+    db.session.execute(MeetingDayCount.__table__.delete())
+    rows = db.session.execute(text("""
+        INSERT INTO meeting_day_counts (user_id, day, meetings)
+        SELECT participant.user_id, ts.start_time::date, COUNT(*)
+        FROM meetings m
+        JOIN time_slots ts ON ts.id = m.time_slot_id
+        CROSS JOIN LATERAL (VALUES (m.buyer_id), (m.seller_id)) AS participant(user_id)
+        WHERE m.status IN :statuses
+        GROUP BY participant.user_id, ts.start_time::date
+        RETURNING user_id, day, meetings
+    """).bindparams(bindparam('statuses', expanding=True)), {'statuses': [s.name for s in SLOT_HOLDING_STATUSES]}).all()
+    after = {(row.user_id, row.day): row.meetings for row in rows}
+    drifted = sum(1 for key in before.keys() | after.keys() if before.get(key, 0) != after.get(key, 0))
+    db.session.commit()
+    return len(after), drifted
+
+@click.command('reconcile-meeting-quotas')
+@with_appcontext
+def reconcile_meeting_quotas_command():
+    """Rebuild the per-day meeting counters from the meetings table."""
+    written, drifted = rebuild_meeting_day_counts()
+    click.echo(f'Rebuilt {written} meeting day counters ({drifted} corrected)')
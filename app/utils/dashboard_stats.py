@@ -0,0 +1,111 @@
+import threading
+import time
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from ..models import db, User, UserRole, Listing, ListingStatus, Meeting, SellerProfile, DashboardCounter
+
+# Counter names in the dashboard_counters table
+DASHBOARD_COUNTERS = (
+    'users_total', 'users_buyer', 'users_seller', 'users_admin',
+    'listings_active', 'meetings_total', 'sellers_unverified'
+)
+
+def count_dashboard_stats():
+    """Compute the dashboard counters with one aggregate query"""
+    row = db.session.execute(
+        select(
+            func.count(User.id).label('users_total'),
+            func.count(User.id).filter(User.role == UserRole.BUYER.value).label('users_buyer'),
+            func.count(User.id).filter(User.role == UserRole.SELLER.value).label('users_seller'),
+            func.count(User.id).filter(User.role == UserRole.ADMIN.value).label('users_admin'),
+            select(func.count(Listing.id)).where(
+                Listing.status == ListingStatus.ACTIVE
+            ).scalar_subquery().label('listings_active'),
+            select(func.count(Meeting.id)).scalar_subquery().label('meetings_total'),
+            select(func.count(SellerProfile.id)).where(
+                SellerProfile.is_verified == False
+            ).scalar_subquery().label('sellers_unverified')
+        ).select_from(User)
+    ).one()
+    return dict(row._mapping)
+
+def read_dashboard_counters():
+    """Read the trigger-maintained counters, rebuilding them if any are missing"""
+    counters = dict(db.session.query(DashboardCounter.name, DashboardCounter.value).all())
+    if all(name in counters for name in DASHBOARD_COUNTERS):
+        return {name: counters[name] for name in DASHBOARD_COUNTERS}
+    return refresh_dashboard_counters()
+
+def refresh_dashboard_counters():
+    """Recount the dashboard counters and store them in dashboard_counters"""
+    counts = count_dashboard_stats()
+    statement = pg_insert(DashboardCounter).values([
+        {'name': name, 'value': value} for name, value in counts.items()
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'value': statement.excluded.value, 'updated_at': func.now()}
+    )
+    db.session.execute(statement)
+    db.session.commit()
+    return counts
+
+def format_system_stats(counts):
+    return {
+        'total_users': counts['users_total'],
+        'users_by_role': {
+            'buyer': counts['users_buyer'],
+            'seller': counts['users_seller'],
+            'admin': counts['users_admin']
+        },
+        'total_listings': counts['listings_active'],
+        'total_bookings': counts['meetings_total'],
+        'pending_verifications': counts['sellers_unverified']
+    }
+
+class DashboardStatsCache:
+    """Keeps the dashboard system stats for ttl seconds.
+
+    source is 'live' (one aggregate query over the tables) or 'counters'
+    (the dashboard_counters table kept up to date by database triggers).
+    """
+
+    def __init__(self, ttl=10, source='live'):
+        self.ttl = ttl
+        self.source = source
+        self._stats = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._stats is None or time.monotonic() >= self._expires_at:
+                counts = self._counter_stats() if self.source == 'counters' else count_dashboard_stats()
+                self._stats = format_system_stats(counts)
+                self._expires_at = time.monotonic() + self.ttl
+            return self._stats
+
+    def invalidate(self):
+        with self._lock:
+            self._stats = None
+
+    def _counter_stats(self):
+        """Read the counters table, falling back to the live query if it is missing or broken"""
+        try:
+            return read_dashboard_counters()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Could not read dashboard_counters, counting live instead')
+            return count_dashboard_stats()
+
+def get_dashboard_stats():
+    """Return the (possibly cached) dashboard system stats for the current app"""
+    cache = current_app.extensions.get('dashboard_stats')
+    if cache is None:
+        cache = DashboardStatsCache(
+            ttl=current_app.config.get('DASHBOARD_STATS_TTL_SECONDS', 10),
+            source=current_app.config.get('DASHBOARD_STATS_SOURCE', 'live')
+        )
+        current_app.extensions['dashboard_stats'] = cache
+    return cache.get()
@@ -1,20 +1,45 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from flask import current_app, render_template
+import uuid
+from flask import current_app
+from ..models import db, EmailOutbox
+from .email_worker import start_email_worker, PASSWORD_PLACEHOLDER
 
-def send_invitation_email(invited_buyer):
+# Emails are not sent from the request. The send_* functions below add a row to
+# the email_outbox table and the worker in email_worker.py delivers it.
+
+def new_email_job_id():
+    """Return an id for grouping the emails queued by one request"""
+    return str(uuid.uuid4())
+
+def queue_email(receiver_email, subject, text, html=None, job_id=None, commit=True, credentials_user_id=None):
+    """Add an email to the outbox and make sure the email worker is running.
+
+    Pass commit=False to queue many emails in one transaction; the caller
+    commits and the worker picks them up on its next poll. With
+    credentials_user_id, the worker sets a new password for that user just
+    before sending and puts it in place of PASSWORD_PLACEHOLDER.
+    """
+    entry = EmailOutbox(
+        job_id=job_id,
+        recipient=receiver_email,
+        subject=subject,
+        text_body=text,
+        html_body=html,
+        credentials_user_id=credentials_user_id
+    )
+    db.session.add(entry)
+    if commit:
+        db.session.commit()
+
+    start_email_worker(current_app._get_current_object())
+    return entry
+
+def send_invitation_email(invited_buyer, job_id=None, commit=True):
     """Send invitation email to buyer"""
-    sender_email = current_app.config.get('MAIL_USERNAME', 'noreply@splash25.com')
     receiver_email = invited_buyer.email
     
-    # Create message
-    message = MIMEMultipart("alternative")
-    message["Subject"] = "Invitation to Register for Splash25"
-    message["From"] = sender_email
-    message["To"] = receiver_email
+    subject = "Invitation to Register for Splash25"
     
-    # Create the plain-text and HTML version of your message
+    # Create the plain-text and HTML version of the message
     text = f"""
     Hello {invited_buyer.name},
     
@@ -47,48 +72,16 @@ def send_invitation_email(invited_buyer):
     </html>
     """
     
-    # Turn these into plain/html MIMEText objects
-    part1 = MIMEText(text, "plain")
-    part2 = MIMEText(html, "html")
-    
-    # Add HTML/plain-text parts to MIMEMultipart message
-    message.attach(part1)
-    message.attach(part2)
-    
-    # Send email
-    try:
-        # Check if email is configured
-        if not current_app.config.get('MAIL_SERVER') or not current_app.config.get('MAIL_PORT'):
-            current_app.logger.warning("Email service not configured. Skipping email send.")
-            return False
-            
-        server = smtplib.SMTP_SSL(
-            current_app.config.get('MAIL_SERVER'), 
-            current_app.config.get('MAIL_PORT')
-        )
-        server.login(
-            current_app.config.get('MAIL_USERNAME'), 
-            current_app.config.get('MAIL_PASSWORD')
-        )
-        server.sendmail(sender_email, receiver_email, message.as_string())
-        server.quit()
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Error sending email: {str(e)}")
-        return False
+    # Queue the email; it is sent by the background email worker
+    return queue_email(receiver_email, subject, text, html, job_id=job_id, commit=commit)
 
-def send_registration_confirmation_email(pending_buyer):
+def send_registration_confirmation_email(pending_buyer, job_id=None, commit=True):
     """Send confirmation email after registration"""
-    sender_email = current_app.config.get('MAIL_USERNAME', 'noreply@splash25.com')
     receiver_email = pending_buyer.email
     
-    # Create message
-    message = MIMEMultipart("alternative")
-    message["Subject"] = "Registration Received for Splash25"
-    message["From"] = sender_email
-    message["To"] = receiver_email
+    subject = "Registration Received for Splash25"
     
-    # Create the plain-text and HTML version of your message
+    # Create the plain-text and HTML version of the message
     text = f"""
     Hello {pending_buyer.name},
     
@@ -111,48 +104,20 @@ def send_registration_confirmation_email(pending_buyer):
     </html>
     """
     
-    # Turn these into plain/html MIMEText objects
-    part1 = MIMEText(text, "plain")
-    part2 = MIMEText(html, "html")
-    
-    # Add HTML/plain-text parts to MIMEMultipart message
-    message.attach(part1)
-    message.attach(part2)
-    
-    # Send email
-    try:
-        # Check if email is configured
-        if not current_app.config.get('MAIL_SERVER') or not current_app.config.get('MAIL_PORT'):
-            current_app.logger.warning("Email service not configured. Skipping email send.")
-            return False
-            
-        server = smtplib.SMTP_SSL(
-            current_app.config.get('MAIL_SERVER'), 
-            current_app.config.get('MAIL_PORT')
-        )
-        server.login(
-            current_app.config.get('MAIL_USERNAME'), 
-            current_app.config.get('MAIL_PASSWORD')
-        )
-        server.sendmail(sender_email, receiver_email, message.as_string())
-        server.quit()
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Error sending email: {str(e)}")
-        return False
+    # Queue the email; it is sent by the background email worker
+    return queue_email(receiver_email, subject, text, html, job_id=job_id, commit=commit)
 
-def send_approval_email(user, password):
-    """Send approval email with login credentials"""
-    sender_email = current_app.config.get('MAIL_USERNAME', 'noreply@splash25.com')
+def send_approval_email(user, job_id=None, commit=True):
+    """Send approval email with login credentials.
+
+    The password is generated by the email worker when the email is sent,
+    so it is never stored in the outbox. user must already have an id.
+    """
     receiver_email = user.email
     
-    # Create message
-    message = MIMEMultipart("alternative")
-    message["Subject"] = "Your Splash25 Registration Has Been Approved"
-    message["From"] = sender_email
-    message["To"] = receiver_email
+    subject = "Your Splash25 Registration Has Been Approved"
     
-    # Create the plain-text and HTML version of your message
+    # Create the plain-text and HTML version of the message
     text = f"""
     Hello {user.username},
     
@@ -161,7 +126,7 @@ def send_approval_email(user, password):
     You can now log in to your account using the following credentials:
     
     Username: {user.username}
-    Password: {password}
+    Password: {PASSWORD_PLACEHOLDER}
     
     Please change your password after your first login.
     
@@ -177,7 +142,7 @@ def send_approval_email(user, password):
         <p>You can now log in to your account using the following credentials:</p>
         <p>
           <strong>Username:</strong> {user.username}<br>
-          <strong>Password:</strong> {password}
+          <strong>Password:</strong> {PASSWORD_PLACEHOLDER}
         </p>
         <p>Please change your password after your first login.</p>
         <p>
@@ -191,48 +156,16 @@ def send_approval_email(user, password):
     </html>
     """
     
-    # Turn these into plain/html MIMEText objects
-    part1 = MIMEText(text, "plain")
-    part2 = MIMEText(html, "html")
-    
-    # Add HTML/plain-text parts to MIMEMultipart message
-    message.attach(part1)
-    message.attach(part2)
-    
-    # Send email
-    try:
-        # Check if email is configured
-        if not current_app.config.get('MAIL_SERVER') or not current_app.config.get('MAIL_PORT'):
-            current_app.logger.warning("Email service not configured. Skipping email send.")
-            return False
-            
-        server = smtplib.SMTP_SSL(
-            current_app.config.get('MAIL_SERVER'), 
-            current_app.config.get('MAIL_PORT')
-        )
-        server.login(
-            current_app.config.get('MAIL_USERNAME'), 
-            current_app.config.get('MAIL_PASSWORD')
-        )
-        server.sendmail(sender_email, receiver_email, message.as_string())
-        server.quit()
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Error sending email: {str(e)}")
-        return False
+    # Queue the email; it is sent by the background email worker
+    return queue_email(receiver_email, subject, text, html, job_id=job_id, commit=commit, credentials_user_id=user.id)
 
-def send_rejection_email(pending_buyer):
+def send_rejection_email(pending_buyer, job_id=None, commit=True):
     """Send rejection email"""
-    sender_email = current_app.config.get('MAIL_USERNAME', 'noreply@splash25.com')
     receiver_email = pending_buyer.email
     
-    # Create message
-    message = MIMEMultipart("alternative")
-    message["Subject"] = "Regarding Your Splash25 Registration"
-    message["From"] = sender_email
-    message["To"] = receiver_email
+    subject = "Regarding Your Splash25 Registration"
     
-    # Create the plain-text and HTML version of your message
+    # Create the plain-text and HTML version of the message
     text = f"""
     Hello {pending_buyer.name},
     
@@ -258,32 +191,5 @@ def send_rejection_email(pending_buyer):
     </html>
     """
     
-    # Turn these into plain/html MIMEText objects
-    part1 = MIMEText(text, "plain")
-    part2 = MIMEText(html, "html")
-    
-    # Add HTML/plain-text parts to MIMEMultipart message
-    message.attach(part1)
-    message.attach(part2)
-    
-    # Send email
-    try:
-        # Check if email is configured
-        if not current_app.config.get('MAIL_SERVER') or not current_app.config.get('MAIL_PORT'):
-            current_app.logger.warning("Email service not configured. Skipping email send.")
-            return False
-            
-        server = smtplib.SMTP_SSL(
-            current_app.config.get('MAIL_SERVER'), 
-            current_app.config.get('MAIL_PORT')
-        )
-        server.login(
-            current_app.config.get('MAIL_USERNAME'), 
-            current_app.config.get('MAIL_PASSWORD')
-        )
-        server.sendmail(sender_email, receiver_email, message.as_string())
-        server.quit()
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Error sending email: {str(e)}")
-        return False
+    # Queue the email; it is sent by the background email worker
+    return queue_email(receiver_email, subject, text, html, job_id=job_id, commit=commit)
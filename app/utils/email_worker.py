@@ -0,0 +1,200 @@
+import secrets
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import or_
+from ..models import db, EmailOutbox, User
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = timedelta(seconds=30)  # doubled after every failed attempt
+SENDING_LEASE = timedelta(minutes=10)  # emails left 'sending' by a crashed worker are retried after this
+# Stands in for a password in a queued email; the worker issues the password when sending
+PASSWORD_PLACEHOLDER = '[[password]]'
+
+_start_lock = threading.Lock()
+
+def mail_configured(app):
+    """Check whether an SMTP server has been configured"""
+    return bool(app.config.get('MAIL_SERVER') and app.config.get('MAIL_PORT'))
+
+def build_message(entry, sender_email, password=None):
+    """Build the MIME message for an outbox entry, filling in password if it carries credentials"""
+    def body(text):
+        return text.replace(PASSWORD_PLACEHOLDER, password) if password is not None else text
+
+    message = MIMEMultipart("alternative")
+    message["Subject"] = entry.subject
+    message["From"] = sender_email
+    message["To"] = entry.recipient
+
+    message.attach(MIMEText(body(entry.text_body), "plain"))
+    if entry.html_body:
+        message.attach(MIMEText(body(entry.html_body), "html"))
+    return message
+
+def issue_password(user_id):
+    """Set and commit a new random password for a user; returns it (None if the user is gone)"""
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    password = secrets.token_urlsafe(10)
+    user.set_password(password)
+    # Committed before sending: if the send fails, the retry issues another password
+    db.session.commit()
+    return password
+
+class EmailWorker:
+    """Sends queued emails from the email_outbox table in batches.
+
+    Batches are claimed with FOR UPDATE SKIP LOCKED, so several workers (one
+    per gunicorn process, or the email-worker command) can run side by side.
+    The SMTP connection is kept open between emails and batches and is only
+    closed after an error or once the outbox has been idle for a while.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config.get('EMAIL_BATCH_SIZE', 50)
+        self.poll_interval = app.config.get('EMAIL_WORKER_POLL_SECONDS', 5)
+        self.idle_timeout = app.config.get('EMAIL_SMTP_IDLE_SECONDS', 60)
+        self._smtp = None
+        self._smtp_last_used = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Run the worker in a daemon thread"""
+        self._thread = threading.Thread(target=self.run, name='email-worker', daemon=True)
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def run(self):
+        """Poll the outbox until stopped"""
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    sent = self.process_batch()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Email worker error: {str(e)}")
+                    sent = 0
+                finally:
+                    db.session.remove()
+
+                if sent:
+                    continue
+                if self._smtp is not None and time.monotonic() - self._smtp_last_used > self.idle_timeout:
+                    self._close_connection()
+                self._stop.wait(self.poll_interval)
+            self._close_connection()
+
+    def process_batch(self):
+        """Send one batch of due emails. Returns the number of emails attempted."""
+        now = datetime.utcnow()
+        entries = EmailOutbox.query.filter(
+            or_(EmailOutbox.status == 'pending', EmailOutbox.status == 'sending'),
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.id).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+        if not entries:
+            db.session.commit()
+            return 0
+
+        # Claim the batch so other workers skip it once the lock is released
+        for entry in entries:
+            entry.status = 'sending'
+            entry.attempts += 1
+            entry.next_attempt_at = now + SENDING_LEASE
+        db.session.commit()
+
+        sender_email = self.app.config.get('MAIL_USERNAME') or 'noreply@splash25.com'
+        for entry in entries:
+            try:
+                password = issue_password(entry.credentials_user_id) if entry.credentials_user_id else None
+                message = build_message(entry, sender_email, password)
+                self._connection().sendmail(sender_email, entry.recipient, message.as_string())
+                self._smtp_last_used = time.monotonic()
+                entry.status = 'sent'
+                entry.sent_at = datetime.utcnow()
+                entry.last_error = None
+                # Sent emails are kept for job status only; their contents are not needed any more
+                entry.text_body = ''
+                entry.html_body = None
+            except Exception as e:
+                # The connection may be broken, open a new one for the next email
+                self._close_connection()
+                entry.last_error = str(e)
+                if entry.attempts >= MAX_ATTEMPTS:
+                    entry.status = 'failed'
+                    self.app.logger.error(f"Giving up on email {entry.id} to {entry.recipient}: {str(e)}")
+                else:
+                    entry.status = 'pending'
+                    entry.next_attempt_at = datetime.utcnow() + RETRY_BASE_DELAY * 2 ** (entry.attempts - 1)
+                    self.app.logger.warning(f"Error sending email {entry.id}, will retry: {str(e)}")
+
+        db.session.commit()
+        return len(entries)
+
+    def _connection(self):
+        if self._smtp is None:
+            config = self.app.config
+            if config.get('MAIL_USE_SSL', True):
+                smtp = smtplib.SMTP_SSL(config.get('MAIL_SERVER'), config.get('MAIL_PORT'), timeout=30)
+            else:
+                smtp = smtplib.SMTP(config.get('MAIL_SERVER'), config.get('MAIL_PORT'), timeout=30)
+            if config.get('MAIL_USERNAME') and config.get('MAIL_PASSWORD'):
+                smtp.login(config.get('MAIL_USERNAME'), config.get('MAIL_PASSWORD'))
+            self._smtp = smtp
+        return self._smtp
+
+    def _close_connection(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
+
+def start_email_worker(app):
+    """Start the background email worker for this process if it is not already running"""
+    if not app.config.get('EMAIL_WORKER_ENABLED', True):
+        return None
+    if not mail_configured(app):
+        app.logger.warning("Email service not configured. Emails stay queued in the outbox.")
+        return None
+
+    with _start_lock:
+        worker = app.extensions.get('email_worker')
+        # A worker inherited from a parent process (e.g. gunicorn --preload) has no thread
+        if worker is None or not worker.is_alive():
+            worker = EmailWorker(app)
+            worker.start()
+            app.extensions['email_worker'] = worker
+    return worker
+
+@click.command('email-worker')
+@with_appcontext
+def email_worker_command():
+    """Send queued emails in the foreground until interrupted."""
+    app = current_app._get_current_object()
+    if not mail_configured(app):
+        raise click.ClickException('MAIL_SERVER and MAIL_PORT must be configured')
+    worker = EmailWorker(app)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker._close_connection()
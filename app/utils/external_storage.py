@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+from urllib.parse import quote
+from flask import current_app
+
+class ExternalStorageError(Exception):
+    pass
+
+class ExternalStorage:
+    """Nextcloud storage used for uploaded images.
+
+    Files are written over WebDAV (MKCOL/PUT) and published with the OCS
+    sharing API as read-only public links. One client is shared by all
+    upload workers of a process (see get_external_storage()): requests go
+    through a keep-alive connection pool, and directories known to exist
+    and share links already created are remembered so they are not
+    probed or created again.
+    """
+
+    def __init__(self, base_url, user, password, timeout=30, pool_size=10):
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.user = user
+        self.timeout = timeout
+        self.dav_url = f"{self.base_url}remote.php/dav/files/{quote(user)}"
+        self.ocs_url = f"{self.base_url}ocs/v2.php/apps/files_sharing/api/v1/shares"
+        self.ocs_headers = {'OCS-APIRequest': 'true', "Accept": "application/json"}
+        self.settings = (base_url, user, password)
+
+        # requests is imported with the first client rather than at app startup
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        self.session.auth = (user, password)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._known_dirs = set()
+        self._share_links = {}  # path -> public link URL
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def env_settings():
+        """(url, user, password) from the EXTERNAL_STORAGE_* variables; None if any is missing"""
+        settings = (
+            os.getenv('EXTERNAL_STORAGE_URL'),
+            os.getenv('EXTERNAL_STORAGE_USER'),
+            os.getenv('EXTERNAL_STORAGE_PASSWORD')
+        )
+        return settings if all(settings) else None
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Build the client from EXTERNAL_STORAGE_* variables; None if they are missing"""
+        settings = cls.env_settings()
+        if settings is None:
+            return None
+        return cls(*settings, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def _dav(self, method, path, **kwargs):
+        return self.session.request(method, self.dav_url + quote(path), timeout=self.timeout, **kwargs)
+
+    def ensure_dir(self, path, share=True):
+        """Create a directory if it does not exist, sharing it publicly when created"""
+        if path in self._known_dirs:
+            return
+        response = self._dav('MKCOL', path)
+        if response.status_code == 405:
+            # Already exists
+            self._known_dirs.add(path)
+            return
+        if response.status_code not in (200, 201):
+            raise ExternalStorageError(f"Failed to create directory {path}: HTTP {response.status_code}")
+        logging.debug(f"Created remote directory {path} successfully")
+        if share:
+            self.share(path)
+        self._known_dirs.add(path)
+
+    def upload(self, path, data, content_type='application/octet-stream'):
+        """Upload a file, replacing any existing file at path"""
+        response = self._dav('PUT', path, data=data, headers={'Content-Type': content_type})
+        if response.status_code not in (200, 201, 204):
+            raise ExternalStorageError(f"Failed to upload {path}: HTTP {response.status_code}")
+
+    def share(self, path):
+        """Create a read-only public link for path and return its URL.
+
+        Links are cached per path; a file replaced by a later upload keeps its link.
+        """
+        url = self._share_links.get(path)
+        if url:
+            return url
+
+        response = self.session.post(self.ocs_url, headers=self.ocs_headers, timeout=self.timeout, data={
+            'path': path,
+            'shareType': 3,                  # Public link
+            'permissions': 1                 # Read-only
+        })
+        if response.status_code != 200:
+            raise ExternalStorageError(f"Failed to share {path}: HTTP {response.status_code}")
+        result = response.json()
+        if result["ocs"]["meta"]["status"] != "ok":
+            raise ExternalStorageError(f"Share API error: {result['ocs']['meta'].get('message')}")
+
+        url = result["ocs"]["data"]["url"]
+        with self._lock:
+            self._share_links[path] = url
+        return url
+
+    def forget(self, path=None):
+        """Drop cached directories and links under path (everything when path is None),
+        e.g. after they were removed in Nextcloud directly"""
+        with self._lock:
+            if path is None:
+                self._known_dirs.clear()
+                self._share_links.clear()
+                return
+            self._known_dirs = {d for d in self._known_dirs if d != path and not d.startswith(path + '/')}
+            self._share_links = {
+                p: url for p, url in self._share_links.items() if p != path and not p.startswith(path + '/')
+            }
+
+def get_external_storage():
+    """Return the process-wide storage client, or None if storage is not configured.
+
+    The client is rebuilt when the EXTERNAL_STORAGE_* settings change.
+    """
+    settings = ExternalStorage.env_settings()
+    if settings is None:
+        return None
+
+    storage = current_app.extensions.get('external_storage')
+    if storage is None or storage.settings != settings:
+        if storage is not None:
+            storage.close()
+        storage = ExternalStorage(
+            *settings,
+            pool_size=current_app.config.get('EXTERNAL_STORAGE_POOL_SIZE', 10)
+        )
+        current_app.extensions['external_storage'] = storage
+    return storage
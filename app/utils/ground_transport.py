@@ -0,0 +1,222 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from sqlalchemy.orm import joinedload
+from ..models import db, User, UserRole, TravelPlan, GroundTransportation, TransportType, BuyerProfile, BuyerCategory
+
+DEFAULT_WINDOW_MINUTES = 60
+# Buyers are dropped off this long before their return journey departs
+DEFAULT_DEPARTURE_BUFFER_MINUTES = 180
+
+def _location_key(location):
+    return ' '.join((location or '').split()).casefold()
+
+def _vehicle_sizes(vehicle_types, passengers):
+    """Pick vehicles for a group: the largest while the group fills it, then the smallest that fits the rest"""
+    by_capacity = sorted(vehicle_types, key=lambda v: v['capacity'], reverse=True)
+    largest = by_capacity[0]
+    vehicles = []
+    while passengers > 0:
+        if passengers >= largest['capacity']:
+            vehicle = largest
+        else:
+            vehicle = next(v for v in reversed(by_capacity) if v['capacity'] >= passengers)
+        vehicles.append(vehicle)
+        passengers -= vehicle['capacity']
+    return vehicles
+
+def pool_trips(trips, vehicle_types, window_minutes=DEFAULT_WINDOW_MINUTES, direction='arrival',
+               departure_buffer_minutes=DEFAULT_DEPARTURE_BUFFER_MINUTES):
+    """Group trips by place and time window and pack each group into vehicles.
+
+    trips is a list of (buyer_id, location, time): arrival time for
+    pickups, departure time for dropoffs. vehicle_types is a list of dicts
+    with transport_type_id, transport_type and capacity.
+
+    Trips are indexed by normalized location and sorted by time. One sweep
+    per location then opens a new group when a trip is more than
+    window_minutes after the group's first trip. Each group is split into
+    vehicles with the fewest seats left empty: the largest vehicle while
+    the group fills it, then the smallest vehicle that fits the rest.
+    Arrival vehicles leave with their last passenger. Departure vehicles
+    reach the station departure_buffer_minutes before their earliest
+    departure.
+
+    Returns a list of vehicles, each a dict with group, location, time,
+    transport_type_id, transport_type, capacity and the buyer_ids it carries.
+    """
+    if not trips:
+        return []
+
+    index = defaultdict(list)
+    for buyer_id, location, time in trips:
+        index[_location_key(location)].append((time, buyer_id, location))
+
+    window = timedelta(minutes=window_minutes)
+    buffer = timedelta(minutes=departure_buffer_minutes)
+    prefix = 'ARR' if direction == 'arrival' else 'DEP'
+    vehicles = []
+    for location_key in sorted(index):
+        entries = sorted(index[location_key])
+        groups = []
+        for entry in entries:
+            if groups and entry[0] - groups[-1][0][0] <= window:
+                groups[-1].append(entry)
+            else:
+                groups.append([entry])
+
+        for group in groups:
+            start = 0
+            for number, vehicle_type in enumerate(_vehicle_sizes(vehicle_types, len(group)), start=1):
+                seated = group[start:start + vehicle_type['capacity']]
+                start += len(seated)
+                if direction == 'arrival':
+                    time = seated[-1][0]
+                else:
+                    time = seated[0][0] - buffer
+                location = seated[0][2]
+                vehicles.append({
+                    'group': f"{prefix}-{group[0][0]:%Y%m%d-%H%M}-{location_key.upper().replace(' ', '_')[:40]}-{number}",
+                    'direction': direction,
+                    'location': location,
+                    'time': time,
+                    'transport_type_id': vehicle_type['transport_type_id'],
+                    'transport_type': vehicle_type['transport_type'],
+                    'capacity': vehicle_type['capacity'],
+                    'buyer_ids': [buyer_id for _, buyer_id, _ in seated]
+                })
+    return vehicles
+
+def fleet_warnings(vehicles, vehicle_types, window_minutes=DEFAULT_WINDOW_MINUTES):
+    """Report windows that need more vehicles of a type than number_available_vehicles.
+
+    Only types with a positive number_available_vehicles are checked.
+    Vehicles are assumed to be free again in the next window.
+    """
+    available = {v['transport_type_id']: v.get('number_available_vehicles') for v in vehicle_types}
+    window_seconds = window_minutes * 60
+    demand = Counter(
+        (vehicle['direction'], int(vehicle['time'].timestamp() // window_seconds), vehicle['transport_type_id'])
+        for vehicle in vehicles
+    )
+    names = {v['transport_type_id']: v['transport_type'] for v in vehicle_types}
+    warnings = []
+    for (direction, bucket, type_id), needed in sorted(demand.items()):
+        if available.get(type_id) and needed > available[type_id]:
+            window_start = next(
+                v['time'] for v in vehicles
+                if v['direction'] == direction and v['transport_type_id'] == type_id
+                and int(v['time'].timestamp() // window_seconds) == bucket
+            )
+            warnings.append(
+                f"{direction.capitalize()}s around {window_start:%Y-%m-%d %H:%M} need {needed} "
+                f"{names[type_id]} vehicles but only {available[type_id]} are available"
+            )
+    return warnings
+
+def journey_leg(location, time):
+    """(location, time) of a journey leg, or None when it was not entered.
+
+    A journey saved in one direction only gets placeholder values for the
+    other (blank location, the time it was saved), so a blank location
+    means the leg is missing.
+    """
+    if not (location or '').strip() or time is None:
+        return None
+    return location, time
+
+def transfer_candidates(buyer_ids=None):
+    """Earliest travel plans with transportation and no ground transportation yet.
+
+    Without buyer_ids, only buyers whose category has hosted transfers are
+    included. Transportation is loaded with the plans in one query.
+    """
+    query = TravelPlan.query.options(joinedload(TravelPlan.transportation)).join(
+        User, User.id == TravelPlan.user_id
+    ).filter(
+        User.role == UserRole.BUYER.value,
+        TravelPlan.transportation.has(),
+        ~TravelPlan.ground_transportation.has()
+    )
+    if buyer_ids is not None:
+        query = query.filter(TravelPlan.user_id.in_(buyer_ids))
+    else:
+        query = query.join(BuyerProfile, BuyerProfile.user_id == User.id).join(
+            BuyerCategory, BuyerCategory.id == BuyerProfile.category_id
+        ).filter(BuyerCategory.transfers_hosted.is_(True))
+    return query.distinct(TravelPlan.user_id).order_by(TravelPlan.user_id, TravelPlan.created_at.asc()).all()
+
+def schedule_transfers(buyer_ids=None, window_minutes=DEFAULT_WINDOW_MINUTES,
+                       departure_buffer_minutes=DEFAULT_DEPARTURE_BUFFER_MINUTES, commit=False):
+    """Pool every candidate buyer into arrival and departure vehicles.
+
+    Candidates come from transfer_candidates(). Arrival pickups use the
+    outbound arrival location and time. Departure dropoffs use the return
+    departure location and time; legs that were never entered (see
+    journey_leg()) are left out. With commit=True one GroundTransportation
+    row per scheduled buyer is added in a single flush. Each row records
+    the vehicle type and group of its legs; a missing leg is left NULL.
+    The caller commits.
+
+    Returns (vehicles, warnings, skipped) where skipped lists buyers that
+    could not be scheduled, or were scheduled in one direction only.
+    """
+    vehicle_types = [
+        {
+            'transport_type_id': t.transport_type_id,
+            'transport_type': t.transport_type,
+            'capacity': t.capacity,
+            'number_available_vehicles': t.number_available_vehicles
+        }
+        for t in TransportType.query.filter(TransportType.capacity > 0).all()
+    ]
+    plans = transfer_candidates(buyer_ids)
+    if not vehicle_types:
+        return [], [], [{'buyer_id': plan.user_id, 'reason': 'No transport types configured'} for plan in plans]
+
+    arrivals, departures, skipped = [], [], []
+    for plan in plans:
+        transportation = plan.transportation
+        arrival = journey_leg(transportation.outbound_arrival_location, transportation.outbound_arrival_datetime)
+        departure = journey_leg(transportation.return_departure_location, transportation.return_departure_datetime)
+        if arrival:
+            arrivals.append((plan.user_id, *arrival))
+        if departure:
+            departures.append((plan.user_id, *departure))
+        if not arrival and not departure:
+            skipped.append({'buyer_id': plan.user_id, 'reason': 'No journey details entered'})
+        elif not arrival:
+            skipped.append({'buyer_id': plan.user_id, 'reason': 'No arrival journey entered; only the departure was scheduled'})
+        elif not departure:
+            skipped.append({'buyer_id': plan.user_id, 'reason': 'No return journey entered; only the arrival was scheduled'})
+
+    vehicles = (
+        pool_trips(arrivals, vehicle_types, window_minutes, 'arrival') +
+        pool_trips(departures, vehicle_types, window_minutes, 'departure', departure_buffer_minutes)
+    )
+    warnings = fleet_warnings(vehicles, vehicle_types, window_minutes)
+
+    if commit:
+        legs = defaultdict(dict)
+        for vehicle in vehicles:
+            for buyer_id in vehicle['buyer_ids']:
+                legs[buyer_id][vehicle['direction']] = vehicle
+        empty = {'location': None, 'time': None, 'transport_type_id': None, 'group': None}
+        db.session.add_all([
+            GroundTransportation(
+                travel_plan_id=plan.id,
+                pickup_location=legs[plan.user_id].get('arrival', empty)['location'],
+                pickup_datetime=legs[plan.user_id].get('arrival', empty)['time'],
+                pickup_vehicle_type=legs[plan.user_id].get('arrival', empty)['transport_type_id'],
+                pickup_driver_contact='',
+                pickup_group=legs[plan.user_id].get('arrival', empty)['group'],
+                dropoff_location=legs[plan.user_id].get('departure', empty)['location'],
+                dropoff_datetime=legs[plan.user_id].get('departure', empty)['time'],
+                dropoff_vehicle_type=legs[plan.user_id].get('departure', empty)['transport_type_id'],
+                dropoff_driver_contact='',
+                dropoff_group=legs[plan.user_id].get('departure', empty)['group']
+            )
+            for plan in plans if plan.user_id in legs
+        ])
+        db.session.flush()
+
+    return vehicles, warnings, skipped
@@ -0,0 +1,292 @@
+import logging
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from werkzeug.utils import secure_filename
+from ..models import db, ImageUpload, SellerProfile, BuyerProfile
+from .external_storage import get_external_storage
+
+MAX_IMAGE_DIMENSION = 1600  # longest side of the stored image
+THUMBNAIL_SIZE = (320, 320)
+MAX_SELLER_IMAGES = 5
+PARALLEL_UPLOADS = 4  # files of one job processed and uploaded at the same time
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+def _image_errors():
+    """Errors Pillow raises for unreadable images; Pillow is imported when the first image is handled"""
+    from PIL import Image, UnidentifiedImageError
+    return (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError)
+
+class InvalidImage(ValueError):
+    pass
+
+class FileTooLarge(ValueError):
+    pass
+
+def spool_upload(file, max_size):
+    """Copy an uploaded file to a temporary file in chunks and return its path.
+
+    Raises FileTooLarge as soon as more than max_size bytes have been read,
+    so oversized files are never held or copied in full. The caller owns the
+    file and removes it with discard_spooled() (upload jobs do this when they finish).
+    """
+    spool = tempfile.NamedTemporaryFile(
+        prefix='upload-', delete=False, dir=current_app.config.get('UPLOAD_SPOOL_DIR')
+    )
+    size = 0
+    try:
+        with spool:
+            while True:
+                chunk = file.stream.read(SPOOL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLarge(f"File '{file.filename}' exceeds {max_size} bytes")
+                spool.write(chunk)
+    except Exception:
+        os.unlink(spool.name)
+        raise
+    return spool.name
+
+def discard_spooled(files):
+    """Remove the temporary files of (filename, content type, path) entries"""
+    for _, _, path in files:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+def validate_image(source):
+    """Check that source (a path or file object) is an image Pillow can read, without decoding all of it"""
+    from PIL import Image
+
+    try:
+        with Image.open(source) as image:
+            image.verify()
+    except _image_errors() as e:
+        raise InvalidImage(str(e))
+
+def _encode(image, format, **params):
+    """Encode image into an anonymous temporary file, rewound for upload"""
+    encoded = tempfile.TemporaryFile()
+    image.save(encoded, format, **params)
+    encoded.seek(0)
+    return encoded
+
+def process_image(source, max_dimension=MAX_IMAGE_DIMENSION):
+    """Re-encode an uploaded image and build a WebP thumbnail.
+
+    source is a path or file object. The image is rotated according to its
+    EXIF orientation, stripped of metadata and downscaled to max_dimension;
+    JPEGs are downscaled while decoding, so a large photo is never held at
+    full resolution. Images with transparency are stored as PNG, everything
+    else as JPEG.
+
+    Returns a dict with 'image' and 'thumbnail' entries of (temporary file,
+    extension, mime type) plus the stored 'size', 'width' and 'height'. The
+    caller closes the temporary files.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(source) as opened:
+            if opened.format == 'JPEG':
+                opened.draft(opened.mode, (max_dimension, max_dimension))
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+    except _image_errors() as e:
+        raise InvalidImage(str(e))
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    stored_width, stored_height = image.size
+
+    if has_alpha:
+        stored = (_encode(image, 'PNG', optimize=True), 'png', 'image/png')
+    else:
+        stored = (_encode(image, 'JPEG', quality=85, optimize=True, progressive=True), 'jpg', 'image/jpeg')
+
+    image.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+
+    return {
+        'image': stored,
+        'thumbnail': (_encode(image, 'WEBP', quality=80), 'webp', 'image/webp'),
+        'size': os.fstat(stored[0].fileno()).st_size,
+        'width': stored_width,
+        'height': stored_height
+    }
+
+def _remote_dir(kind, user_id):
+    if kind == 'seller_images':
+        return ['/Photos', f'/Photos/seller_{user_id}']
+    if kind == 'seller_logo':
+        return ['/Photos', f'/Photos/seller_{user_id}', f'/Photos/seller_{user_id}/logo']
+    return ['/Photos', f'/Photos/buyer_{user_id}', f'/Photos/buyer_{user_id}/profile']
+
+def _store_image(storage, remote_dir, name, processed):
+    """Stream an image and its thumbnail to storage and share both; returns their public URLs"""
+    urls = {}
+    for variant, suffix in (('image', ''), ('thumbnail', '_thumb')):
+        encoded, extension, mime_type = processed[variant]
+        path = f"{remote_dir}/{name}{suffix}.{extension}"
+        logging.info(f"Uploading file :::: {path}")
+        with encoded:
+            storage.upload(path, encoded, mime_type)
+        urls[variant] = storage.share(path)
+    return urls
+
+def _remote_name(kind, user_id, filename):
+    stem = secure_filename(os.path.splitext(filename)[0]) or 'image'
+    if kind == 'seller_logo':
+        return f"logo_{user_id}_{stem}"
+    if kind == 'buyer_profile':
+        return f"buyer_{user_id}_{int(datetime.now().timestamp())}"
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    return f"{timestamp}{str(uuid.uuid4())[:8]}{stem}"
+
+def _process_and_store(storage, kind, user_id, remote_dir, filename, source):
+    """Process one file and upload it; returns (image record, public share URL).
+
+    Only touches the storage client, so files of a job can run in parallel threads.
+    """
+    processed = process_image(source)
+    try:
+        urls = _store_image(storage, remote_dir, _remote_name(kind, user_id, filename), processed)
+    finally:
+        processed['image'][0].close()
+        processed['thumbnail'][0].close()
+    record = {
+        'id': str(uuid.uuid4()),
+        'filename': filename,
+        'url': urls['image'] + "/download",
+        'thumbnail_url': urls['thumbnail'] + "/download",
+        'size': processed['size'],
+        'width': processed['width'],
+        'height': processed['height'],
+        'uploaded_at': datetime.utcnow().isoformat(),
+        'mime_type': processed['image'][2]
+    }
+    return record, urls['image']
+
+def run_image_upload(upload_id, files, storage=None):
+    """Process and upload the files of an ImageUpload job, then update the profile.
+
+    files is a list of (original filename, content type, spooled path); the
+    spooled files are removed when the job ends. Runs in a worker thread
+    with an app context. The target directory is ensured once
+    per job (and remembered by the shared storage client), then the files
+    are processed and uploaded in parallel over its connection pool.
+    """
+    try:
+        _run_image_upload(upload_id, files, storage)
+    finally:
+        discard_spooled(files)
+
+def _run_image_upload(upload_id, files, storage):
+    upload = ImageUpload.query.get(upload_id)
+    upload.status = 'processing'
+    db.session.commit()
+
+    try:
+        storage = storage or get_external_storage()
+        if storage is None:
+            raise RuntimeError('External storage configuration missing')
+
+        remote_dirs = _remote_dir(upload.kind, upload.user_id)
+        for path in remote_dirs[1:]:
+            storage.ensure_dir(path)
+        remote_dir = remote_dirs[-1]
+
+        kind, user_id = upload.kind, upload.user_id
+        with ThreadPoolExecutor(max_workers=max(1, min(len(files), PARALLEL_UPLOADS))) as executor:
+            results = list(executor.map(
+                lambda file: _process_and_store(storage, kind, user_id, remote_dir, file[0], file[2]),
+                files
+            ))
+        records = [record for record, _ in results]
+        share_urls = [url for _, url in results]
+
+        _apply_to_profile(upload, records, share_urls)
+        upload.status = 'done'
+        upload.result = {'images': records}
+    except Exception as e:
+        db.session.rollback()
+        upload = ImageUpload.query.get(upload_id)
+        upload.status = 'failed'
+        upload.error = str(e)
+        logging.error(f"Image upload {upload_id} failed: {str(e)}")
+
+    upload.completed_at = datetime.utcnow()
+    db.session.commit()
+
+def _apply_to_profile(upload, records, share_urls):
+    """Store the uploaded image URLs on the seller or buyer profile"""
+    if upload.kind == 'buyer_profile':
+        profile = BuyerProfile.query.filter_by(user_id=upload.user_id).with_for_update().first()
+        profile.profile_image = share_urls[0]
+        return
+
+    # Lock the row so concurrent uploads for the same seller do not lose images
+    profile = SellerProfile.query.filter_by(user_id=upload.user_id).with_for_update().first()
+    if upload.kind == 'seller_logo':
+        profile.logo_url = records[0]['url']
+        return
+
+    # If total images would exceed the limit, replace all existing images
+    current_images = list(profile.business_images or [])
+    if upload.replace_existing or len(current_images) + len(records) > MAX_SELLER_IMAGES:
+        current_images = []
+    profile.business_images = current_images + records
+
+class ImagePipeline:
+    """Thread pool that runs image upload jobs outside the request"""
+
+    def __init__(self, app, max_workers=4):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-upload')
+
+    def submit(self, upload_id, files):
+        return self.executor.submit(self._run, upload_id, files)
+
+    def _run(self, upload_id, files):
+        with self.app.app_context():
+            try:
+                run_image_upload(upload_id, files)
+            finally:
+                db.session.remove()
+
+def get_image_pipeline():
+    pipeline = current_app.extensions.get('image_pipeline')
+    if pipeline is None:
+        pipeline = ImagePipeline(current_app._get_current_object(), current_app.config.get('IMAGE_UPLOAD_WORKERS', 4))
+        current_app.extensions['image_pipeline'] = pipeline
+    return pipeline
+
+def queue_image_upload(user_id, kind, files, replace_existing=False):
+    """Record an ImageUpload job and hand the files to the worker pool.
+
+    files is a list of (original filename, content type, path) spooled with
+    spool_upload() that have already passed validate_image(); the job takes
+    ownership of the spooled files. Returns the ImageUpload.
+    """
+    upload = ImageUpload(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        kind=kind,
+        status='pending',
+        file_count=len(files),
+        replace_existing=replace_existing
+    )
+    db.session.add(upload)
+    try:
+        db.session.commit()
+    except Exception:
+        discard_spooled(files)
+        raise
+    get_image_pipeline().submit(upload.id, files)
+    return upload
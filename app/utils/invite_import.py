@@ -0,0 +1,64 @@
+import secrets
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, union
+from ..models import db, User, InvitedBuyer
+
+EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+INVITATION_VALID_DAYS = 7
+
+def existing_emails(emails):
+    """Return the lowercased emails that already belong to an invited buyer or user (one query)"""
+    if not emails:
+        return set()
+    query = union(
+        select(func.lower(InvitedBuyer.email)).where(func.lower(InvitedBuyer.email).in_(emails)),
+        select(func.lower(User.email)).where(func.lower(User.email).in_(emails))
+    )
+    return set(db.session.execute(query).scalars())
+
+def import_invites(df, invited_by):
+    """Create invited buyers from a DataFrame with Name and Email columns.
+
+    Emails are validated and de-duplicated with column operations, existing
+    invites and users are looked up in a single query and the new rows are
+    inserted in one flush. Nothing is committed.
+
+    Returns (created invited buyers, number of skipped rows, errors).
+    """
+    import pandas as pd  # imported on first use to keep app startup fast
+
+    rows = pd.DataFrame({
+        'row': df.index + 2,  # +2 because Excel is 1-indexed and has a header row
+        'name': df['Name'].fillna('').astype(str).str.strip(),
+        'email': df['Email'].fillna('').astype(str).str.strip()
+    })
+
+    # Validate email format
+    valid = rows['email'].str.match(EMAIL_PATTERN)
+    errors = [
+        {'row': int(row), 'email': email, 'error': 'Invalid email format'}
+        for row, email in zip(rows.loc[~valid, 'row'], rows.loc[~valid, 'email'])
+    ]
+    rows = rows[valid].assign(email_key=lambda r: r['email'].str.lower())
+
+    # Repeated emails in the sheet and emails already invited or registered are skipped
+    unique_rows = rows.drop_duplicates('email_key')
+    known = existing_emails(unique_rows['email_key'].tolist())
+    new_rows = unique_rows[~unique_rows['email_key'].isin(known)]
+    skipped = len(rows) - len(new_rows)
+
+    expires_at = datetime.utcnow() + timedelta(days=INVITATION_VALID_DAYS)
+    invited_buyers = [
+        InvitedBuyer(
+            name=name,
+            email=email,
+            invitation_token=secrets.token_urlsafe(32),
+            invited_by=invited_by,
+            expires_at=expires_at
+        )
+        for name, email in zip(new_rows['name'], new_rows['email'])
+    ]
+    db.session.add_all(invited_buyers)
+    db.session.flush()
+
+    return invited_buyers, skipped, errors
@@ -0,0 +1,336 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload
+from ..models import (
+    db, User, UserRole, Meeting, MeetingStatus, MeetingDayCount, TimeSlot, BuyerProfile, SellerProfile
+)
+from .booking import SLOT_HOLDING_STATUSES, BookingError
+from .slot_planner import get_schedule_template
+from .system_settings import load_meeting_metadata
+
+# A buyer's wanted property type matching the seller's counts as much as this many shared interests
+PROPERTY_MATCH_WEIGHT = 2
+# Pairs scoring less than this are never scheduled
+MIN_MATCH_SCORE = 1
+# Profiles in these statuses are left out of matchmaking
+EXCLUDED_PROFILE_STATUSES = ('rejected', 'inactive')
+
+def _names(value):
+    """Normalized names from a JSON list or a comma-separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [' '.join(str(name).split()).casefold() for name in value if str(name).strip()]
+
+def _one_hot(rows, vocabulary):
+    """A len(rows) x len(vocabulary) 0/1 matrix marking each row's names"""
+    import numpy as np
+
+    matrix = np.zeros((len(rows), len(vocabulary)), dtype=np.int32)
+    for i, names in enumerate(rows):
+        matrix[i, [vocabulary[name] for name in names]] = 1
+    return matrix
+
+def score_pairs(buyers, sellers):
+    """Score every buyer/seller pair; returns a len(buyers) x len(sellers) int matrix.
+
+    The score is the number of the buyer's interests in the seller's target
+    markets, plus PROPERTY_MATCH_WEIGHT when the seller's property type is
+    one the buyer is looking for. Both terms are products of one-hot
+    matrices, so no pair is scored in Python.
+    """
+    buyer_interests = [_names(b['interests']) for b in buyers]
+    seller_interests = [_names(s['interests']) for s in sellers]
+    buyer_properties = [_names(b['properties']) for b in buyers]
+    seller_properties = [_names([s['property_type']] if s['property_type'] else []) for s in sellers]
+
+    interests = {name: i for i, name in enumerate(sorted({n for names in buyer_interests + seller_interests for n in names}))}
+    properties = {name: i for i, name in enumerate(sorted({n for names in buyer_properties + seller_properties for n in names}))}
+    return (
+        _one_hot(buyer_interests, interests) @ _one_hot(seller_interests, interests).T +
+        PROPERTY_MATCH_WEIGHT * (_one_hot(buyer_properties, properties) @ _one_hot(seller_properties, properties).T)
+    )
+
+def plan_matches(buyers, sellers, slots, buyer_daily_limit, seller_daily_limit, day_counts=None, blocked_pairs=()):
+    """Assign buyer/seller pairs to free seller time slots.
+
+    buyers are dicts with id, interests, properties, vip, max_meetings
+    (None for no event-wide limit) and busy (start times of meetings they
+    already have). sellers are dicts with id, interests and property_type.
+    slots are (slot_id, seller_id, start_time, end_time) of free slots.
+    day_counts maps (user_id, day) to meetings already counted that day.
+    Pairs in blocked_pairs, such as pairs that already meet, are skipped.
+
+    Pairs are scored with score_pairs(). Meetings are then handed out in
+    rounds: each round gives every buyer (VIPs first) one meeting with the
+    best-scoring seller that still has a slot at a time the buyer is free,
+    on a day neither has reached their limit. The earliest such slot is
+    used. Availability is kept as buyer x time and seller x time boolean
+    matrices, so each buyer's best feasible seller is found with a single
+    vectorized test. A seller that is infeasible for a buyer stays
+    infeasible, because slots and daily places only run out, so each buyer
+    walks their ranked sellers once.
+
+    Returns a list of dicts with buyer_id, seller_id, time_slot_id,
+    start_time, end_time and score.
+    """
+    import numpy as np
+
+    if not buyers or not sellers or not slots:
+        return []
+    day_counts = day_counts or {}
+    scores = score_pairs(buyers, sellers)
+    buyer_index = {b['id']: i for i, b in enumerate(buyers)}
+    seller_index = {s['id']: j for j, s in enumerate(sellers)}
+    for buyer_id, seller_id in blocked_pairs:
+        if buyer_id in buyer_index and seller_id in seller_index:
+            scores[buyer_index[buyer_id], seller_index[seller_id]] = -1
+
+    # Time axis: every distinct slot start; days index the daily limits
+    times = sorted({start for _, _, start, _ in slots})
+    time_index = {start: t for t, start in enumerate(times)}
+    days = sorted({start.date() for start in times})
+    day_index = {day: d for d, day in enumerate(days)}
+    time_day = np.array([day_index[start.date()] for start in times])
+
+    slot_ids = np.full((len(sellers), len(times)), -1, dtype=np.int64)
+    slot_ends = {}
+    for slot_id, seller_id, start, end in slots:
+        if seller_id in seller_index:
+            slot_ids[seller_index[seller_id], time_index[start]] = slot_id
+            slot_ends[slot_id] = end
+
+    buyer_left = np.array([[buyer_daily_limit - day_counts.get((b['id'], day), 0) for day in days] for b in buyers])
+    seller_left = np.array([[seller_daily_limit - day_counts.get((s['id'], day), 0) for day in days] for s in sellers])
+    buyer_ok = buyer_left[:, time_day] > 0
+    for i, buyer in enumerate(buyers):
+        for start in buyer['busy']:
+            if start in time_index:
+                buyer_ok[i, time_index[start]] = False
+    seller_ok = (slot_ids >= 0) & (seller_left[:, time_day] > 0)
+    meetings_left = np.array([
+        b['max_meetings'] if b['max_meetings'] is not None else len(times) for b in buyers
+    ])
+
+    # Each buyer's sellers from best to worst, ties by seller order; only pairs worth a meeting
+    ranked = np.argsort(-scores, axis=1, kind='stable')
+    rankings = [row[scores[i, row] >= MIN_MATCH_SCORE] for i, row in enumerate(ranked)]
+    cursors = [0] * len(buyers)
+    buyer_order = sorted(range(len(buyers)), key=lambda i: (not buyers[i].get('vip'), buyers[i]['id']))
+
+    assignments = []
+    active = [i for i in buyer_order if meetings_left[i] > 0 and len(rankings[i])]
+    while active:
+        still_active = []
+        for i in active:
+            candidates = rankings[i][cursors[i]:]
+            feasible = (seller_ok[candidates] & buyer_ok[i]).any(axis=1)
+            if not feasible.any():
+                continue
+            position = int(np.argmax(feasible))
+            j = int(candidates[position])
+            t = int(np.argmax(seller_ok[j] & buyer_ok[i]))
+            d = time_day[t]
+
+            slot_id = int(slot_ids[j, t])
+            assignments.append({
+                'buyer_id': buyers[i]['id'],
+                'seller_id': sellers[j]['id'],
+                'time_slot_id': slot_id,
+                'start_time': times[t],
+                'end_time': slot_ends[slot_id],
+                'score': int(scores[i, j])
+            })
+
+            # The pair never meets twice; earlier candidates were infeasible for good
+            cursors[i] += position + 1
+            seller_ok[j, t] = False
+            buyer_ok[i, t] = False
+            buyer_left[i, d] -= 1
+            if buyer_left[i, d] <= 0:
+                buyer_ok[i, time_day == d] = False
+            seller_left[j, d] -= 1
+            if seller_left[j, d] <= 0:
+                seller_ok[j, time_day == d] = False
+            meetings_left[i] -= 1
+            if meetings_left[i] > 0 and cursors[i] < len(rankings[i]):
+                still_active.append(i)
+        active = still_active
+    return assignments
+
+def _matchmaking_inputs(buyer_ids=None, seller_ids=None):
+    """Load buyers, sellers, free slots, day counts and pairs that already meet"""
+    buyer_query = BuyerProfile.query.options(selectinload(BuyerProfile.category)).join(
+        User, User.id == BuyerProfile.user_id
+    ).filter(
+        User.role == UserRole.BUYER.value,
+        func.coalesce(BuyerProfile.status, '').notin_(EXCLUDED_PROFILE_STATUSES)
+    )
+    seller_query = SellerProfile.query.options(
+        selectinload(SellerProfile.property_type), selectinload(SellerProfile.target_market_relationships)
+    ).join(User, User.id == SellerProfile.user_id).filter(
+        User.role == UserRole.SELLER.value,
+        func.coalesce(SellerProfile.status, '').notin_(EXCLUDED_PROFILE_STATUSES)
+    )
+    if buyer_ids is not None:
+        buyer_query = buyer_query.filter(BuyerProfile.user_id.in_(buyer_ids))
+    if seller_ids is not None:
+        seller_query = seller_query.filter(SellerProfile.user_id.in_(seller_ids))
+    buyer_profiles = buyer_query.order_by(BuyerProfile.user_id).all()
+    seller_profiles = seller_query.order_by(SellerProfile.user_id).all()
+    buyer_user_ids = [p.user_id for p in buyer_profiles]
+    seller_user_ids = [p.user_id for p in seller_profiles]
+
+    # Active meetings of these buyers: their times are taken and their pairs do not meet again
+    busy = {user_id: set() for user_id in buyer_user_ids}
+    blocked_pairs = set()
+    if buyer_user_ids:
+        for buyer_id, seller_id, status, start_time in db.session.query(
+            Meeting.buyer_id, Meeting.seller_id, Meeting.status, TimeSlot.start_time
+        ).outerjoin(TimeSlot, TimeSlot.id == Meeting.time_slot_id).filter(
+            Meeting.buyer_id.in_(buyer_user_ids), Meeting.status != MeetingStatus.CANCELLED
+        ):
+            blocked_pairs.add((buyer_id, seller_id))
+            if start_time is not None and status in SLOT_HOLDING_STATUSES:
+                busy[buyer_id].add(start_time)
+
+    template = get_schedule_template()
+    slots = [
+        (slot.id, slot.user_id, slot.start_time, slot.end_time)
+        for slot in TimeSlot.query.filter(
+            TimeSlot.user_id.in_(seller_user_ids),
+            TimeSlot.is_available.is_(True),
+            TimeSlot.meeting_id.is_(None),
+            TimeSlot.start_time >= datetime.now()
+        ).order_by(TimeSlot.start_time, TimeSlot.user_id)
+        if not template.in_break(slot.start_time, slot.end_time)
+    ] if seller_user_ids else []
+
+    day_counts = {
+        (row.user_id, row.day): row.meetings
+        for row in MeetingDayCount.query.filter(MeetingDayCount.user_id.in_(buyer_user_ids + seller_user_ids))
+    }
+
+    buyers = [
+        {
+            'id': p.user_id,
+            'interests': p.interests,
+            'properties': p.properties_of_interest,
+            'vip': bool(p.vip),
+            'max_meetings': p.category.max_meetings if p.category and p.category.max_meetings else None,
+            'busy': busy[p.user_id]
+        }
+        for p in buyer_profiles
+    ]
+    sellers = [
+        {
+            'id': p.user_id,
+            'interests': [interest.name for interest in p.target_market_relationships],
+            'property_type': p.property_type.name if p.property_type else None
+        }
+        for p in seller_profiles
+    ]
+    return buyers, sellers, slots, day_counts, blocked_pairs
+
+def schedule_meetings(buyer_ids=None, seller_ids=None, commit=False, requestor_id=None):
+    """Plan a timetable of buyer/seller meetings in free seller slots.
+
+    Without ids every buyer and seller with a profile takes part, except
+    those whose profile status is rejected or inactive. Event-wide limits
+    come from the buyer's category. Daily limits come from the
+    max_buyer_meetings_per_day and max_seller_attendees_per_day settings,
+    applied on top of the meeting_day_counts counters. Slots in a break
+    are not used.
+
+    With commit=True the buyers' users rows are locked first, as in
+    booking. The slots are then claimed with one conditional UPDATE, and
+    a slot booked in the meantime drops its meeting from the plan. The
+    pending meetings, the slot links and the counters are written in bulk.
+    The caller commits. BookingError is raised (after a rollback) if a
+    concurrent booking pushed a counter past its limit.
+
+    Returns (assignments, summary).
+    """
+    if commit:
+        # Same lock as book_meeting, so these buyers cannot book while the plan is written
+        locked = User.query.filter(User.role == UserRole.BUYER.value)
+        if buyer_ids is not None:
+            locked = locked.filter(User.id.in_(buyer_ids))
+        locked.order_by(User.id).with_for_update(key_share=True).all()
+
+    buyers, sellers, slots, day_counts, blocked_pairs = _matchmaking_inputs(buyer_ids, seller_ids)
+    metadata = load_meeting_metadata()
+    assignments = plan_matches(
+        buyers, sellers, slots,
+        metadata['max_buyer_meetings_per_day'], metadata['max_seller_attendees_per_day'],
+        day_counts, blocked_pairs
+    )
+
+    if commit and assignments:
+        assignments = _write_assignments(assignments, metadata, requestor_id)
+
+    scheduled = Counter(a['buyer_id'] for a in assignments)
+    summary = {
+        'buyers': len(buyers),
+        'sellers': len(sellers),
+        'free_slots': len(slots),
+        'meetings': len(assignments),
+        'buyers_without_meetings': sum(1 for b in buyers if not scheduled[b['id']]),
+        'average_score': round(sum(a['score'] for a in assignments) / len(assignments), 2) if assignments else 0
+    }
+    return assignments, summary
+
+def _write_assignments(assignments, metadata, requestor_id):
+    """Claim the planned slots and write meetings, slot links and counters; returns the meetings written"""
+    claimed = set(db.session.execute(
+        update(TimeSlot)
+        .where(TimeSlot.id.in_([a['time_slot_id'] for a in assignments]), TimeSlot.is_available.is_(True))
+        .values(is_available=False)
+        .returning(TimeSlot.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    assignments = [a for a in assignments if a['time_slot_id'] in claimed]
+    if not assignments:
+        return assignments
+
+    deltas = Counter()
+    for a in assignments:
+        deltas[a['buyer_id'], a['start_time'].date()] += 1
+        deltas[a['seller_id'], a['start_time'].date()] += 1
+    statement = pg_insert(MeetingDayCount).values([
+        {'user_id': user_id, 'day': day, 'meetings': delta} for (user_id, day), delta in sorted(deltas.items())
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'day'],
+        set_={'meetings': MeetingDayCount.meetings + statement.excluded.meetings}
+    ).returning(MeetingDayCount.user_id, MeetingDayCount.day, MeetingDayCount.meetings)
+    buyer_ids = {a['buyer_id'] for a in assignments}
+    for user_id, day, meetings in db.session.execute(statement):
+        limit = metadata['max_buyer_meetings_per_day'] if user_id in buyer_ids else metadata['max_seller_attendees_per_day']
+        if meetings > limit:
+            db.session.rollback()
+            raise BookingError(f'Meetings were booked while scheduling; user {user_id} is over the limit on {day.isoformat()}', 409)
+
+    meetings = [
+        Meeting(
+            buyer_id=a['buyer_id'],
+            seller_id=a['seller_id'],
+            requestor_id=requestor_id,
+            time_slot_id=a['time_slot_id'],
+            notes='Scheduled by matchmaking',
+            status=MeetingStatus.PENDING
+        )
+        for a in assignments
+    ]
+    db.session.add_all(meetings)
+    db.session.flush()
+    db.session.execute(
+        update(TimeSlot.__table__).where(TimeSlot.id == bindparam('b_slot_id')).values(meeting_id=bindparam('b_meeting_id')),
+        [{'b_slot_id': m.time_slot_id, 'b_meeting_id': m.id} for m in meetings]
+    )
+    for a, m in zip(assignments, meetings):
+        a['meeting_id'] = m.id
+    return assignments
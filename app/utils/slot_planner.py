@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from ..models import db, TimeSlot, Meeting
+from .system_settings import load_meeting_metadata
+
+SLOT_INSERT_BATCH_SIZE = 1000
+
+class ScheduleTemplate:
+    """The meeting slots of one event day, as offsets from midnight.
+
+    Built from the meeting metadata settings (duration, interval, day start
+    and end, breaks). The version identifies the settings it was built from.
+    """
+
+    def __init__(self, version, slots, breaks=()):
+        self.version = version
+        self.slots = slots  # tuple of (start offset, end offset) timedeltas
+        self.breaks = breaks  # same, for the breaks
+
+    def slots_for_day(self, day):
+        """Return (start, end) datetimes of the template's slots on a date"""
+        midnight = datetime.combine(day, datetime.min.time())
+        return [(midnight + start, midnight + end) for start, end in self.slots]
+
+    def in_break(self, start, end):
+        """Whether a (start, end) datetime range overlaps one of the day's breaks"""
+        midnight = datetime.combine(start.date(), datetime.min.time())
+        return any(start < midnight + break_end and midnight + break_start < end for break_start, break_end in self.breaks)
+
+def _parse_time_of_day(value):
+    """Parse a time such as '9:00 AM' into an offset from midnight"""
+    parsed = datetime.strptime(value.strip(), '%I:%M %p')
+    return timedelta(hours=parsed.hour, minutes=parsed.minute)
+
+@lru_cache(maxsize=32)
+def _compile_template(version):
+    duration, interval, day_start, day_end, breaks = version
+    slot_length = timedelta(minutes=duration)
+    step = timedelta(minutes=duration + interval)
+    breaks = sorted((_parse_time_of_day(start), _parse_time_of_day(end)) for start, end in breaks)
+
+    slots = []
+    start = _parse_time_of_day(day_start)
+    end_of_day = _parse_time_of_day(day_end)
+    while start + slot_length <= end_of_day:
+        end = start + slot_length
+        overlapping = [break_end for break_start, break_end in breaks if start < break_end and break_start < end]
+        if overlapping:
+            # Resume after the break
+            start = max(overlapping)
+            continue
+        slots.append((start, end))
+        start += step
+    return ScheduleTemplate(version, tuple(slots), tuple(breaks))
+
+def get_schedule_template(metadata=None):
+    """Return the schedule template for the current meeting metadata.
+
+    Templates are compiled once per distinct combination of settings and
+    reused until the settings change.
+    """
+    metadata = metadata or load_meeting_metadata()
+    duration = metadata['meeting_duration'] if metadata['meeting_duration'] > 0 else 10
+    version = (
+        duration,
+        max(metadata['meeting_interval'], 0),
+        metadata['day_start_time'],
+        metadata['day_end_time'],
+        tuple(
+            (b['startTime'], b['endTime'])
+            for b in metadata['meeting_breaks']
+            if b.get('startTime') and b.get('endTime')
+        )
+    )
+    return _compile_template(version)
+
+def slot_grid(template, start_date, end_date):
+    """Return the (start, end) times of all future template slots between two dates"""
+    now = datetime.now()
+    grid = []
+    for day in range((end_date.date() - start_date.date()).days + 1):
+        for slot_start, slot_end in template.slots_for_day(start_date.date() + timedelta(days=day)):
+            # Skip slots in the past
+            if slot_start >= now:
+                grid.append((slot_start, slot_end))
+    return grid
+
+def insert_slots(user_ids, grid):
+    """Insert the slot grid for each user, skipping slots that already exist.
+
+    Uses INSERT ... ON CONFLICT DO NOTHING on the (user_id, start_time) unique
+    constraint in batches. Returns the number of slots created per user id.
+    """
+    rows = [
+        {'user_id': user_id, 'start_time': slot_start, 'end_time': slot_end, 'is_available': True}
+        for user_id in user_ids
+        for slot_start, slot_end in grid
+    ]
+
+    created = {user_id: 0 for user_id in user_ids}
+    for offset in range(0, len(rows), SLOT_INSERT_BATCH_SIZE):
+        statement = pg_insert(TimeSlot).values(rows[offset:offset + SLOT_INSERT_BATCH_SIZE])
+        statement = statement.on_conflict_do_nothing(
+            index_elements=['user_id', 'start_time']
+        ).returning(TimeSlot.user_id)
+        for user_id in db.session.execute(statement).scalars():
+            created[user_id] += 1
+    return created
+
+def regenerate_slots(user_ids, start_date, end_date, template=None):
+    """Bring the users' slots between two dates in line with the schedule template.
+
+    Free slots that are not part of the template are deleted in one statement
+    and missing template slots are inserted. Booked slots, and slots referenced
+    by any meeting, are never touched. Nothing is committed.
+
+    Returns (slots created per user id, number of slots deleted).
+    """
+    template = template or get_schedule_template()
+    grid = slot_grid(template, start_date, end_date)
+    range_start = max(datetime.combine(start_date.date(), datetime.min.time()), datetime.now())
+    range_end = datetime.combine(end_date.date(), datetime.min.time()) + timedelta(days=1)
+
+    stale = TimeSlot.query.filter(
+        TimeSlot.user_id.in_(user_ids),
+        TimeSlot.start_time >= range_start,
+        TimeSlot.start_time < range_end,
+        TimeSlot.is_available == True,
+        TimeSlot.meeting_id.is_(None),
+        ~TimeSlot.id.in_(select(Meeting.time_slot_id).where(Meeting.time_slot_id.isnot(None)))
+    )
+    if grid:
+        stale = stale.filter(tuple_(TimeSlot.start_time, TimeSlot.end_time).notin_(grid))
+    deleted = stale.delete(synchronize_session=False)
+
+    return insert_slots(user_ids, grid), deleted
@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from ..models import db, SystemSetting
+
+DEFAULT_MEETING_BREAKS = [
+    {
+        "id": 1,
+        "label": "Lunch Break",
+        "startTime": "12:00 PM",
+        "endTime": "1:00 PM"
+    }
+]
+
+# Meeting metadata keys and the values used when a setting is missing or invalid
+MEETING_METADATA_DEFAULTS = {
+    'meeting_duration': 10,
+    'meeting_interval': 5,
+    'day_start_time': '9:00 AM',
+    'day_end_time': '5:00 PM',
+    'meeting_breaks': DEFAULT_MEETING_BREAKS,
+    'max_seller_attendees_per_day': 230,
+    'max_buyer_meetings_per_day': 30
+}
+
+INTEGER_METADATA_KEYS = ('meeting_duration', 'meeting_interval', 'max_seller_attendees_per_day', 'max_buyer_meetings_per_day')
+
+class SettingsCache:
+    """Process-level cache of the system_settings table.
+
+    All rows are loaded in one query. Writes made through this process call
+    invalidate(); changes made by other workers are noticed by comparing a
+    cheap version (row count and latest timestamps) at most once every
+    check_interval seconds.
+    """
+
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self._values = None
+        self._version = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def values(self):
+        """Return a dict of setting key -> raw string value"""
+        # Read once: invalidate() may reset self._values from another thread at any time
+        values = self._values
+        if values is None or time.monotonic() >= self._next_check:
+            with self._lock:
+                if self._values is None:
+                    self._load()
+                elif time.monotonic() >= self._next_check:
+                    if self._current_version() != self._version:
+                        self._load()
+                    self._next_check = time.monotonic() + self.check_interval
+                values = self._values
+        return values
+
+    def invalidate(self):
+        """Drop the cached settings; the next read reloads them"""
+        with self._lock:
+            self._values = None
+
+    def _load(self):
+        rows = db.session.query(
+            SystemSetting.key, SystemSetting.value, SystemSetting.created_at, SystemSetting.updated_at
+        ).all()
+        self._values = {key: value for key, value, _, _ in rows}
+        self._version = (
+            len(rows),
+            max((created_at for _, _, created_at, _ in rows if created_at), default=None),
+            max((updated_at for _, _, _, updated_at in rows if updated_at), default=None)
+        )
+        self._next_check = time.monotonic() + self.check_interval
+
+    def _current_version(self):
+        count, created_at, updated_at = db.session.query(
+            func.count(SystemSetting.id), func.max(SystemSetting.created_at), func.max(SystemSetting.updated_at)
+        ).one()
+        return (count, created_at, updated_at)
+
+def get_settings_cache():
+    """Return the settings cache for the current app, creating it on first use"""
+    cache = current_app.extensions.get('system_settings')
+    if cache is None:
+        cache = SettingsCache(check_interval=current_app.config.get('SYSTEM_SETTINGS_CHECK_SECONDS', 5))
+        current_app.extensions['system_settings'] = cache
+    return cache
+
+def invalidate_settings():
+    """Call after committing changes to system_settings"""
+    get_settings_cache().invalidate()
+
+def get_setting(key, default=None):
+    """Get a setting's string value; missing or empty settings return the default"""
+    value = get_settings_cache().values().get(key)
+    return value if value else default
+
+def get_bool_setting(key, default=False):
+    value = get_setting(key)
+    return default if value is None else value.lower() == 'true'
+
+def get_int_setting(key, default=None):
+    try:
+        return int(get_setting(key))
+    except (ValueError, TypeError):
+        return default
+
+def get_date_setting(key, default=None):
+    """Get a YYYY-MM-DD setting as a date"""
+    value = get_setting(key)
+    if value:
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            pass
+    return default
+
+def load_meeting_metadata():
+    """Return the meeting metadata settings, falling back to the defaults"""
+    values = get_settings_cache().values()
+
+    metadata = {}
+    for key, default in MEETING_METADATA_DEFAULTS.items():
+        if key not in values:
+            metadata[key] = default
+        elif key == 'meeting_breaks':
+            # Parse JSON for breaks
+            try:
+                metadata[key] = json.loads(values[key])
+            except (json.JSONDecodeError, TypeError):
+                metadata[key] = []
+        elif key in INTEGER_METADATA_KEYS:
+            try:
+                metadata[key] = int(values[key])
+            except (ValueError, TypeError):
+                metadata[key] = default
+        else:
+            metadata[key] = values[key]
+    return metadata
@@ -0,0 +1,124 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from ..models import db, RevokedToken
+
+# Rows committed slightly out of created_at order are still picked up by re-reading this window
+SYNC_OVERLAP = timedelta(seconds=60)
+
+class MemoryTokenBlocklist:
+    """Process-local token blocklist.
+
+    Revoked jtis are kept until their token expires. Logouts are only seen by
+    the worker that handled them, so this backend is meant for tests and
+    single-process development servers.
+    """
+
+    def __init__(self):
+        self._revoked = {}  # jti -> token expiry as a UTC timestamp
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires_at):
+        """Revoke a token until expires_at (UTC timestamp, as in the JWT exp claim)"""
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        """Check whether a token has been revoked"""
+        expires_at = self._revoked.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            # The token is rejected as expired anyway, no need to remember it
+            self._revoked.pop(jti, None)
+            return False
+        return True
+
+    def evict_expired(self):
+        """Forget revoked tokens that have expired"""
+        now = time.time()
+        with self._lock:
+            for jti in [jti for jti, expires_at in self._revoked.items() if expires_at <= now]:
+                del self._revoked[jti]
+
+class DatabaseTokenBlocklist(MemoryTokenBlocklist):
+    """Token blocklist stored in the revoked_tokens table and shared by all workers.
+
+    Each worker mirrors the revoked jtis in memory and pulls rows written by
+    other workers at most once every sync_interval seconds, so checking a
+    token is a dictionary lookup rather than a query per request.
+    """
+
+    def __init__(self, sync_interval=5):
+        super().__init__()
+        self.sync_interval = sync_interval
+        self._synced_until = None
+        self._next_sync = 0.0
+
+    def revoke(self, jti, expires_at):
+        super().revoke(jti, expires_at)
+
+        if not RevokedToken.query.get(jti):
+            db.session.add(RevokedToken(jti=jti, expires_at=datetime.utcfromtimestamp(expires_at)))
+
+        # Expired tokens are rejected by their exp claim, so their rows can go
+        RevokedToken.query.filter(
+            RevokedToken.expires_at < datetime.utcnow()
+        ).delete(synchronize_session=False)
+
+        db.session.commit()
+
+    def is_revoked(self, jti):
+        if super().is_revoked(jti):
+            return True
+
+        if time.monotonic() < self._next_sync:
+            return False
+
+        self.sync()
+        return super().is_revoked(jti)
+
+    def sync(self):
+        """Load tokens revoked since the last sync, including by other workers"""
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            self._next_sync = time.monotonic() + self.sync_interval
+
+            now = datetime.utcnow()
+            query = db.session.query(
+                RevokedToken.jti, RevokedToken.expires_at
+            ).filter(RevokedToken.expires_at > now)
+
+            if self._synced_until:
+                query = query.filter(RevokedToken.created_at > self._synced_until - SYNC_OVERLAP)
+
+            try:
+                rows = query.all()
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.warning(f"Could not sync token blocklist: {str(e)}")
+                return
+
+            for jti, expires_at in rows:
+                self._revoked[jti] = (expires_at - datetime(1970, 1, 1)).total_seconds()
+            self._synced_until = now
+
+        self.evict_expired()
+
+def get_token_blocklist():
+    """Return the token blocklist for the current app, creating it on first use.
+
+    The backend is chosen by the JWT_BLOCKLIST_BACKEND setting ('database' or 'memory').
+    """
+    blocklist = current_app.extensions.get('token_blocklist')
+    if blocklist is None:
+        if current_app.config.get('JWT_BLOCKLIST_BACKEND', 'database') == 'memory':
+            blocklist = MemoryTokenBlocklist()
+        else:
+            blocklist = DatabaseTokenBlocklist(
+                sync_interval=current_app.config.get('JWT_BLOCKLIST_SYNC_SECONDS', 5)
+            )
+        current_app.extensions['token_blocklist'] = blocklist
+    return blocklist
@@ -0,0 +1,51 @@
+"""
+Benchmark the ground-transport pooling used by /api/admin/transportation/schedule.
+
+Pools generated buyer arrivals (5,000 by default) at four airports and
+stations spread over three days into 7-seat and 3-seat vehicles. Only the
+in-memory grouping is timed, so no database is needed:
+
+    python benchmarks/ground_transport.py [buyers]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.ground_transport import pool_trips
+
+LOCATIONS = ['Calicut Airport (CCJ)', 'Kannur Airport (CNN)', 'Kozhikode Railway Station', 'Mysore Bus Stand']
+VEHICLE_TYPES = [
+    {'transport_type_id': 1, 'transport_type': 'Tempo Traveller', 'capacity': 7},
+    {'transport_type_id': 2, 'transport_type': 'Sedan', 'capacity': 3},
+]
+
+
+def make_trips(buyers, seed=25):
+    rng = random.Random(seed)
+    start = datetime(2025, 7, 10, 6, 0)
+    return [
+        (buyer_id, rng.choice(LOCATIONS), start + timedelta(minutes=rng.randrange(3 * 24 * 60)))
+        for buyer_id in range(1, buyers + 1)
+    ]
+
+
+def main():
+    buyers = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    trips = make_trips(buyers)
+
+    start = time.perf_counter()
+    vehicles = pool_trips(trips, VEHICLE_TYPES)
+    elapsed = time.perf_counter() - start
+
+    seats = sum(vehicle['capacity'] for vehicle in vehicles)
+    print(f'buyers: {buyers}, locations: {len(LOCATIONS)}')
+    print(f'vehicles: {len(vehicles)}, groups: {len({v["group"].rsplit("-", 1)[0] for v in vehicles})}, '
+          f'seat use: {buyers / seats:.0%}, time: {elapsed * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
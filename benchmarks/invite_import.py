@@ -0,0 +1,71 @@
+"""
+Benchmark the bulk invite import used by /api/admin/upload-invites.
+
+Imports a generated sheet of invites (10,000 rows by default) and queues their
+invitation emails inside a transaction that is rolled back afterwards, so it
+can be run against any database with an admin user:
+
+    DATABASE_URI=postgresql://... python benchmarks/invite_import.py [rows]
+"""
+import logging
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import event
+from app import create_app
+from app.models import db, User, UserRole
+from app.utils.email_service import send_invitation_email, new_email_job_id
+from app.utils.invite_import import import_invites
+
+
+def make_sheet(rows):
+    """Build an invite sheet with a few invalid and repeated emails mixed in"""
+    run = uuid.uuid4().hex[:8]
+    names = [f'Buyer {i}' for i in range(rows)]
+    emails = [f'bench-{run}-{i}@example.com' for i in range(rows)]
+    for i in range(0, rows, 100):
+        emails[i] = 'not-an-email'
+    for i in range(50, rows, 100):
+        emails[i] = emails[i - 1].upper()
+    return pd.DataFrame({'Name': names, 'Email': emails})
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    app = create_app()
+    app.config['EMAIL_WORKER_ENABLED'] = False
+    logging.disable(logging.CRITICAL)
+
+    with app.app_context():
+        admin = User.query.filter_by(role=UserRole.ADMIN.value).first()
+        if not admin:
+            sys.exit('An admin user is required')
+
+        df = make_sheet(rows)
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        try:
+            start = time.perf_counter()
+            invited_buyers, skipped, errors = import_invites(df, admin.id)
+            imported = time.perf_counter()
+            job_id = new_email_job_id()
+            for invited_buyer in invited_buyers:
+                send_invitation_email(invited_buyer, job_id=job_id, commit=False)
+            db.session.flush()
+            queued = time.perf_counter()
+        finally:
+            db.session.rollback()
+
+        print(f'rows: {rows}, created: {len(invited_buyers)}, skipped: {skipped}, invalid: {len(errors)}')
+        print(f'import: {imported - start:.2f}s, queue emails: {queued - imported:.2f}s, '
+              f'total: {queued - start:.2f}s, SQL statements: {len(statements)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the meeting matchmaking planner used by /api/meetings/auto-schedule.
+
+Plans a timetable for generated buyers and sellers (500 x 300 by default),
+each seller offering 40 slots over two days. Interests and property types
+are drawn from fixed lists, and daily limits are the default settings.
+Only the in-memory planner is timed, so no database is needed:
+
+    python benchmarks/matchmaking.py [buyers] [sellers] [slots per seller]
+"""
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.matchmaking import plan_matches
+
+INTERESTS = [
+    'Wildlife', 'Trekking', 'Photography', 'Adventure Sports', 'Nature', 'Cultural Tours', 'Wellness',
+    'Ayurveda', 'Honeymoon', 'Family', 'Plantation Stays', 'Bird Watching', 'Camping', 'Heritage',
+    'Food Trails', 'Corporate', 'MICE', 'Weddings', 'Eco Tourism', 'Tribal Culture'
+]
+PROPERTY_TYPES = ['Resorts', 'Hotels', 'Homestays', 'Villas', 'Tree Houses', 'Camping', 'Hostels', 'Service Villas']
+
+
+def make_event(buyers, sellers, slots_per_seller, seed=25):
+    rng = random.Random(seed)
+    buyer_rows = [
+        {
+            'id': buyer_id,
+            'interests': rng.sample(INTERESTS, rng.randint(2, 6)),
+            'properties': rng.sample(PROPERTY_TYPES, rng.randint(1, 3)),
+            'vip': rng.random() < 0.05,
+            'max_meetings': None,
+            'busy': set()
+        }
+        for buyer_id in range(1, buyers + 1)
+    ]
+    seller_rows = [
+        {
+            'id': seller_id,
+            'interests': rng.sample(INTERESTS, rng.randint(2, 8)),
+            'property_type': rng.choice(PROPERTY_TYPES)
+        }
+        for seller_id in range(100001, 100001 + sellers)
+    ]
+    per_day = slots_per_seller // 2
+    starts = [
+        datetime(2030, 7, 11 + day, 9, 0) + timedelta(minutes=15 * i)
+        for day in range(2) for i in range(per_day)
+    ]
+    slots = [
+        (seller['id'] * 1000 + n, seller['id'], start, start + timedelta(minutes=10))
+        for seller in seller_rows for n, start in enumerate(starts)
+    ]
+    return buyer_rows, seller_rows, slots
+
+
+def main():
+    args = [int(a) for a in sys.argv[1:]]
+    buyers, sellers, slots_per_seller = args + [500, 300, 40][len(args):]
+    buyer_rows, seller_rows, slots = make_event(buyers, sellers, slots_per_seller)
+
+    start = time.perf_counter()
+    assignments = plan_matches(buyer_rows, seller_rows, slots, buyer_daily_limit=30, seller_daily_limit=230)
+    elapsed = time.perf_counter() - start
+
+    per_buyer = Counter(a['buyer_id'] for a in assignments)
+    print(f'buyers: {buyers}, sellers: {sellers}, slots: {len(slots)}')
+    print(f'meetings: {len(assignments)}, slots used: {len(assignments) / len(slots):.0%}, '
+          f'buyers without meetings: {buyers - len(per_buyer)}, '
+          f'average score: {sum(a["score"] for a in assignments) / max(len(assignments), 1):.2f}, '
+          f'time: {elapsed * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark the automatic room-assignment solver used by /api/admin/accommodations/auto-assign.
+
+Plans rooms for generated hosted buyers (1,000 by default) across 40 host
+properties. Arrivals are spread over three days and a mix of single and
+shared rooms and VIPs is used. Only the in-memory solver is timed, so no
+database is needed:
+
+    python benchmarks/room_assignment.py [buyers]
+"""
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.accommodation import plan_room_assignments, room_usage
+
+
+def make_stays(buyers, seed=25):
+    rng = random.Random(seed)
+    start = datetime(2025, 7, 10, 6, 0)
+    stays = []
+    for buyer_id in range(1, buyers + 1):
+        check_in = start + timedelta(minutes=rng.randrange(3 * 24 * 60))
+        stays.append({
+            'buyer_id': buyer_id,
+            'room_type': 'single' if rng.random() < 0.3 else 'shared',
+            'priority': rng.random() < 0.05,
+            'check_in_datetime': check_in,
+            'check_out_datetime': check_in + timedelta(hours=rng.randrange(24, 96))
+        })
+    return stays
+
+
+def main():
+    buyers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    stays = make_stays(buyers)
+    properties = [(property_id, 12 + property_id % 10, Counter()) for property_id in range(1, 41)]
+
+    start = time.perf_counter()
+    assignments, unassigned = plan_room_assignments(stays, properties)
+    elapsed = time.perf_counter() - start
+
+    rooms = Counter()
+    for assignment in assignments:
+        rooms[assignment['host_property_id'], assignment['room_type']] += 1
+    used = sum(room_usage(rooms[p, 'shared'], rooms[p, 'single'])[0] for p, _, _ in properties)
+    print(f'buyers: {buyers}, properties: {len(properties)}, rooms: {sum(r for _, r, _ in properties)}')
+    print(f'assigned: {len(assignments)}, unassigned: {len(unassigned)}, rooms used: {used}, '
+          f'time: {elapsed * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
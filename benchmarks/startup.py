@@ -0,0 +1,58 @@
+"""
+Benchmark worker boot: importing the app package and running create_app().
+
+Starts a fresh interpreter with `python -X importtime` several times (5 by
+default). It reports the median wall time of import plus create_app() and
+the slowest top-level imports of the last run. No database is needed; the
+app must not connect at startup:
+
+    python benchmarks/startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CODE = "import logging; logging.disable(logging.CRITICAL); from app import create_app; create_app()"
+
+
+def boot():
+    """Boot the app once; returns (seconds, importtime report lines)"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CODE], cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, 'DATABASE_URI': os.getenv('DATABASE_URI', 'postgresql://nobody@127.0.0.1:9/none')}
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    return elapsed, [line for line in result.stderr.splitlines() if line.startswith('import time:')]
+
+
+def slowest_imports(report, count=10):
+    """(cumulative microseconds, module) of the slowest imports up to two levels deep"""
+    imports = []
+    for line in report[1:]:  # the first line is the column header
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 2:
+            imports.append((int(cumulative_us), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [boot() for _ in range(runs)]
+    times = [elapsed for elapsed, _ in results]
+    report = results[-1][1]
+    print(f'runs: {runs}, median boot: {statistics.median(times) * 1000:.0f} ms '
+          f'(min {min(times) * 1000:.0f} ms, max {max(times) * 1000:.0f} ms)')
+    print('slowest imports (cumulative):')
+    for us, name in slowest_imports(report):
+        print(f'  {us / 1000:8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main()
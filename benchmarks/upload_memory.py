@@ -0,0 +1,105 @@
+"""
+Benchmark worker memory while handling concurrent large image uploads.
+
+Pushes N concurrent 20 MB JPEG uploads (8 by default) through the upload path
+and reports the peak RSS of the process, once with the upload handling as it
+was before (whole file read into memory, decoded at full resolution) and once
+with the streaming path (spool_upload() + process_image()). Storage is not
+involved, so no database or Nextcloud is needed:
+
+    python benchmarks/upload_memory.py [concurrency]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from PIL import Image, ImageOps
+from werkzeug.datastructures import FileStorage
+from app.utils.image_pipeline import spool_upload, discard_spooled, validate_image, process_image, MAX_IMAGE_DIMENSION
+
+UPLOAD_SIZE = 20 * 1024 * 1024
+
+
+def make_upload(path):
+    """Write a noisy JPEG of roughly UPLOAD_SIZE bytes to path"""
+    width, height = 5000, 4000
+    noise = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+    noise.save(path, 'JPEG', quality=94)
+    return os.path.getsize(path)
+
+
+def buffered(path):
+    """The previous handling: file.read(), BytesIO copies and a full-resolution decode"""
+    with open(path, 'rb') as upload:
+        data = upload.read()
+    with Image.open(BytesIO(data)) as image:
+        image.verify()
+    with Image.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    image = image.convert('RGB')
+    image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.LANCZOS)
+    encoded = BytesIO()
+    image.save(encoded, 'JPEG', quality=85)
+    return len(encoded.getvalue())
+
+
+def streaming(path):
+    """The current handling: chunked spool to disk, draft decode, encode to temp files"""
+    with open(path, 'rb') as upload:
+        spooled = spool_upload(FileStorage(upload, filename='upload.jpg'), UPLOAD_SIZE * 2)
+    try:
+        validate_image(spooled)
+        processed = process_image(spooled)
+        processed['image'][0].close()
+        processed['thumbnail'][0].close()
+        return processed['size']
+    finally:
+        discard_spooled([('upload.jpg', 'image/jpeg', spooled)])
+
+
+def run(mode, concurrency, path):
+    handler = {'buffered': buffered, 'streaming': streaming}[mode]
+    app = Flask(__name__)
+    # ru_maxrss is the peak RSS so far, in kilobytes on Linux
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def upload(_):
+        with app.app_context():
+            return handler(path)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(upload, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    print(f'{mode:>9}: {concurrency} uploads in {elapsed:.2f}s, '
+          f'peak RSS +{(peak - baseline) / 1024 / 1024:.0f} MB over baseline')
+
+
+def main():
+    if len(sys.argv) > 3:
+        # Child process: one mode, so each gets a clean peak RSS
+        run(sys.argv[1], int(sys.argv[2]), sys.argv[3])
+        return
+
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'upload.jpg')
+        size = make_upload(path)
+        print(f'upload: {size / 1024 / 1024:.1f} MB JPEG, concurrency: {concurrency}')
+        for mode in ('buffered', 'streaming'):
+            subprocess.run([sys.executable, __file__, mode, str(concurrency), path], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+-- Migration to maintain the admin dashboard counts incrementally
+-- Used when DASHBOARD_STATS_SOURCE=counters; GET /api/admin/dashboard then reads
+-- seven rows instead of counting users, listings, meetings and seller profiles
+
+CREATE TABLE IF NOT EXISTS dashboard_counters (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Add delta to a counter
+CREATE OR REPLACE FUNCTION bump_dashboard_counter(counter_name TEXT, delta BIGINT)
+RETURNS VOID AS $$
+BEGIN
+    IF delta <> 0 THEN
+        UPDATE dashboard_counters
+        SET value = value + delta, updated_at = NOW()
+        WHERE name = counter_name;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- users: total and per role
+CREATE OR REPLACE FUNCTION dashboard_counters_users() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_dashboard_counter('users_' || NEW.role, 1);
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM bump_dashboard_counter('users_' || OLD.role, -1);
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_dashboard_counter('users_total', 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_dashboard_counter('users_total', -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_dashboard_counters_users ON users;
+CREATE TRIGGER trg_dashboard_counters_users
+AFTER INSERT OR DELETE OR UPDATE OF role ON users
+FOR EACH ROW EXECUTE FUNCTION dashboard_counters_users();
+
+-- listings: active listings (the enum stores member names)
+CREATE OR REPLACE FUNCTION dashboard_counters_listings() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status::TEXT = 'ACTIVE' THEN
+        PERFORM bump_dashboard_counter('listings_active', 1);
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.status::TEXT = 'ACTIVE' THEN
+        PERFORM bump_dashboard_counter('listings_active', -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_dashboard_counters_listings ON listings;
+CREATE TRIGGER trg_dashboard_counters_listings
+AFTER INSERT OR DELETE OR UPDATE OF status ON listings
+FOR EACH ROW EXECUTE FUNCTION dashboard_counters_listings();
+
+-- meetings: total bookings
+CREATE OR REPLACE FUNCTION dashboard_counters_meetings() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_dashboard_counter('meetings_total', 1);
+    ELSE
+        PERFORM bump_dashboard_counter('meetings_total', -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_dashboard_counters_meetings ON meetings;
+CREATE TRIGGER trg_dashboard_counters_meetings
+AFTER INSERT OR DELETE ON meetings
+FOR EACH ROW EXECUTE FUNCTION dashboard_counters_meetings();
+
+-- seller_profiles: pending verifications
+CREATE OR REPLACE FUNCTION dashboard_counters_seller_profiles() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_verified = FALSE THEN
+        PERFORM bump_dashboard_counter('sellers_unverified', 1);
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.is_verified = FALSE THEN
+        PERFORM bump_dashboard_counter('sellers_unverified', -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_dashboard_counters_seller_profiles ON seller_profiles;
+CREATE TRIGGER trg_dashboard_counters_seller_profiles
+AFTER INSERT OR DELETE OR UPDATE OF is_verified ON seller_profiles
+FOR EACH ROW EXECUTE FUNCTION dashboard_counters_seller_profiles();
+
+-- Seed the counters from the current data (also repairs drifted counters when re-run)
+INSERT INTO dashboard_counters (name, value)
+SELECT 'users_total', COUNT(*) FROM users
+UNION ALL SELECT 'users_buyer', COUNT(*) FILTER (WHERE role = 'buyer') FROM users
+UNION ALL SELECT 'users_seller', COUNT(*) FILTER (WHERE role = 'seller') FROM users
+UNION ALL SELECT 'users_admin', COUNT(*) FILTER (WHERE role = 'admin') FROM users
+UNION ALL SELECT 'listings_active', COUNT(*) FILTER (WHERE status::TEXT = 'ACTIVE') FROM listings
+UNION ALL SELECT 'meetings_total', COUNT(*) FROM meetings
+UNION ALL SELECT 'sellers_unverified', COUNT(*) FILTER (WHERE is_verified = FALSE) FROM seller_profiles
+ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value, updated_at = NOW();
+
+-- Verify the counters
+SELECT name, value, updated_at
+FROM dashboard_counters
+ORDER BY name;
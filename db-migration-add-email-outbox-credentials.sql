@@ -0,0 +1,25 @@
+-- Migration to stop storing login credentials in the email outbox
+-- Approval emails name the user whose password the email worker issues at send time
+
+-- Add new column to the email_outbox table
+ALTER TABLE email_outbox
+ADD COLUMN IF NOT EXISTS credentials_user_id INTEGER REFERENCES users(id) ON DELETE CASCADE;
+
+-- Add comment to document the purpose of this field
+COMMENT ON COLUMN email_outbox.credentials_user_id IS 'User whose new password is filled into the email when it is sent (NULL for other emails)';
+
+-- Sent emails no longer keep their contents; clear those already sent (they may hold passwords)
+UPDATE email_outbox
+SET text_body = '', html_body = NULL
+WHERE status = 'sent';
+
+-- Verify the migration
+SELECT
+    id,
+    recipient,
+    status,
+    credentials_user_id,
+    LENGTH(text_body) AS text_length
+FROM email_outbox
+ORDER BY id DESC
+LIMIT 5;
@@ -0,0 +1,26 @@
+-- Migration to record which shared vehicle a buyer was pooled into
+-- Filled by the transfer scheduler (POST /api/admin/transportation/schedule)
+
+-- Add new columns to the ground_transportation table
+ALTER TABLE ground_transportation
+ADD COLUMN IF NOT EXISTS pickup_group VARCHAR(64),
+ADD COLUMN IF NOT EXISTS dropoff_group VARCHAR(64);
+
+-- Add comments to document the purpose of these fields
+COMMENT ON COLUMN ground_transportation.pickup_group IS 'Shared arrival vehicle, e.g. ARR-20250710-0930-CCJ-1 (NULL when allocated by hand)';
+COMMENT ON COLUMN ground_transportation.dropoff_group IS 'Shared departure vehicle, e.g. DEP-20250713-1400-CCJ-2 (NULL when allocated by hand)';
+
+-- Listing a vehicle's passengers looks up by group
+CREATE INDEX IF NOT EXISTS idx_ground_transportation_pickup_group ON ground_transportation (pickup_group) WHERE pickup_group IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_ground_transportation_dropoff_group ON ground_transportation (dropoff_group) WHERE dropoff_group IS NOT NULL;
+
+-- Verify the migration
+SELECT
+    id,
+    travel_plan_id,
+    pickup_location,
+    pickup_group,
+    dropoff_location,
+    dropoff_group
+FROM ground_transportation
+LIMIT 5;
@@ -0,0 +1,14 @@
+-- Migration to support the bulk invite import
+-- /api/admin/upload-invites looks up all emails of a sheet at once with lower(email) IN (...)
+
+-- Case-insensitive email lookups on invited buyers and users
+CREATE INDEX IF NOT EXISTS idx_invited_buyers_email_lower
+ON invited_buyers (lower(email));
+
+CREATE INDEX IF NOT EXISTS idx_users_email_lower
+ON users (lower(email));
+
+-- Verify the indexes were created
+SELECT tablename, indexname, indexdef
+FROM pg_indexes
+WHERE indexname IN ('idx_invited_buyers_email_lower', 'idx_users_email_lower');
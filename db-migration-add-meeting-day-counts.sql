@@ -0,0 +1,30 @@
+-- Migration to enforce per-day meeting quotas without counting meetings on every booking
+-- Booking increments one row per participant and day with a conditional upsert and refuses
+-- the meeting when max_buyer_meetings_per_day / max_seller_attendees_per_day is reached
+
+CREATE TABLE IF NOT EXISTS meeting_day_counts (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    meetings INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+-- Seed the counters from the meetings holding a time slot (the enum stores member names).
+-- Same query as `flask reconcile-meeting-quotas`, which can be run later to repair drift
+BEGIN;
+LOCK TABLE meeting_day_counts IN EXCLUSIVE MODE;
+DELETE FROM meeting_day_counts;
+INSERT INTO meeting_day_counts (user_id, day, meetings)
+SELECT participant.user_id, ts.start_time::date, COUNT(*)
+FROM meetings m
+JOIN time_slots ts ON ts.id = m.time_slot_id
+CROSS JOIN LATERAL (VALUES (m.buyer_id), (m.seller_id)) AS participant(user_id)
+WHERE m.status IN ('PENDING', 'ACCEPTED', 'COMPLETED')
+GROUP BY participant.user_id, ts.start_time::date;
+COMMIT;
+
+-- Verify the counters (busiest participants first)
+SELECT user_id, day, meetings
+FROM meeting_day_counts
+ORDER BY meetings DESC
+LIMIT 20;
@@ -0,0 +1,21 @@
+-- Migration to allow only one active meeting per time slot
+-- Booking claims a slot with UPDATE ... WHERE is_available RETURNING; this index is the
+-- database-level guarantee against double-booking (meetings.status stores enum names)
+
+-- List slots that already hold more than one active meeting; these must be resolved
+-- (e.g. by cancelling the extra meetings) before the index can be created
+SELECT time_slot_id, array_agg(id ORDER BY id) AS meeting_ids
+FROM meetings
+WHERE time_slot_id IS NOT NULL
+AND status IN ('PENDING', 'ACCEPTED', 'COMPLETED')
+GROUP BY time_slot_id
+HAVING COUNT(*) > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_meetings_active_time_slot
+ON meetings (time_slot_id)
+WHERE status IN ('PENDING', 'ACCEPTED', 'COMPLETED');
+
+-- Verify the index was created
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE indexname = 'uq_meetings_active_time_slot';
@@ -0,0 +1,24 @@
+-- Migration to support SQL-side filtering and keyset pagination of the seller directory
+-- GET /api/sellers filters on seller_type, target_market and business_name and pages by id
+
+-- Equality filters used by the seller directory
+CREATE INDEX IF NOT EXISTS ix_seller_profiles_seller_type
+ON seller_profiles (seller_type);
+
+CREATE INDEX IF NOT EXISTS ix_seller_profiles_target_market
+ON seller_profiles (target_market);
+
+-- Trigram index so ILIKE '%name%' searches on business_name can use an index
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_seller_profiles_business_name_trgm
+ON seller_profiles USING GIN (business_name gin_trgm_ops);
+
+-- Join from seller_profiles to users for the role check
+CREATE INDEX IF NOT EXISTS idx_seller_profiles_user_id
+ON seller_profiles (user_id);
+
+-- Verify the indexes were created
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'seller_profiles';
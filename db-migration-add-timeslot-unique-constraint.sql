@@ -0,0 +1,32 @@
+-- Migration to make time slots unique per seller and start time
+-- Slot generation inserts with ON CONFLICT (user_id, start_time) DO NOTHING
+
+-- Remove duplicate slots, keeping a booked slot if there is one, otherwise the oldest
+DELETE FROM time_slots t
+USING (
+    SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY user_id, start_time
+        ORDER BY (meeting_id IS NULL), is_available, id
+    ) AS rn
+    FROM time_slots
+) ranked
+WHERE t.id = ranked.id
+AND ranked.rn > 1
+AND t.meeting_id IS NULL
+AND t.id NOT IN (SELECT time_slot_id FROM meetings WHERE time_slot_id IS NOT NULL);
+
+-- Add the unique constraint (also serves as the index for per-seller slot lookups)
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'uq_time_slots_user_start'
+    ) THEN
+        ALTER TABLE time_slots
+        ADD CONSTRAINT uq_time_slots_user_start UNIQUE (user_id, start_time);
+    END IF;
+END $$;
+
+-- Verify the constraint was added
+SELECT conname, pg_get_constraintdef(oid)
+FROM pg_constraint
+WHERE conname = 'uq_time_slots_user_start';
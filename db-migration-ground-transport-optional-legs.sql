@@ -0,0 +1,18 @@
+-- Migration to allow ground transportation with one leg only
+-- The transfer scheduler leaves the pickup (or dropoff) empty for buyers
+-- who have entered only their return (or arrival) journey
+
+-- Make the pickup and dropoff details optional
+ALTER TABLE ground_transportation
+ALTER COLUMN pickup_location DROP NOT NULL,
+ALTER COLUMN pickup_datetime DROP NOT NULL,
+ALTER COLUMN dropoff_location DROP NOT NULL,
+ALTER COLUMN dropoff_datetime DROP NOT NULL;
+
+-- Verify the migration
+SELECT
+    column_name,
+    is_nullable
+FROM information_schema.columns
+WHERE table_name = 'ground_transportation'
+  AND column_name IN ('pickup_location', 'pickup_datetime', 'dropoff_location', 'dropoff_datetime');
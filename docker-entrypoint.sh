@@ -16,14 +16,7 @@ echo "PostgreSQL is ready!"
 
 # Run database migrations if needed
 echo "Running database setup..."
-python -c "
-from app import create_app
-from app.models import db
-app = create_app()
-with app.app_context():
-    db.create_all()
-    print('Database tables created/verified')
-"
+flask --app run init-db
 
 # Initialize default users if needed
 echo "Setting up default users..."
@@ -0,0 +1,78 @@
+"""
+Access log tests
+"""
+import io
+import json
+import logging
+import pytest
+
+
+@pytest.fixture
+def access_log(app):
+    """JSON entries written to the access log during a test; access log config is restored afterwards"""
+    entries = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            entries.append(json.loads(record.getMessage()))
+
+    handler = Collect()
+    logger = logging.getLogger('app.access')
+    logger.addHandler(handler)
+    saved = {key: value for key, value in app.config.items() if key.startswith('ACCESS_LOG_')}
+    yield entries
+    app.config.update(saved)
+    logger.removeHandler(handler)
+
+
+class TestAccessLog:
+    """Test the structured per-request access log"""
+
+    def test_entry_fields(self, client, access_log):
+        response = client.get('/api/health')
+
+        assert len(access_log) == 1
+        entry = access_log[0]
+        assert entry['method'] == 'GET'
+        assert entry['route'] == '/api/health'
+        assert entry['status'] == 200
+        # The health check runs SELECT 1 only
+        assert entry['db_queries'] == 1
+        assert entry['response_bytes'] == response.content_length
+        assert entry['latency_ms'] >= 0
+        assert 'body' not in entry
+
+    def test_query_count_is_per_request(self, client, access_log):
+        client.get('/api/health')
+        client.get('/api/health')
+
+        assert [entry['db_queries'] for entry in access_log] == [1, 1]
+
+    def test_route_template_is_logged_not_ids(self, client, admin_token, auth_headers, access_log):
+        client.get('/api/admin/users/999999999', headers=auth_headers(admin_token))
+        assert access_log[0]['route'] == '/api/admin/users/<int:user_id>'
+        assert access_log[0]['path'] == '/api/admin/users/999999999'
+
+    def test_sampling_keeps_slow_requests(self, app, client, access_log):
+        app.config['ACCESS_LOG_SAMPLE_RATE'] = 0.0
+        client.get('/api/health')
+        assert access_log == []
+
+        app.config['ACCESS_LOG_SLOW_MS'] = 0
+        client.get('/api/health')
+        assert len(access_log) == 1
+
+    def test_small_json_body_is_logged_with_secrets_masked(self, app, client, access_log):
+        app.config['ACCESS_LOG_BODY_MAX_BYTES'] = 1024
+        client.post('/api/auth/login', json={'username': 'test_buyer', 'password': 'buyer123'})
+
+        assert access_log[0]['body'] == {'username': 'test_buyer', 'password': '***'}
+
+    def test_large_and_file_bodies_are_not_logged(self, app, client, access_log):
+        app.config['ACCESS_LOG_BODY_MAX_BYTES'] = 64
+        client.post('/api/auth/login', json={'username': 'x' * 100, 'password': 'secret'})
+        client.post('/api/auth/login', data={'file': (io.BytesIO(b'small'), 'a.txt')},
+                    content_type='multipart/form-data')
+
+        assert len(access_log) == 2
+        assert all('body' not in entry for entry in access_log)
@@ -0,0 +1,244 @@
+"""
+Bulk accommodation allocation tests
+"""
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+import pytest
+from app.models import db, User, UserRole, HostProperty, TravelPlan, Accommodation, BuyerProfile, BuyerCategory
+from app.utils.accommodation import plan_room_assignments, room_usage
+
+
+@pytest.fixture
+def hosting(app):
+    """Two host properties and a factory for buyers; everything is removed afterwards."""
+    run = uuid.uuid4().hex[:8]
+    properties = [HostProperty(property_name=f'Homestay {run} {i}', rooms_allotted=rooms, number_rooms_allocated=0)
+                  for i, rooms in enumerate([3, 10])]
+    db.session.add_all(properties)
+    db.session.commit()
+    property_ids = [p.property_id for p in properties]
+    buyer_ids = []
+
+    category = BuyerCategory(name=f'Hosted {run}', accommodation_hosted=True)
+    db.session.add(category)
+    db.session.commit()
+    category_id = category.id
+
+    def make_buyers(count, hosted=False, vip=False):
+        users = [User(username=f'hosted_{run}_{len(buyer_ids) + i}', email=f'hosted-{run}-{len(buyer_ids) + i}@example.com',
+                      password='buyer123', role=UserRole.BUYER) for i in range(count)]
+        db.session.add_all(users)
+        db.session.flush()
+        if hosted:
+            db.session.add_all([
+                BuyerProfile(user_id=user.id, name=f'Hosted buyer {user.id}', organization='Test Travels',
+                             category_id=category_id, vip=vip)
+                for user in users
+            ])
+        db.session.commit()
+        new_ids = [user.id for user in users]
+        buyer_ids.extend(new_ids)
+        return new_ids
+
+    yield property_ids, make_buyers
+
+    db.session.rollback()
+    Accommodation.query.filter(Accommodation.buyer_id.in_(buyer_ids)).delete(synchronize_session=False)
+    TravelPlan.query.filter(TravelPlan.user_id.in_(buyer_ids)).delete(synchronize_session=False)
+    BuyerProfile.query.filter(BuyerProfile.user_id.in_(buyer_ids)).delete(synchronize_session=False)
+    User.query.filter(User.id.in_(buyer_ids)).delete(synchronize_session=False)
+    HostProperty.query.filter(HostProperty.property_id.in_(property_ids)).delete(synchronize_session=False)
+    BuyerCategory.query.filter_by(id=category_id).delete()
+    db.session.commit()
+
+
+def allocation(buyer_id, property_id, room_type='single'):
+    return {
+        'buyer_id': buyer_id,
+        'host_property_id': property_id,
+        'room_type': room_type,
+        'check_in_datetime': '2030-07-10T14:00:00Z',
+        'check_out_datetime': '2030-07-14T10:00:00Z'
+    }
+
+
+@pytest.mark.admin
+class TestBulkAccommodationAllocation:
+    """Test POST /api/admin/accommodations/bulk-allocate"""
+
+    def test_bulk_allocation_updates_property_counters(self, client, admin_token, auth_headers, hosting):
+        (small, large), make_buyers = hosting
+        buyers = make_buyers(5)
+        response = client.post('/api/admin/accommodations/bulk-allocate', headers=auth_headers(admin_token), json={
+            'allocations': [allocation(buyers[0], small, 'single')] +
+                           [allocation(buyer_id, large, 'shared') for buyer_id in buyers[1:]]
+        })
+
+        assert response.status_code == 201
+        assert response.get_json()['total_count'] == 5
+        db.session.expire_all()
+        small_property, large_property = HostProperty.query.get(small), HostProperty.query.get(large)
+        assert (small_property.number_rooms_allocated, small_property.number_current_guests) == (1, 2)
+        assert (large_property.number_rooms_allocated, large_property.number_current_guests) == (2, 4)
+        # A default travel plan is created for each buyer
+        assert TravelPlan.query.filter(TravelPlan.user_id.in_(buyers)).count() == 5
+
+    def test_over_capacity_allocates_nothing(self, client, admin_token, auth_headers, hosting):
+        (small, large), make_buyers = hosting
+        buyers = make_buyers(4)
+        response = client.post('/api/admin/accommodations/bulk-allocate', headers=auth_headers(admin_token), json={
+            'allocations': [allocation(buyer_id, small) for buyer_id in buyers]
+        })
+
+        assert response.status_code == 400
+        details = response.get_json()['details']
+        assert [detail['host_property_id'] for detail in details] == [small]
+        assert Accommodation.query.filter(Accommodation.buyer_id.in_(buyers)).count() == 0
+        assert HostProperty.query.get(small).number_rooms_allocated == 0
+
+    def test_invalid_entries_are_all_reported(self, client, admin_token, auth_headers, hosting):
+        (small, large), make_buyers = hosting
+        buyers = make_buyers(2)
+        client.post('/api/admin/accommodations/bulk-allocate', headers=auth_headers(admin_token), json={
+            'allocations': [allocation(buyers[0], large)]
+        })
+
+        response = client.post('/api/admin/accommodations/bulk-allocate', headers=auth_headers(admin_token), json={
+            'allocations': [
+                allocation(buyers[0], large),
+                dict(allocation(buyers[1], large), room_type='suite'),
+                allocation(buyers[1], 0)
+            ]
+        })
+
+        assert response.status_code == 400
+        errors = {detail['index']: detail['error'] for detail in response.get_json()['details']}
+        assert errors[0] == 'Buyer already has accommodation allocated'
+        assert errors[1].startswith('Invalid room type')
+        assert errors[2] == 'Host property with ID 0 not found'
+        assert Accommodation.query.filter(Accommodation.buyer_id == buyers[1]).count() == 0
+
+    def test_bulk_allocation_uses_fixed_query_count(self, client, admin_token, auth_headers, hosting, query_counter):
+        (small, large), make_buyers = hosting
+        warm_up, few_buyers, many_buyers = make_buyers(1), make_buyers(2), make_buyers(8)
+        headers = auth_headers(admin_token)
+        # Loads the settings cache used for default travel plans
+        client.post('/api/admin/accommodations/bulk-allocate', headers=headers, json={
+            'allocations': [allocation(warm_up[0], small)]
+        })
+
+        with query_counter() as few_queries:
+            response = client.post('/api/admin/accommodations/bulk-allocate', headers=headers, json={
+                'allocations': [allocation(buyer_id, large, 'shared') for buyer_id in few_buyers]
+            })
+        assert response.status_code == 201
+
+        with query_counter() as many_queries:
+            response = client.post('/api/admin/accommodations/bulk-allocate', headers=headers, json={
+                'allocations': [allocation(buyer_id, large, 'shared') for buyer_id in many_buyers]
+            })
+        assert response.status_code == 201
+
+        assert len(many_queries) == len(few_queries)
+        assert sum('FOR UPDATE' in statement for statement in many_queries) == 1
+
+    def test_single_allocation_checks_capacity_before_committing(self, client, admin_token, auth_headers, hosting):
+        (small, large), make_buyers = hosting
+        buyers = make_buyers(4)
+        headers = auth_headers(admin_token)
+        statuses = [
+            client.post(f'/api/admin/buyers/{buyer_id}/allocate-accommodation', headers=headers,
+                        json={key: value for key, value in allocation(buyer_id, small).items() if key != 'buyer_id'}).status_code
+            for buyer_id in buyers
+        ]
+
+        assert statuses == [201, 201, 201, 400]
+        assert Accommodation.query.filter(Accommodation.host_property_id == small).count() == 3
+        assert HostProperty.query.get(small).number_rooms_allocated == 3
+
+    def test_single_allocation_accepts_string_property_id(self, client, admin_token, auth_headers, hosting):
+        (small, _), make_buyers = hosting
+        first, second = make_buyers(2)
+        url = '/api/admin/buyers/{}/allocate-accommodation'
+        body = lambda buyer_id, property_id: dict(
+            {key: value for key, value in allocation(buyer_id, small).items() if key != 'buyer_id'},
+            host_property_id=property_id
+        )
+
+        response = client.post(url.format(first), headers=auth_headers(admin_token), json=body(first, str(small)))
+        assert response.status_code == 201
+        response = client.post(url.format(second), headers=auth_headers(admin_token), json=body(second, 'three'))
+        assert response.status_code == 400
+
+
+def stay(buyer_id, room_type, arrival_hour, priority=False):
+    check_in = datetime(2030, 7, 10, arrival_hour)
+    return {'buyer_id': buyer_id, 'room_type': room_type, 'priority': priority,
+            'check_in_datetime': check_in, 'check_out_datetime': check_in + timedelta(days=3)}
+
+
+@pytest.mark.admin
+class TestRoomAssignment:
+    """Test the automatic room-assignment solver"""
+
+    def test_shared_buyers_are_paired_by_arrival(self):
+        stays = [stay(1, 'shared', 9), stay(2, 'shared', 20), stay(3, 'shared', 10), stay(4, 'shared', 21)]
+
+        assignments, unassigned = plan_room_assignments(stays, [(100, 1, Counter()), (200, 5, Counter())])
+
+        by_property = {}
+        for assignment in assignments:
+            by_property.setdefault(assignment['host_property_id'], []).append(assignment['buyer_id'])
+        assert by_property == {100: [1, 3], 200: [2, 4]}
+        assert unassigned == []
+
+    def test_capacity_is_respected_and_priority_first(self):
+        stays = [stay(i, 'single', 8 + i) for i in range(1, 5)] + [stay(9, 'single', 23, priority=True)]
+
+        assignments, unassigned = plan_room_assignments(stays, [(100, 2, Counter(single=1)), (200, 1, Counter())])
+
+        assert [(a['buyer_id'], a['host_property_id']) for a in assignments] == [(9, 100), (1, 200)]
+        assert [u['buyer_id'] for u in unassigned] == [2, 3, 4]
+        for property_id, rooms in [(100, 2), (200, 1)]:
+            placed = Counter(a['room_type'] for a in assignments if a['host_property_id'] == property_id)
+            existing = Counter(single=1) if property_id == 100 else Counter()
+            assert room_usage((existing + placed)['shared'], (existing + placed)['single'])[0] <= rooms
+
+    def test_lone_shared_buyer_needs_a_free_room(self):
+        stays = [stay(1, 'shared', 9)]
+
+        full = plan_room_assignments(stays, [(100, 10, Counter(single=10)), (200, 0, Counter())])
+        assert full == ([], [{'buyer_id': 1, 'room_type': 'shared', 'reason': 'No host property has room left'}])
+
+        # A half-filled shared room still takes a roommate
+        assignments, _ = plan_room_assignments(stays, [(100, 1, Counter(shared=1)), (200, 0, Counter())])
+        assert [a['host_property_id'] for a in assignments] == [100]
+
+    def test_preview_then_commit(self, client, admin_token, auth_headers, hosting):
+        (small, large), make_buyers = hosting
+        vip_buyer, = make_buyers(1, hosted=True, vip=True)
+        shared_buyers = make_buyers(4, hosted=True)
+        make_buyers(2)  # not hosted
+        headers = auth_headers(admin_token)
+
+        preview = client.post('/api/admin/accommodations/auto-assign', headers=headers,
+                              json={'property_ids': [small, large]})
+        assert preview.status_code == 200
+        plan = preview.get_json()
+        assert plan['committed'] is False
+        assert {a['buyer_id'] for a in plan['assignments']} == {vip_buyer, *shared_buyers}
+        assert next(a for a in plan['assignments'] if a['buyer_id'] == vip_buyer)['room_type'] == 'single'
+        assert Accommodation.query.filter(Accommodation.host_property_id.in_([small, large])).count() == 0
+
+        response = client.post('/api/admin/accommodations/auto-assign', headers=headers,
+                               json={'property_ids': [small, large], 'commit': True})
+        assert response.status_code == 201
+        db.session.expire_all()
+        assert Accommodation.query.filter(Accommodation.host_property_id.in_([small, large])).count() == 5
+        assert HostProperty.query.get(small).number_rooms_allocated == 3  # 1 single + 2 shared pairs
+
+        # Everyone is housed now, so there is nothing left to plan
+        again = client.post('/api/admin/accommodations/auto-assign', headers=headers,
+                            json={'property_ids': [small, large]}).get_json()
+        assert again['assignments'] == []
@@ -0,0 +1,93 @@
+"""
+Admin dashboard stats tests
+"""
+import os
+import pytest
+from app.utils import dashboard_stats
+from app.models import db, User, UserRole, Meeting, SellerProfile
+from app.utils.dashboard_stats import (
+    DashboardStatsCache, count_dashboard_stats, read_dashboard_counters, format_system_stats
+)
+
+MIGRATION = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'db-migration-add-dashboard-counters.sql')
+
+
+@pytest.fixture
+def extra_buyer(app):
+    """Creates a buyer on demand; it is removed afterwards."""
+    created = []
+
+    def _create():
+        user = User(username='dashboard_buyer', email='dashboard_buyer@test.com',
+                    password='buyer123', role=UserRole.BUYER)
+        db.session.add(user)
+        db.session.commit()
+        created.append(user.id)
+        return user
+
+    yield _create
+    db.session.rollback()
+    User.query.filter(User.id.in_(created)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+@pytest.mark.admin
+class TestDashboardStats:
+    """Test the admin dashboard aggregates"""
+
+    def test_aggregate_matches_individual_counts(self, app):
+        counts = count_dashboard_stats()
+
+        assert counts['users_total'] == User.query.count()
+        assert counts['users_buyer'] == User.query.filter_by(role=UserRole.BUYER.value).count()
+        assert counts['users_seller'] == User.query.filter_by(role=UserRole.SELLER.value).count()
+        assert counts['users_admin'] == User.query.filter_by(role=UserRole.ADMIN.value).count()
+        assert counts['meetings_total'] == Meeting.query.count()
+        assert counts['sellers_unverified'] == SellerProfile.query.filter_by(is_verified=False).count()
+
+    def test_stats_are_cached_for_ttl(self, app, extra_buyer, query_counter):
+        cache = DashboardStatsCache(ttl=3600)
+        before = cache.get()
+
+        extra_buyer()
+        with query_counter() as queries:
+            assert cache.get() == before
+        assert queries == []
+
+        cache.invalidate()
+        assert cache.get()['total_users'] == before['total_users'] + 1
+
+    def test_broken_counters_fall_back_to_live_counts(self, app, monkeypatch):
+        def missing_table():
+            raise RuntimeError('relation "dashboard_counters" does not exist')
+        monkeypatch.setattr(dashboard_stats, 'read_dashboard_counters', missing_table)
+
+        stats = DashboardStatsCache(ttl=0, source='counters').get()
+
+        assert stats == format_system_stats(count_dashboard_stats())
+        assert stats['total_users'] > 0
+
+    def test_dashboard_endpoint(self, client, admin_token, auth_headers):
+        response = client.get('/api/admin/dashboard', headers=auth_headers(admin_token))
+
+        assert response.status_code == 200
+        stats = response.get_json()['system_stats']
+        assert stats == format_system_stats(count_dashboard_stats())
+
+    def test_trigger_maintained_counters(self, app, extra_buyer):
+        """Test that counters follow inserts and deletes once the migration is applied"""
+        with open(MIGRATION) as f:
+            db.session.connection().exec_driver_sql(f.read())
+        db.session.commit()
+
+        before = read_dashboard_counters()
+        user = extra_buyer()
+        after = read_dashboard_counters()
+
+        assert after['users_total'] == before['users_total'] + 1
+        assert after['users_buyer'] == before['users_buyer'] + 1
+        assert after == count_dashboard_stats()
+
+        db.session.delete(user)
+        db.session.commit()
+        assert read_dashboard_counters() == before
@@ -0,0 +1,413 @@
+"""
+Meeting booking tests
+"""
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import db, User, UserRole, Meeting, MeetingStatus, MeetingDayCount, TimeSlot, SystemSetting
+from app.utils.booking import SLOT_HOLDING_STATUSES, BookingError, set_meeting_status
+from app.utils.system_settings import invalidate_settings
+
+
+@pytest.fixture
+def market(app):
+    """Meetings enabled, plus a factory for sellers with free slots and buyers with tokens; all removed afterwards."""
+    run = uuid.uuid4().hex[:8]
+    setting = SystemSetting.query.filter_by(key='meetings_enabled').first()
+    previous = setting.value if setting else None
+    if setting is None:
+        setting = SystemSetting(key='meetings_enabled', value='true')
+        db.session.add(setting)
+    setting.value = 'true'
+    db.session.commit()
+    invalidate_settings()
+    user_ids = []
+
+    def make_users(role, count):
+        users = [
+            User(username=f'{role.value}_{run}_{len(user_ids) + i}', email=f'{role.value}-{run}-{len(user_ids) + i}@example.com',
+                 password='booking123', role=role)
+            for i in range(count)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids.extend(user.id for user in users)
+        return users
+
+    def make_sellers(count, slots, days=1):
+        sellers = make_users(UserRole.SELLER, count)
+        start = datetime(2030, 3, 1, 9, 0)
+        db.session.add_all([
+            TimeSlot(user_id=seller.id, start_time=start + timedelta(days=day, minutes=15 * i),
+                     end_time=start + timedelta(days=day, minutes=15 * (i + 1)), is_available=True)
+            for seller in sellers for day in range(days) for i in range(slots)
+        ])
+        db.session.commit()
+        return [seller.id for seller in sellers]
+
+    def make_buyers(count):
+        return {
+            buyer.id: create_access_token(identity=str(buyer.id), additional_claims={'role': UserRole.BUYER.value})
+            for buyer in make_users(UserRole.BUYER, count)
+        }
+
+    yield make_sellers, make_buyers
+
+    db.session.rollback()
+    MeetingDayCount.query.filter(MeetingDayCount.user_id.in_(user_ids)).delete(synchronize_session=False)
+    TimeSlot.query.filter(TimeSlot.user_id.in_(user_ids)).update({'meeting_id': None}, synchronize_session=False)
+    Meeting.query.filter(Meeting.buyer_id.in_(user_ids)).delete(synchronize_session=False)
+    TimeSlot.query.filter(TimeSlot.user_id.in_(user_ids)).delete(synchronize_session=False)
+    User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+    setting = SystemSetting.query.filter_by(key='meetings_enabled').first()
+    if previous is None:
+        db.session.delete(setting)
+    else:
+        setting.value = previous
+    db.session.commit()
+    invalidate_settings()
+
+
+@pytest.fixture
+def quotas(app):
+    """Set the daily meeting limits for a test; the previous settings are restored afterwards"""
+    keys = ('max_buyer_meetings_per_day', 'max_seller_attendees_per_day')
+    previous = {s.key: s.value for s in SystemSetting.query.filter(SystemSetting.key.in_(keys))}
+
+    def set_quotas(buyer, seller):
+        for key, value in zip(keys, (buyer, seller)):
+            setting = SystemSetting.query.filter_by(key=key).first() or SystemSetting(key=key)
+            setting.value = str(value)
+            db.session.add(setting)
+        db.session.commit()
+        invalidate_settings()
+
+    yield set_quotas
+
+    db.session.rollback()
+    for setting in SystemSetting.query.filter(SystemSetting.key.in_(keys)):
+        if setting.key in previous:
+            setting.value = previous[setting.key]
+        else:
+            db.session.delete(setting)
+    db.session.commit()
+    invalidate_settings()
+
+
+def slot_ids(seller_id):
+    return [slot.id for slot in TimeSlot.query.filter_by(user_id=seller_id).order_by(TimeSlot.id)]
+
+
+def day_counts(user_ids):
+    db.session.expire_all()
+    return {
+        (row.user_id, row.day.isoformat()): row.meetings
+        for row in MeetingDayCount.query.filter(MeetingDayCount.user_id.in_(user_ids))
+    }
+
+
+@pytest.mark.meetings
+class TestMeetingBooking:
+    """Test atomic time slot booking"""
+
+    def test_slot_is_claimed_once(self, client, auth_headers, market):
+        make_sellers, make_buyers = market
+        seller_id, = make_sellers(1, slots=1)
+        (first_id, first_token), (_, second_token) = make_buyers(2).items()
+        slot_id, = slot_ids(seller_id)
+
+        response = client.post('/api/buyer/meetings', headers=auth_headers(first_token),
+                               json={'seller_id': seller_id, 'time_slot_id': slot_id})
+        assert response.status_code == 201
+        meeting_id = response.get_json()['meeting']['id']
+        slot = db.session.get(TimeSlot, slot_id)
+        db.session.refresh(slot)
+        assert (slot.is_available, slot.meeting_id) == (False, meeting_id)
+
+        response = client.post('/api/buyer/meetings', headers=auth_headers(second_token),
+                               json={'seller_id': seller_id, 'time_slot_id': slot_id})
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Time slot is not available'
+
+    def test_slot_of_another_seller_is_refused(self, client, auth_headers, market):
+        make_sellers, make_buyers = market
+        seller_id, other_seller_id = make_sellers(2, slots=1)
+        token, = make_buyers(1).values()
+
+        response = client.post('/api/buyer/meetings', headers=auth_headers(token),
+                               json={'seller_id': seller_id, 'time_slot_id': slot_ids(other_seller_id)[0]})
+        assert response.status_code == 400
+        assert db.session.get(TimeSlot, slot_ids(other_seller_id)[0]).is_available is True
+
+    def test_index_refuses_second_active_meeting_on_a_slot(self, market):
+        make_sellers, make_buyers = market
+        seller_id, = make_sellers(1, slots=1)
+        first_id, second_id = make_buyers(2)
+        slot_id, = slot_ids(seller_id)
+
+        db.session.add(Meeting(buyer_id=first_id, seller_id=seller_id, time_slot_id=slot_id,
+                               status=MeetingStatus.CANCELLED))
+        db.session.add(Meeting(buyer_id=second_id, seller_id=seller_id, time_slot_id=slot_id,
+                               status=MeetingStatus.PENDING))
+        db.session.commit()
+
+        db.session.add(Meeting(buyer_id=first_id, seller_id=seller_id, time_slot_id=slot_id,
+                               status=MeetingStatus.ACCEPTED))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+    def test_concurrent_bookings_never_double_book(self, app, auth_headers, market):
+        make_sellers, make_buyers = market
+        seller_ids = make_sellers(2, slots=10)
+        tokens = make_buyers(30)
+        slots = {seller_id: slot_ids(seller_id) for seller_id in seller_ids}
+        rng = random.Random(21)
+        attempts = []
+        for _ in range(300):
+            seller_id = rng.choice(seller_ids)
+            attempts.append((rng.choice(list(tokens.values())), seller_id, rng.choice(slots[seller_id])))
+
+        def book(attempt):
+            token, seller_id, slot_id = attempt
+            with app.test_client() as client:
+                response = client.post('/api/buyer/meetings', headers=auth_headers(token),
+                                       json={'seller_id': seller_id, 'time_slot_id': slot_id})
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=12) as executor:
+            statuses = list(executor.map(book, attempts))
+
+        assert set(statuses) <= {201, 400}
+        assert statuses.count(201) > 0
+        db.session.expire_all()
+        active = Meeting.query.filter(Meeting.seller_id.in_(seller_ids), Meeting.status.in_(SLOT_HOLDING_STATUSES)).all()
+        assert statuses.count(201) == len(active)
+        # Every booked slot has one meeting and every buyer/seller pair at most one
+        assert len({m.time_slot_id for m in active}) == len(active)
+        assert len({(m.buyer_id, m.seller_id) for m in active}) == len(active)
+        booked = {m.time_slot_id: m.id for m in active}
+        for slot in TimeSlot.query.filter(TimeSlot.user_id.in_(seller_ids)):
+            assert slot.is_available is (slot.id not in booked)
+            assert slot.meeting_id == booked.get(slot.id)
+
+
+@pytest.mark.meetings
+class TestMeetingQuotas:
+    """Test per-day meeting quotas kept in meeting_day_counts"""
+
+    def book(self, client, auth_headers, token, seller_id, slot_id):
+        return client.post('/api/buyer/meetings', headers=auth_headers(token),
+                           json={'seller_id': seller_id, 'time_slot_id': slot_id})
+
+    def test_buyer_limit_applies_per_day(self, client, auth_headers, market, quotas):
+        make_sellers, make_buyers = market
+        quotas(buyer=2, seller=10)
+        sellers = make_sellers(3, slots=1, days=2)
+        (buyer_id, token), = make_buyers(1).items()
+
+        day_one = [self.book(client, auth_headers, token, seller_id, slot_ids(seller_id)[0]) for seller_id in sellers]
+        assert [r.status_code for r in day_one] == [201, 201, 400]
+        assert day_one[2].get_json()['error'] == 'Buyer has reached the limit of 2 meetings on 2030-03-01'
+
+        # The next day has its own quota
+        response = self.book(client, auth_headers, token, sellers[2], slot_ids(sellers[2])[1])
+        assert response.status_code == 201
+        assert day_counts([buyer_id]) == {(buyer_id, '2030-03-01'): 2, (buyer_id, '2030-03-02'): 1}
+        # A refused booking does not keep the slot
+        assert db.session.get(TimeSlot, slot_ids(sellers[2])[0]).is_available is True
+
+    def test_seller_limit(self, client, auth_headers, market, quotas):
+        make_sellers, make_buyers = market
+        quotas(buyer=10, seller=1)
+        seller_id, = make_sellers(1, slots=2)
+        first, second = make_buyers(2).values()
+
+        assert self.book(client, auth_headers, first, seller_id, slot_ids(seller_id)[0]).status_code == 201
+        response = self.book(client, auth_headers, second, seller_id, slot_ids(seller_id)[1])
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Seller has reached the limit of 1 meetings on 2030-03-01'
+
+    def test_cancelling_releases_the_quota(self, client, auth_headers, market, quotas):
+        make_sellers, make_buyers = market
+        quotas(buyer=1, seller=10)
+        first_seller, second_seller = make_sellers(2, slots=1)
+        (buyer_id, token), = make_buyers(1).items()
+
+        meeting_id = self.book(client, auth_headers, token, first_seller, slot_ids(first_seller)[0]).get_json()['meeting']['id']
+        assert self.book(client, auth_headers, token, second_seller, slot_ids(second_seller)[0]).status_code == 400
+
+        response = client.delete(f'/api/meetings/{meeting_id}', headers=auth_headers(token))
+        assert response.status_code == 200
+        assert day_counts([buyer_id, first_seller]) == {(buyer_id, '2030-03-01'): 0, (first_seller, '2030-03-01'): 0}
+        assert db.session.get(TimeSlot, slot_ids(first_seller)[0]).is_available is True
+        assert self.book(client, auth_headers, token, second_seller, slot_ids(second_seller)[0]).status_code == 201
+
+    def test_concurrent_status_changes_release_once(self, client, auth_headers, market, quotas):
+        make_sellers, make_buyers = market
+        quotas(buyer=10, seller=10)
+        seller_id, = make_sellers(1, slots=1)
+        (buyer_id, token), = make_buyers(1).items()
+        meeting_id = self.book(client, auth_headers, token, seller_id, slot_ids(seller_id)[0]).get_json()['meeting']['id']
+
+        # Another request that read the meeting while it was still pending
+        with Session(db.engine) as other:
+            stale = other.get(Meeting, meeting_id)
+            assert client.delete(f'/api/meetings/{meeting_id}', headers=auth_headers(token)).status_code == 200
+            for status in (MeetingStatus.REJECTED, MeetingStatus.ACCEPTED):
+                with pytest.raises(BookingError) as refused:
+                    set_meeting_status(stale, status)
+                assert refused.value.status_code == 409
+
+        db.session.expire_all()
+        assert db.session.get(Meeting, meeting_id).status == MeetingStatus.CANCELLED
+        assert db.session.get(TimeSlot, slot_ids(seller_id)[0]).is_available is True
+        assert day_counts([buyer_id, seller_id]) == {(buyer_id, '2030-03-01'): 0, (seller_id, '2030-03-01'): 0}
+
+    def test_reconcile_command_rebuilds_counters(self, client, auth_headers, runner, market, quotas):
+        make_sellers, make_buyers = market
+        quotas(buyer=10, seller=10)
+        seller_id, = make_sellers(1, slots=2)
+        tokens = make_buyers(2)
+        for token, slot_id in zip(tokens.values(), slot_ids(seller_id)):
+            assert self.book(client, auth_headers, token, seller_id, slot_id).status_code == 201
+        user_ids = [seller_id, *tokens]
+        expected = day_counts(user_ids)
+        assert expected[seller_id, '2030-03-01'] == 2
+
+        MeetingDayCount.query.filter_by(user_id=seller_id).update({'meetings': 7})
+        db.session.commit()
+        result = runner.invoke(args=['reconcile-meeting-quotas'])
+
+        assert result.exit_code == 0
+        assert '(1 corrected)' in result.output
+        assert day_counts(user_ids) == expected
+
+
+@pytest.mark.meetings
+class TestBulkMeetingStatus:
+    """Test PUT /api/meetings/status"""
+
+    def book_all(self, client, auth_headers, tokens, seller_id):
+        return [
+            client.post('/api/buyer/meetings', headers=auth_headers(token),
+                        json={'seller_id': seller_id, 'time_slot_id': slot_id}).get_json()['meeting']['id']
+            for token, slot_id in zip(tokens.values(), slot_ids(seller_id))
+        ]
+
+    def bulk(self, client, auth_headers, token, meeting_ids, status):
+        return client.put('/api/meetings/status', headers=auth_headers(token),
+                          json={'meeting_ids': meeting_ids, 'status': status})
+
+    def test_rejecting_frees_slots_and_quota(self, client, auth_headers, market, quotas):
+        make_sellers, make_buyers = market
+        quotas(buyer=10, seller=10)
+        seller_id, other_seller = make_sellers(2, slots=3)
+        tokens = make_buyers(3)
+        meeting_ids = self.book_all(client, auth_headers, tokens, seller_id)
+        other_meeting, = self.book_all(client, auth_headers, dict([next(iter(tokens.items()))]), other_seller)
+        seller_token = create_access_token(identity=str(seller_id), additional_claims={'role': UserRole.SELLER.value})
+
+        response = self.bulk(client, auth_headers, seller_token, meeting_ids + [other_meeting, 0], 'rejected')
+
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['updated'] == 3
+        assert body['results'] == [{'id': i, 'status': 'rejected'} for i in meeting_ids] + [
+            {'id': other_meeting, 'error': 'You do not have permission to update this meeting', 'code': 403},
+            {'id': 0, 'error': 'Meeting not found', 'code': 404}
+        ]
+        db.session.expire_all()
+        assert all(slot.is_available and slot.meeting_id is None for slot in TimeSlot.query.filter_by(user_id=seller_id))
+        assert {m.status for m in Meeting.query.filter(Meeting.id.in_(meeting_ids))} == {MeetingStatus.REJECTED}
+        assert set(day_counts([seller_id, *tokens]).values()) == {0, 1}
+        assert day_counts([seller_id]) == {(seller_id, '2030-03-01'): 0}
+        assert db.session.get(Meeting, other_meeting).status == MeetingStatus.PENDING
+
+    def test_transitions_follow_the_single_meeting_rules(self, client, auth_headers, market, quotas):
+        make_sellers, make_buyers = market
+        quotas(buyer=10, seller=10)
+        seller_id, = make_sellers(1, slots=2)
+        tokens = make_buyers(2)
+        first, second = self.book_all(client, auth_headers, tokens, seller_id)
+        seller_token = create_access_token(identity=str(seller_id), additional_claims={'role': UserRole.SELLER.value})
+
+        # Requestors cannot accept their own requests
+        own = self.bulk(client, auth_headers, next(iter(tokens.values())), [first], 'accepted').get_json()
+        assert own['results'] == [{'id': first, 'error': 'You cannot accept or reject your own meeting request', 'code': 403}]
+
+        assert self.bulk(client, auth_headers, seller_token, [first], 'accepted').get_json()['updated'] == 1
+        rejected = self.bulk(client, auth_headers, seller_token, [first, second], 'rejected').get_json()
+        assert rejected['results'] == [
+            {'id': first, 'error': 'Cannot change a meeting with status: accepted', 'code': 400},
+            {'id': second, 'status': 'rejected'}
+        ]
+        cancelled = self.bulk(client, auth_headers, seller_token, [first, second], 'cancelled').get_json()
+        assert [r.get('status') for r in cancelled['results']] == ['cancelled', None]
+        assert day_counts([seller_id]) == {(seller_id, '2030-03-01'): 0}
+
+    def test_invalid_requests_are_refused(self, client, auth_headers, market):
+        _, make_buyers = market
+        token, = make_buyers(1).values()
+        assert self.bulk(client, auth_headers, token, [], 'rejected').status_code == 400
+        assert self.bulk(client, auth_headers, token, ['1'], 'rejected').status_code == 400
+        assert self.bulk(client, auth_headers, token, [1], 'completed').status_code == 400
+
+
+@pytest.mark.meetings
+class TestDisablingMeetings:
+    """Test that disabling meetings expires pending ones"""
+
+    def book_pending(self, client, auth_headers, market):
+        make_sellers, make_buyers = market
+        seller_id, = make_sellers(1, slots=3)
+        tokens = make_buyers(3)
+        meeting_ids = [
+            client.post('/api/buyer/meetings', headers=auth_headers(token),
+                        json={'seller_id': seller_id, 'time_slot_id': slot_id}).get_json()['meeting']['id']
+            for token, slot_id in zip(tokens.values(), slot_ids(seller_id))
+        ]
+        seller_token = create_access_token(identity=str(seller_id), additional_claims={'role': UserRole.SELLER.value})
+        client.put('/api/meetings/status', headers=auth_headers(seller_token),
+                   json={'meeting_ids': meeting_ids[:1], 'status': 'accepted'})
+        return seller_id, list(tokens), meeting_ids
+
+    def assert_expired(self, seller_id, buyer_ids, meeting_ids):
+        db.session.expire_all()
+        statuses = [db.session.get(Meeting, meeting_id).status for meeting_id in meeting_ids]
+        assert statuses == [MeetingStatus.ACCEPTED, MeetingStatus.CANCELLED, MeetingStatus.CANCELLED]
+        assert [slot.is_available for slot in TimeSlot.query.filter_by(user_id=seller_id).order_by(TimeSlot.id)] == [False, True, True]
+        assert day_counts([seller_id, *buyer_ids]) == {
+            (seller_id, '2030-03-01'): 1, **{(buyer_id, '2030-03-01'): int(i == 0) for i, buyer_id in enumerate(buyer_ids)}
+        }
+
+    def test_pending_meetings_are_expired_in_one_statement(self, client, admin_token, auth_headers, market, quotas, query_counter):
+        quotas(buyer=10, seller=10)
+        seller_id, buyer_ids, meeting_ids = self.book_pending(client, auth_headers, market)
+
+        with query_counter() as queries:
+            response = client.put('/api/system/meetings-toggle', headers=auth_headers(admin_token), json={'enabled': False})
+
+        assert response.status_code == 200
+        assert response.get_json()['expired_meetings'] >= 2
+        assert sum('UPDATE meetings' in statement for statement in queries) == 1
+        self.assert_expired(seller_id, buyer_ids, meeting_ids)
+
+    def test_large_sets_are_expired_in_the_background(self, app, client, admin_token, auth_headers, market, quotas, monkeypatch):
+        quotas(buyer=10, seller=10)
+        seller_id, buyer_ids, meeting_ids = self.book_pending(client, auth_headers, market)
+        monkeypatch.setitem(app.config, 'MEETING_EXPIRY_ASYNC_THRESHOLD', 1)
+        monkeypatch.setitem(app.config, 'MEETING_EXPIRY_BATCH_SIZE', 1)
+
+        response = client.put('/api/system/meetings-toggle', headers=auth_headers(admin_token), json={'enabled': False})
+
+        assert response.status_code == 202
+        assert response.get_json()['expiring_meetings'] >= 2
+        app.extensions.pop('meeting_expiry').shutdown(wait=True)
+        self.assert_expired(seller_id, buyer_ids, meeting_ids)
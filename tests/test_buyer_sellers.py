@@ -0,0 +1,93 @@
+"""
+Buyer seller-directory API tests
+"""
+import pytest
+from app.models import db, User, UserRole, SellerProfile, Interest, Meeting, MeetingStatus
+
+
+def create_sellers(start, count, interest):
+    """Create sellers with profiles and a target market, returning their ids."""
+    seller_ids = []
+    for i in range(start, start + count):
+        user = User(
+            username=f'qc_seller_{i}',
+            email=f'qc_seller_{i}@test.com',
+            password='seller123',
+            role=UserRole.SELLER,
+            business_name=f'QC Resort {i}'
+        )
+        db.session.add(user)
+        db.session.flush()
+        profile = SellerProfile(user_id=user.id, business_name=f'QC Resort {i}')
+        profile.target_market_relationships.append(interest)
+        db.session.add(profile)
+        seller_ids.append(user.id)
+    db.session.commit()
+    return seller_ids
+
+
+@pytest.mark.buyer
+class TestBuyerSellerDirectory:
+    """Test the buyer seller directory endpoint"""
+
+    @pytest.fixture
+    def directory_data(self, app):
+        """Seed sellers, a target market and meetings; remove them afterwards."""
+        buyer = User.query.filter_by(username='test_buyer').first()
+        interest = Interest(name='qc_directory_interest')
+        db.session.add(interest)
+        db.session.commit()
+
+        created = {'buyer_id': buyer.id, 'interest': interest, 'seller_ids': []}
+        yield created
+
+        Meeting.query.filter(Meeting.seller_id.in_(created['seller_ids'])).delete(synchronize_session=False)
+        for profile in SellerProfile.query.filter(SellerProfile.user_id.in_(created['seller_ids'])).all():
+            profile.target_market_relationships = []
+            db.session.delete(profile)
+        User.query.filter(User.id.in_(created['seller_ids'])).delete(synchronize_session=False)
+        db.session.delete(interest)
+        db.session.commit()
+
+    def test_meeting_status_is_latest_per_seller(self, client, buyer_token, auth_headers, directory_data):
+        """Test that each seller reports the buyer's most recent meeting status"""
+        seller_ids = create_sellers(0, 2, directory_data['interest'])
+        directory_data['seller_ids'].extend(seller_ids)
+
+        db.session.add(Meeting(buyer_id=directory_data['buyer_id'], seller_id=seller_ids[0],
+                               status=MeetingStatus.CANCELLED))
+        db.session.commit()
+        db.session.add(Meeting(buyer_id=directory_data['buyer_id'], seller_id=seller_ids[0],
+                               status=MeetingStatus.PENDING))
+        db.session.commit()
+
+        response = client.get('/api/buyer/sellers?specialty=qc_directory_interest',
+                              headers=auth_headers(buyer_token))
+
+        assert response.status_code == 200
+        sellers = {s['id']: s for s in response.get_json()['sellers']}
+        assert set(sellers) == set(seller_ids)
+        assert sellers[seller_ids[0]]['meetingStatus'] == 'pending'
+        assert sellers[seller_ids[1]]['meetingStatus'] == 'none'
+        assert sellers[seller_ids[1]]['specialties'] == ['qc_directory_interest']
+
+    def test_query_count_independent_of_seller_count(self, client, buyer_token, auth_headers,
+                                                     directory_data, query_counter):
+        """Test that listing sellers uses a fixed number of queries"""
+        directory_data['seller_ids'].extend(create_sellers(0, 3, directory_data['interest']))
+        with query_counter() as few_sellers_queries:
+            response = client.get('/api/buyer/sellers', headers=auth_headers(buyer_token))
+        assert response.status_code == 200
+
+        directory_data['seller_ids'].extend(create_sellers(3, 12, directory_data['interest']))
+        for seller_id in directory_data['seller_ids']:
+            db.session.add(Meeting(buyer_id=directory_data['buyer_id'], seller_id=seller_id,
+                                   status=MeetingStatus.PENDING))
+        db.session.commit()
+
+        with query_counter() as many_sellers_queries:
+            response = client.get('/api/buyer/sellers', headers=auth_headers(buyer_token))
+        assert response.status_code == 200
+
+        assert len(many_sellers_queries) == len(few_sellers_queries)
+        assert len(many_sellers_queries) <= 5
@@ -0,0 +1,156 @@
+"""
+Email outbox and worker tests
+"""
+import socket
+import uuid
+import pytest
+from datetime import datetime
+from app.models import db, EmailOutbox, User, UserRole
+from app.utils.email_service import queue_email, send_approval_email
+from app.utils.email_worker import EmailWorker, MAX_ATTEMPTS
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+
+
+class RecordingHandler:
+    """aiosmtpd handler that records received messages and SMTP sessions"""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode('utf8', errors='replace')))
+        return '250 Message accepted for delivery'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def mail_config(app):
+    """Point the app at a local plain SMTP server; restore the config afterwards."""
+    saved = {key: app.config.get(key) for key in ('MAIL_SERVER', 'MAIL_PORT', 'MAIL_USE_SSL', 'MAIL_USERNAME', 'MAIL_PASSWORD')}
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=free_port(), MAIL_USE_SSL=False,
+                      MAIL_USERNAME=None, MAIL_PASSWORD=None)
+    yield app.config
+    app.config.update(saved)
+
+
+@pytest.fixture
+def smtp_server(mail_config):
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname='127.0.0.1', port=mail_config['MAIL_PORT'])
+    controller.start()
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def email_job(app):
+    """A job id whose outbox rows are removed afterwards."""
+    job_id = str(uuid.uuid4())
+    yield job_id
+    db.session.rollback()
+    EmailOutbox.query.filter_by(job_id=job_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def queue_job(job_id, count):
+    for i in range(count):
+        queue_email(f'guest{i}@test.com', f'Hello {i}', 'Plain text', '<p>HTML</p>', job_id=job_id, commit=False)
+    db.session.commit()
+
+
+@pytest.mark.email
+class TestEmailOutbox:
+    """Test queued email delivery"""
+
+    def test_batch_is_sent_over_one_connection(self, app, smtp_server, email_job):
+        """Test that the worker sends a batch reusing one SMTP connection"""
+        queue_job(email_job, 3)
+        worker = EmailWorker(app)
+
+        worker.process_batch()
+        worker._close_connection()
+
+        recipients = {rcpt for rcpts, _ in smtp_server.messages for rcpt in rcpts}
+        assert {'guest0@test.com', 'guest1@test.com', 'guest2@test.com'} <= recipients
+        assert smtp_server.sessions == 1
+        entries = EmailOutbox.query.filter_by(job_id=email_job).all()
+        assert {e.status for e in entries} == {'sent'}
+
+    def test_credentials_are_issued_at_send_time(self, app, smtp_server, email_job):
+        """Test that approval emails never store a password and sent emails drop their contents"""
+        user = User(username=f'approved_{email_job[:8]}', email=f'approved-{email_job[:8]}@test.com',
+                    password='unsent-password', role=UserRole.BUYER)
+        db.session.add(user)
+        db.session.commit()
+        try:
+            send_approval_email(user, job_id=email_job)
+            entry = EmailOutbox.query.filter_by(job_id=email_job).one()
+            assert '[[password]]' in entry.text_body
+
+            worker = EmailWorker(app)
+            worker.process_batch()
+            worker._close_connection()
+
+            _, content = next(m for m in smtp_server.messages if user.email in m[0])
+            password = next(line.split(':', 1)[1].strip() for line in content.splitlines() if line.strip().startswith('Password:'))
+            db.session.expire_all()
+            assert db.session.get(User, user.id).check_password(password)
+            entry = db.session.get(EmailOutbox, entry.id)
+            assert (entry.status, entry.text_body, entry.html_body) == ('sent', '', None)
+        finally:
+            db.session.rollback()
+            EmailOutbox.query.filter_by(job_id=email_job).delete(synchronize_session=False)
+            User.query.filter_by(id=user.id).delete(synchronize_session=False)
+            db.session.commit()
+
+    def test_failed_sends_are_retried_with_backoff(self, app, mail_config, email_job):
+        """Test that failures are rescheduled and eventually marked failed"""
+        queue_job(email_job, 1)
+        worker = EmailWorker(app)
+
+        worker.process_batch()
+        entry = EmailOutbox.query.filter_by(job_id=email_job).one()
+        assert entry.status == 'pending'
+        assert entry.attempts == 1
+        assert entry.last_error
+        first_retry_delay = entry.next_attempt_at - datetime.utcnow()
+
+        for _ in range(MAX_ATTEMPTS - 1):
+            entry.next_attempt_at = datetime.utcnow()
+            db.session.commit()
+            worker.process_batch()
+            db.session.refresh(entry)
+            if entry.status == 'pending':
+                assert entry.next_attempt_at - datetime.utcnow() > first_retry_delay
+
+        assert entry.status == 'failed'
+        assert entry.attempts == MAX_ATTEMPTS
+
+    def test_email_job_status(self, client, admin_token, auth_headers, email_job):
+        """Test the email job progress endpoint"""
+        queue_job(email_job, 2)
+
+        response = client.get(f'/api/admin/email-jobs/{email_job}', headers=auth_headers(admin_token))
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['total'] == 2
+        assert data['pending'] == 2
+        assert data['sent'] == 0
+
+    def test_unknown_email_job(self, client, admin_token, auth_headers):
+        response = client.get(f'/api/admin/email-jobs/{uuid.uuid4()}', headers=auth_headers(admin_token))
+
+        assert response.status_code == 404
@@ -0,0 +1,146 @@
+"""
+Ground transport scheduling tests
+"""
+import uuid
+from datetime import datetime, date, timedelta
+import pytest
+from app.models import db, User, UserRole, TravelPlan, Transportation, GroundTransportation, TransportType
+from app.utils.ground_transport import pool_trips
+
+VAN = {'transport_type_id': 1, 'transport_type': 'Van', 'capacity': 7}
+CAR = {'transport_type_id': 2, 'transport_type': 'Car', 'capacity': 3}
+
+
+@pytest.fixture
+def travellers(app):
+    """Vehicle types and a factory for buyers with entered journeys; all removed afterwards."""
+    run = uuid.uuid4().hex[:8]
+    vehicle_types = [TransportType(transport_type=f'Van {run}', capacity=7),
+                     TransportType(transport_type=f'Car {run}', capacity=3)]
+    db.session.add_all(vehicle_types)
+    db.session.commit()
+    type_ids = [t.transport_type_id for t in vehicle_types]
+    buyer_ids = []
+
+    def make_travellers(arrivals, location='Calicut Airport (CCJ)', return_location=None):
+        for arrival in arrivals:
+            user = User(username=f'traveller_{run}_{len(buyer_ids)}', email=f'traveller-{run}-{len(buyer_ids)}@example.com',
+                        password='buyer123', role=UserRole.BUYER)
+            db.session.add(user)
+            db.session.flush()
+            plan = TravelPlan(user_id=user.id, event_name='Splash', event_start_date=date(2030, 7, 11),
+                              event_end_date=date(2030, 7, 13), venue='Wayanad', status='Planned')
+            plan.transportation = Transportation(
+                type='flight', outbound_carrier='AI', outbound_number='101',
+                outbound_departure_location='DEL', outbound_departure_datetime=arrival - timedelta(hours=3),
+                outbound_arrival_location=location, outbound_arrival_datetime=arrival,
+                outbound_booking_reference='OUT', return_carrier='AI', return_number='102',
+                return_departure_location=location if return_location is None else return_location, return_departure_datetime=datetime(2030, 7, 13, 18),
+                return_arrival_location='DEL', return_arrival_datetime=datetime(2030, 7, 13, 21),
+                return_booking_reference='RET'
+            )
+            db.session.add(plan)
+            buyer_ids.append(user.id)
+        db.session.commit()
+        return list(buyer_ids)
+
+    yield type_ids, make_travellers
+
+    db.session.rollback()
+    plan_ids = [plan.id for plan in TravelPlan.query.filter(TravelPlan.user_id.in_(buyer_ids))]
+    for model in (Transportation, GroundTransportation):
+        model.query.filter(model.travel_plan_id.in_(plan_ids)).delete(synchronize_session=False)
+    TravelPlan.query.filter(TravelPlan.id.in_(plan_ids)).delete(synchronize_session=False)
+    User.query.filter(User.id.in_(buyer_ids)).delete(synchronize_session=False)
+    TransportType.query.filter(TransportType.transport_type_id.in_(type_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+@pytest.mark.admin
+class TestGroundTransportScheduling:
+    """Test pooling buyers into shared transfer vehicles"""
+
+    def test_trips_are_grouped_by_location_and_window(self):
+        start = datetime(2030, 7, 10, 9, 0)
+        trips = [(i, 'Calicut Airport', start + timedelta(minutes=5 * i)) for i in range(9)]
+        trips += [(20, ' calicut  airport', start + timedelta(minutes=20)), (21, 'Kannur Airport', start)]
+        trips += [(30, 'Calicut Airport', start + timedelta(hours=3))]
+
+        vehicles = pool_trips(trips, [VAN, CAR], window_minutes=60)
+
+        seated = [(v['location'].strip().split()[0].lower(), v['transport_type'], v['buyer_ids']) for v in vehicles]
+        assert seated == [
+            ('calicut', 'Van', [0, 1, 2, 3, 4, 20, 5]),
+            ('calicut', 'Car', [6, 7, 8]),
+            ('calicut', 'Car', [30]),
+            ('kannur', 'Car', [21]),
+        ]
+        # The first vehicle leaves with its last passenger
+        assert vehicles[0]['time'] == start + timedelta(minutes=25)
+        assert len({v['group'] for v in vehicles}) == len(vehicles)
+
+    def test_departures_are_dropped_off_before_the_earliest_departure(self):
+        departure = datetime(2030, 7, 13, 18, 0)
+        trips = [(1, 'CCJ', departure), (2, 'CCJ', departure + timedelta(minutes=30))]
+
+        vehicles = pool_trips(trips, [VAN], direction='departure', departure_buffer_minutes=120)
+
+        assert [(v['buyer_ids'], v['time']) for v in vehicles] == [([1, 2], departure - timedelta(hours=2))]
+        assert vehicles[0]['group'].startswith('DEP-')
+
+    def test_preview_then_commit(self, client, admin_token, auth_headers, travellers):
+        type_ids, make_travellers = travellers
+        start = datetime(2030, 7, 10, 9, 0)
+        buyer_ids = make_travellers([start + timedelta(minutes=10 * i) for i in range(5)])
+        headers = auth_headers(admin_token)
+
+        preview = client.post('/api/admin/transportation/schedule', headers=headers, json={'buyer_ids': buyer_ids})
+        assert preview.status_code == 200
+        plan = preview.get_json()
+        assert plan['total_buyers'] == 5
+        assert [len(v['buyer_ids']) for v in plan['vehicles'] if v['direction'] == 'arrival'] == [5]
+        assert GroundTransportation.query.count() == 0
+
+        response = client.post('/api/admin/transportation/schedule', headers=headers,
+                               json={'buyer_ids': buyer_ids, 'commit': True})
+        assert response.status_code == 201
+        rows = GroundTransportation.query.join(TravelPlan).filter(TravelPlan.user_id.in_(buyer_ids)).all()
+        assert len(rows) == 5
+        assert len({row.pickup_group for row in rows}) == 1
+        assert {row.pickup_vehicle_type for row in rows} == {type_ids[0]}
+        assert all(row.pickup_datetime == start + timedelta(minutes=40) for row in rows)
+        assert all(row.dropoff_datetime == datetime(2030, 7, 13, 15) for row in rows)
+
+        # Scheduled buyers are not scheduled again
+        again = client.post('/api/admin/transportation/schedule', headers=headers, json={'buyer_ids': buyer_ids})
+        assert again.get_json()['total_buyers'] == 0
+
+    def test_missing_legs_are_skipped(self, client, admin_token, auth_headers, travellers):
+        _, make_travellers = travellers
+        start = datetime(2030, 7, 10, 9, 0)
+        complete = make_travellers([start])
+        # Saving only the outbound journey leaves a blank placeholder return
+        outbound_only, = make_travellers([start], return_location='')[1:]
+
+        response = client.post('/api/admin/transportation/schedule', headers=auth_headers(admin_token),
+                               json={'buyer_ids': complete + [outbound_only], 'commit': True})
+
+        assert response.status_code == 201
+        body = response.get_json()
+        departures = [v for v in body['vehicles'] if v['direction'] == 'departure']
+        assert [v['buyer_ids'] for v in departures] == [complete]
+        assert [s['buyer_id'] for s in body['skipped']] == [outbound_only]
+        row = GroundTransportation.query.join(TravelPlan).filter(TravelPlan.user_id == outbound_only).one()
+        assert row.pickup_location == 'Calicut Airport (CCJ)'
+        assert (row.dropoff_location, row.dropoff_datetime, row.dropoff_group) == (None, None, None)
+
+        # An admin can edit the one leg and add the missing leg afterwards
+        response = client.put(f'/api/admin/transportation/{row.id}', headers=auth_headers(admin_token),
+                              json={'pickup_datetime': '2030-07-10T09:30:00', 'pickup_driver_contact': '9999999999'})
+        assert response.status_code == 200
+        response = client.put(f'/api/admin/transportation/{row.id}', headers=auth_headers(admin_token),
+                              json={'dropoff_location': 'Calicut Airport (CCJ)', 'dropoff_datetime': '2030-07-13T15:00:00'})
+        assert response.status_code == 200
+        db.session.expire_all()
+        row = db.session.get(GroundTransportation, row.id)
+        assert (row.dropoff_location, row.dropoff_datetime) == ('Calicut Airport (CCJ)', datetime(2030, 7, 13, 15))
@@ -0,0 +1,222 @@
+"""
+Image upload pipeline tests
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+import pytest
+from PIL import Image
+from app.models import db, User, SellerProfile, ImageUpload
+from app.utils.image_pipeline import process_image, MAX_IMAGE_DIMENSION, THUMBNAIL_SIZE, PARALLEL_UPLOADS
+
+
+class StorageStandIn(BaseHTTPRequestHandler):
+    """Minimal WebDAV + OCS share server recording what it receives"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is visible
+    files = {}
+    directories = set()
+    shares = []
+    requests = []
+    connections = set()
+    fail_uploads = False
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        self.requests.append((self.command, self.path))
+        self.connections.add(self.client_address)
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def do_MKCOL(self):
+        self._body()
+        if self.path in self.directories:
+            self.send_response(405)
+        else:
+            self.directories.add(self.path)
+            self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_PUT(self):
+        data = self._body()
+        if self.fail_uploads:
+            self.send_response(507)
+        else:
+            self.files[self.path] = data
+            self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        self.shares.append(self._body().decode())
+        payload = b'{"ocs": {"meta": {"status": "ok"}, "data": {"url": "http://share.test/s/%d"}}}' % len(self.shares)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    StorageStandIn.files, StorageStandIn.directories, StorageStandIn.shares = {}, set(), []
+    StorageStandIn.requests, StorageStandIn.connections = [], set()
+    StorageStandIn.fail_uploads = False
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StorageStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('EXTERNAL_STORAGE_URL', f'http://127.0.0.1:{server.server_port}/')
+    monkeypatch.setenv('EXTERNAL_STORAGE_USER', 'splash')
+    monkeypatch.setenv('EXTERNAL_STORAGE_PASSWORD', 'secret')
+    yield StorageStandIn
+    server.shutdown()
+
+
+@pytest.fixture
+def spool_dir(app, tmp_path):
+    """Spool uploads into a temporary directory so leftovers can be checked"""
+    previous = app.config['UPLOAD_SPOOL_DIR']
+    app.config['UPLOAD_SPOOL_DIR'] = str(tmp_path)
+    yield tmp_path
+    app.config['UPLOAD_SPOOL_DIR'] = previous
+
+
+@pytest.fixture
+def seller_profile(app):
+    """A seller profile for the test seller; removed or restored afterwards."""
+    user = User.query.filter_by(username='test_seller').first()
+    profile = SellerProfile.query.filter_by(user_id=user.id).first()
+    created = profile is None
+    if created:
+        profile = SellerProfile(user_id=user.id, business_name='Test Resort')
+        db.session.add(profile)
+    saved = (profile.business_images, profile.logo_url)
+    profile.business_images = []
+    db.session.commit()
+
+    yield profile
+
+    db.session.rollback()
+    ImageUpload.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+    profile = SellerProfile.query.filter_by(user_id=user.id).first()
+    if created:
+        db.session.delete(profile)
+    else:
+        profile.business_images, profile.logo_url = saved
+    db.session.commit()
+
+
+def image_bytes(size=(800, 600), mode='RGB', fmt='JPEG'):
+    buffer = BytesIO()
+    Image.new(mode, size, color=(200, 120, 40) if mode == 'RGB' else (200, 120, 40, 128)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def wait_for_upload(client, headers, upload_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        upload = client.get(f'/api/uploads/{upload_id}', headers=headers).get_json()['upload']
+        if upload['status'] in ('done', 'failed'):
+            return upload
+        time.sleep(0.05)
+    raise AssertionError('Upload did not finish')
+
+
+@pytest.mark.seller
+class TestImagePipeline:
+    """Test image processing and background uploads"""
+
+    def test_process_image_downscales_and_builds_thumbnail(self):
+        processed = process_image(BytesIO(image_bytes(size=(3200, 1800))))
+
+        encoded, extension, mime_type = processed['image']
+        with Image.open(encoded) as image:
+            assert image.format == 'JPEG'
+            assert max(image.size) == MAX_IMAGE_DIMENSION
+        with Image.open(processed['thumbnail'][0]) as thumbnail:
+            assert thumbnail.format == 'WEBP'
+            assert thumbnail.width <= THUMBNAIL_SIZE[0] and thumbnail.height <= THUMBNAIL_SIZE[1]
+
+    def test_transparent_images_stay_png(self):
+        processed = process_image(BytesIO(image_bytes(mode='RGBA', fmt='PNG')))
+
+        assert processed['image'][1:] == ('png', 'image/png')
+
+    def test_seller_images_are_uploaded_in_background(self, client, seller_token, auth_headers,
+                                                      storage, seller_profile, spool_dir):
+        headers = auth_headers(seller_token)
+        response = client.post('/api/sellers/profile/images', headers=headers, data={
+            'files': [(BytesIO(image_bytes()), 'lobby.jpg'), (BytesIO(image_bytes(mode='RGBA', fmt='PNG')), 'pool.png')]
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 202
+        upload = wait_for_upload(client, headers, response.get_json()['upload']['id'])
+
+        assert upload['status'] == 'done', upload['error']
+        assert list(spool_dir.iterdir()) == []
+        assert len(storage.files) == 4  # two images and two thumbnails
+        assert sum(path.endswith('.webp') for path in storage.files) == 2
+        db.session.refresh(seller_profile)
+        assert [image['filename'] for image in seller_profile.business_images] == ['lobby.jpg', 'pool.png']
+        assert all(image['thumbnail_url'].endswith('/download') for image in seller_profile.business_images)
+
+    def test_invalid_image_is_rejected(self, client, seller_token, auth_headers, storage, seller_profile):
+        response = client.post('/api/sellers/profile/images', headers=auth_headers(seller_token), data={
+            'files': [(BytesIO(b'not really a jpeg'), 'fake.jpg')]
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 400
+
+    def test_oversized_file_is_rejected_without_leftovers(self, client, seller_token, auth_headers,
+                                                          storage, seller_profile, spool_dir):
+        oversized = image_bytes() + b'\0' * (2 * 1024 * 1024)
+        response = client.post('/api/sellers/profile/images', headers=auth_headers(seller_token), data={
+            'files': [(BytesIO(image_bytes()), 'small.jpg'), (BytesIO(oversized), 'huge.jpg')]
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 400
+        assert response.get_json()['details'] == ["File 'huge.jpg' exceeds 2MB limit."]
+        assert list(spool_dir.iterdir()) == []
+
+    def test_request_over_content_length_is_refused(self, client, seller_token, auth_headers, app, seller_profile):
+        too_big = b'\0' * (app.config['MAX_CONTENT_LENGTH'] + 1)
+        response = client.post('/api/sellers/profile/logo', headers=auth_headers(seller_token), data={
+            'file': (BytesIO(too_big), 'logo.png')
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 413
+        assert 'upload limit' in response.get_json()['error']
+
+    def test_storage_failure_is_reported(self, client, seller_token, auth_headers, storage, seller_profile):
+        storage.fail_uploads = True
+        headers = auth_headers(seller_token)
+        response = client.post('/api/sellers/profile/logo', headers=headers, data={
+            'file': (BytesIO(image_bytes()), 'logo.png')
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 202
+        upload = wait_for_upload(client, headers, response.get_json()['upload']['id'])
+
+        assert upload['status'] == 'failed'
+        assert 'HTTP 507' in upload['error']
+
+    def test_gallery_upload_reuses_directories_and_connections(self, client, seller_token, auth_headers,
+                                                               storage, seller_profile):
+        headers = auth_headers(seller_token)
+        for batch in range(2):
+            response = client.post('/api/sellers/profile/images', headers=headers, data={
+                'files': [(BytesIO(image_bytes()), f'room{batch}{i}.jpg') for i in range(5)]
+            }, content_type='multipart/form-data')
+            upload = wait_for_upload(client, headers, response.get_json()['upload']['id'])
+            assert upload['status'] == 'done', upload['error']
+
+        # The seller directory is probed once, not once per file or per job
+        assert [request for request in storage.requests if request[0] == 'MKCOL'] == [
+            ('MKCOL', '/remote.php/dav/files/splash/Photos/seller_%d' % seller_profile.user_id)
+        ]
+        assert len(storage.files) == 20
+        # Keep-alive pool: far fewer connections than the 41 requests made
+        assert len(storage.connections) <= PARALLEL_UPLOADS
@@ -0,0 +1,51 @@
+"""
+Bulk invite import tests
+"""
+import pandas as pd
+import pytest
+from app.models import db, User, InvitedBuyer
+from app.utils.invite_import import import_invites
+
+
+@pytest.fixture
+def admin_id(app):
+    """The test admin; invites created by a test are rolled back afterwards."""
+    admin_id = User.query.filter_by(username='test_admin').first().id
+    yield admin_id
+    db.session.rollback()
+
+
+def sheet(names, emails):
+    return pd.DataFrame({'Name': names, 'Email': emails})
+
+
+@pytest.mark.admin
+class TestInviteImport:
+    """Test the vectorized invite import used by /api/admin/upload-invites"""
+
+    def test_valid_invalid_and_duplicate_rows(self, app, admin_id):
+        """Test that invalid emails are reported and repeated or known emails are skipped"""
+        df = sheet(
+            ['Asha', 'Ben', 'Ben again', 'Broken', 'Existing user', 'Missing'],
+            ['asha@import.test', 'ben@import.test', ' BEN@import.test ', 'not-an-email', 'buyer@test.com', None]
+        )
+
+        invited_buyers, skipped, errors = import_invites(df, admin_id)
+
+        assert [b.email for b in invited_buyers] == ['asha@import.test', 'ben@import.test']
+        assert skipped == 2
+        assert [(e['row'], e['error']) for e in errors] == [(5, 'Invalid email format'), (7, 'Invalid email format')]
+        assert InvitedBuyer.query.filter(InvitedBuyer.email.like('%@import.test')).count() == 2
+
+    def test_query_count_does_not_grow_with_rows(self, app, admin_id, query_counter):
+        """Test that the import issues a fixed number of statements"""
+        small = sheet([f'Guest {i}' for i in range(3)], [f'small{i}@import.test' for i in range(3)])
+        large = sheet([f'Guest {i}' for i in range(300)], [f'large{i}@import.test' for i in range(300)])
+
+        with query_counter() as small_queries:
+            import_invites(small, admin_id)
+        with query_counter() as large_queries:
+            invited_buyers, _, _ = import_invites(large, admin_id)
+
+        assert len(invited_buyers) == 300
+        assert len(large_queries) == len(small_queries)
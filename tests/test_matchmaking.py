@@ -0,0 +1,185 @@
+"""
+Meeting matchmaking tests
+"""
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+import pytest
+from app.models import (
+    db, User, UserRole, BuyerProfile, SellerProfile, Interest, PropertyType, Meeting, MeetingStatus,
+    MeetingDayCount, TimeSlot
+)
+from app.utils.matchmaking import score_pairs, plan_matches
+
+START = datetime(2030, 5, 4, 9, 0)
+
+
+def buyer(buyer_id, interests, properties=(), vip=False, max_meetings=None, busy=()):
+    return {'id': buyer_id, 'interests': interests, 'properties': list(properties), 'vip': vip,
+            'max_meetings': max_meetings, 'busy': set(busy)}
+
+
+def seller(seller_id, interests, property_type=None):
+    return {'id': seller_id, 'interests': interests, 'property_type': property_type}
+
+
+def slots_for(seller_id, count, start=START, first_id=None):
+    first_id = first_id or seller_id * 100
+    return [(first_id + i, seller_id, start + timedelta(minutes=15 * i), start + timedelta(minutes=15 * i + 10))
+            for i in range(count)]
+
+
+@pytest.mark.meetings
+class TestMatchPlanning:
+    """Test scoring and slot assignment without the database"""
+
+    def test_scores_count_shared_interests_and_property_match(self):
+        buyers = [buyer(1, ['Wildlife', 'Trekking'], ['Resorts']), buyer(2, 'wildlife, Nature')]
+        sellers = [seller(10, [' wildlife', 'Nature'], 'resorts'), seller(11, ['Ayurveda'])]
+
+        assert score_pairs(buyers, sellers).tolist() == [[3, 0], [2, 0]]
+
+    def test_each_slot_and_buyer_time_is_used_once(self):
+        buyers = [buyer(i, ['Wildlife']) for i in range(1, 7)]
+        sellers = [seller(10, ['Wildlife']), seller(11, ['Wildlife'])]
+        slots = slots_for(10, 4) + slots_for(11, 4)
+
+        assignments = plan_matches(buyers, sellers, slots, buyer_daily_limit=10, seller_daily_limit=10)
+
+        assert len(assignments) == 8
+        assert len({a['time_slot_id'] for a in assignments}) == 8
+        assert len({(a['buyer_id'], a['start_time']) for a in assignments}) == 8
+        assert len({(a['buyer_id'], a['seller_id']) for a in assignments}) == 8
+
+    def test_best_match_and_vips_come_first(self):
+        buyers = [buyer(1, ['Wildlife']), buyer(2, ['Wildlife'], vip=True), buyer(3, ['Ayurveda'])]
+        sellers = [seller(10, ['Wildlife']), seller(11, ['Ayurveda'])]
+        slots = slots_for(10, 1) + slots_for(11, 1)
+
+        assignments = plan_matches(buyers, sellers, slots, buyer_daily_limit=10, seller_daily_limit=10)
+
+        assert {(a['buyer_id'], a['seller_id']) for a in assignments} == {(2, 10), (3, 11)}
+
+    def test_limits_busy_times_and_blocked_pairs(self):
+        buyers = [
+            buyer(1, ['Wildlife'], busy=[START]),
+            buyer(2, ['Wildlife'], max_meetings=1),
+            buyer(3, ['Wildlife'])
+        ]
+        sellers = [seller(10, ['Wildlife']), seller(11, ['Wildlife']), seller(12, ['Wildlife'])]
+        slots = slots_for(10, 3) + slots_for(11, 3) + slots_for(12, 3)
+
+        assignments = plan_matches(
+            buyers, sellers, slots, buyer_daily_limit=2, seller_daily_limit=10,
+            day_counts={(3, START.date()): 1}, blocked_pairs={(1, 10)}
+        )
+
+        per_buyer = Counter(a['buyer_id'] for a in assignments)
+        assert per_buyer == {1: 2, 2: 1, 3: 1}
+        assert all(a['start_time'] != START for a in assignments if a['buyer_id'] == 1)
+        assert all(a['seller_id'] != 10 for a in assignments if a['buyer_id'] == 1)
+
+    def test_unmatched_pairs_are_not_scheduled(self):
+        assignments = plan_matches([buyer(1, ['Wildlife'])], [seller(10, ['Ayurveda'], 'Villas')], slots_for(10, 2),
+                                   buyer_daily_limit=10, seller_daily_limit=10)
+        assert assignments == []
+
+
+@pytest.fixture
+def event(app):
+    """Buyers and sellers with profiles, interests and slots; all removed afterwards"""
+    run = uuid.uuid4().hex[:8]
+    interests = [Interest(name=f'{name} {run}') for name in ('Wildlife', 'Ayurveda')]
+    property_type = PropertyType(name=f'Resorts {run}')
+    db.session.add_all(interests + [property_type])
+    db.session.commit()
+    interest_ids = [i.id for i in interests]
+    property_type_id = property_type.id
+    user_ids = []
+
+    def make_user(role, **profile):
+        user = User(username=f'{role.value}_{run}_{len(user_ids)}', email=f'{role.value}-{run}-{len(user_ids)}@example.com',
+                    password='match123', role=role)
+        db.session.add(user)
+        db.session.flush()
+        user_ids.append(user.id)
+        if role == UserRole.BUYER:
+            db.session.add(BuyerProfile(user_id=user.id, name='Matched buyer', organization='Test Travels', **profile))
+        else:
+            target_markets = profile.pop('target_markets')
+            seller_profile = SellerProfile(user_id=user.id, business_name='Matched resort', **profile)
+            seller_profile.target_market_relationships = target_markets
+            db.session.add(seller_profile)
+        return user.id
+
+    yield run, interests, property_type, make_user
+
+    db.session.rollback()
+    TimeSlot.query.filter(TimeSlot.user_id.in_(user_ids)).update({'meeting_id': None}, synchronize_session=False)
+    Meeting.query.filter(Meeting.buyer_id.in_(user_ids)).delete(synchronize_session=False)
+    TimeSlot.query.filter(TimeSlot.user_id.in_(user_ids)).delete(synchronize_session=False)
+    MeetingDayCount.query.filter(MeetingDayCount.user_id.in_(user_ids)).delete(synchronize_session=False)
+    for profile in SellerProfile.query.filter(SellerProfile.user_id.in_(user_ids)):
+        profile.target_market_relationships = []
+    db.session.flush()
+    SellerProfile.query.filter(SellerProfile.user_id.in_(user_ids)).delete(synchronize_session=False)
+    BuyerProfile.query.filter(BuyerProfile.user_id.in_(user_ids)).delete(synchronize_session=False)
+    User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+    Interest.query.filter(Interest.id.in_(interest_ids)).delete(synchronize_session=False)
+    PropertyType.query.filter_by(id=property_type_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+@pytest.mark.meetings
+class TestAutoSchedule:
+    """Test POST /api/meetings/auto-schedule"""
+
+    def test_preview_then_commit(self, client, admin_token, auth_headers, event):
+        run, (wildlife, ayurveda), resorts, make_user = event
+        buyer_ids = [
+            make_user(UserRole.BUYER, interests=[f'Wildlife {run}'], properties_of_interest=[f'Resorts {run}']),
+            make_user(UserRole.BUYER, interests=[f'Ayurveda {run}'])
+        ]
+        seller_ids = [
+            make_user(UserRole.SELLER, target_markets=[wildlife], property_type_id=resorts.id),
+            make_user(UserRole.SELLER, target_markets=[ayurveda])
+        ]
+        day = START.date()
+        db.session.add_all([
+            TimeSlot(user_id=seller_id, start_time=datetime.combine(day, t), end_time=datetime.combine(day, t) + timedelta(minutes=10))
+            for seller_id in seller_ids
+            # 12:00 is in the default lunch break
+            for t in (datetime.min.time().replace(hour=12), datetime.min.time().replace(hour=9))
+        ])
+        db.session.commit()
+        body = {'buyer_ids': buyer_ids, 'seller_ids': seller_ids}
+        headers = auth_headers(admin_token)
+
+        preview = client.post('/api/meetings/auto-schedule', headers=headers, json=body)
+        assert preview.status_code == 200
+        planned = preview.get_json()
+        assert planned['committed'] is False
+        assert sorted((m['buyer_id'], m['seller_id'], m['score']) for m in planned['meetings']) == [
+            (buyer_ids[0], seller_ids[0], 3), (buyer_ids[1], seller_ids[1], 1)
+        ]
+        assert {m['start_time'] for m in planned['meetings']} == {f'{day.isoformat()}T09:00:00'}
+        assert Meeting.query.filter(Meeting.buyer_id.in_(buyer_ids)).count() == 0
+
+        response = client.post('/api/meetings/auto-schedule', headers=headers, json=dict(body, commit=True))
+        assert response.status_code == 201
+        db.session.expire_all()
+        meetings = Meeting.query.filter(Meeting.buyer_id.in_(buyer_ids)).all()
+        assert len(meetings) == 2
+        assert all(m.status == MeetingStatus.PENDING and m.time_slot.meeting_id == m.id for m in meetings)
+        assert all(m.time_slot.is_available is False for m in meetings)
+        counts = {(c.user_id, c.day): c.meetings for c in MeetingDayCount.query.filter(MeetingDayCount.user_id.in_(buyer_ids + seller_ids))}
+        assert counts == {(user_id, day): 1 for user_id in buyer_ids + seller_ids}
+
+        # Scheduled pairs are not planned again
+        again = client.post('/api/meetings/auto-schedule', headers=headers, json=body)
+        assert again.get_json()['meetings'] == []
+
+    def test_invalid_ids_are_refused(self, client, admin_token, auth_headers):
+        response = client.post('/api/meetings/auto-schedule', headers=auth_headers(admin_token),
+                               json={'buyer_ids': 'all'})
+        assert response.status_code == 400
@@ -0,0 +1,173 @@
+"""
+Meeting API tests
+"""
+import csv
+import io
+import json
+import pytest
+from app.models import db, User, Meeting, MeetingStatus, TimeSlot
+from datetime import datetime, timedelta
+
+
+def create_meetings(buyer_id, seller_id, count, start=None):
+    """Create meetings between a buyer and seller, each with its own time slot."""
+    start = start or datetime(2030, 1, 1, 9, 0)
+    meetings = []
+    for i in range(count):
+        slot = TimeSlot(
+            user_id=seller_id,
+            start_time=start + timedelta(minutes=15 * i),
+            end_time=start + timedelta(minutes=15 * (i + 1)),
+            is_available=False
+        )
+        db.session.add(slot)
+        db.session.flush()
+        meeting = Meeting(
+            buyer_id=buyer_id,
+            seller_id=seller_id,
+            requestor_id=buyer_id,
+            time_slot_id=slot.id,
+            status=MeetingStatus.PENDING
+        )
+        db.session.add(meeting)
+        meetings.append(meeting)
+    db.session.commit()
+    return meetings
+
+
+@pytest.fixture
+def participants(app):
+    """The test buyer and seller; meetings and slots created for them are removed afterwards."""
+    buyer_id = User.query.filter_by(username='test_buyer').first().id
+    seller_id = User.query.filter_by(username='test_seller').first().id
+
+    yield buyer_id, seller_id
+
+    db.session.rollback()
+    TimeSlot.query.filter_by(user_id=seller_id).update({'meeting_id': None}, synchronize_session=False)
+    Meeting.query.filter_by(buyer_id=buyer_id, seller_id=seller_id).delete(synchronize_session=False)
+    TimeSlot.query.filter_by(user_id=seller_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+@pytest.mark.meetings
+class TestMeetingSerialization:
+    """Test bulk serialization of meetings"""
+
+    def test_to_dict_many_matches_to_dict(self, app, participants):
+        """Test that the bulk serializer produces identical output"""
+        buyer_id, seller_id = participants
+        meeting_ids = [m.id for m in create_meetings(buyer_id, seller_id, 3)]
+
+        db.session.expunge_all()
+        expected = [Meeting.query.get(meeting_id).to_dict() for meeting_id in meeting_ids]
+
+        db.session.expunge_all()
+        meetings = Meeting.query.filter(Meeting.id.in_(meeting_ids)).order_by(Meeting.id).all()
+
+        assert Meeting.to_dict_many(meetings) == expected
+
+    def test_to_dict_many_uses_fixed_query_count(self, app, participants, query_counter):
+        """Test that serializing more meetings does not issue more queries"""
+        buyer_id, seller_id = participants
+        create_meetings(buyer_id, seller_id, 2)
+
+        db.session.expunge_all()
+        meetings = Meeting.query.filter_by(buyer_id=buyer_id, seller_id=seller_id).all()
+        with query_counter() as few_meetings_queries:
+            Meeting.to_dict_many(meetings)
+
+        create_meetings(buyer_id, seller_id, 10, start=datetime(2030, 1, 2, 9, 0))
+
+        db.session.expunge_all()
+        meetings = Meeting.query.filter_by(buyer_id=buyer_id, seller_id=seller_id).all()
+        with query_counter() as many_meetings_queries:
+            Meeting.to_dict_many(meetings)
+
+        assert len(meetings) == 12
+        assert len(many_meetings_queries) == len(few_meetings_queries)
+
+    def test_admin_meeting_list_uses_fixed_query_count(self, client, admin_token, auth_headers,
+                                                       participants, query_counter):
+        """Test that GET /api/meetings does not lazy-load per meeting"""
+        buyer_id, seller_id = participants
+        create_meetings(buyer_id, seller_id, 2)
+        db.session.expunge_all()
+        with query_counter() as few_meetings_queries:
+            response = client.get('/api/meetings', headers=auth_headers(admin_token))
+        assert response.status_code == 200
+
+        create_meetings(buyer_id, seller_id, 10, start=datetime(2030, 1, 2, 9, 0))
+        db.session.expunge_all()
+        with query_counter() as many_meetings_queries:
+            response = client.get('/api/meetings', headers=auth_headers(admin_token))
+        assert response.status_code == 200
+
+        assert len(many_meetings_queries) == len(few_meetings_queries)
+
+
+@pytest.mark.meetings
+class TestMeetingPaginationAndExport:
+    """Test cursor pagination and streaming export of meetings"""
+
+    def test_cursor_pagination(self, client, admin_token, auth_headers, participants):
+        """Test that following next_cursor visits each meeting once"""
+        buyer_id, seller_id = participants
+        created_ids = {m.id for m in create_meetings(buyer_id, seller_id, 5)}
+
+        seen = []
+        cursor = min(created_ids) - 1
+        while True:
+            response = client.get(f'/api/meetings?limit=2&cursor={cursor}',
+                                  headers=auth_headers(admin_token))
+            assert response.status_code == 200
+            data = response.get_json()
+            assert len(data['meetings']) <= 2
+            seen.extend(m['id'] for m in data['meetings'])
+            if not data['pagination']['has_next']:
+                break
+            cursor = data['pagination']['next_cursor']
+
+        assert created_ids <= set(seen)
+        assert len(seen) == len(set(seen))
+
+    def test_page_size_is_validated_and_clamped(self, client, admin_token, auth_headers):
+        response = client.get('/api/meetings?limit=0', headers=auth_headers(admin_token))
+        assert response.status_code == 400
+
+        response = client.get('/api/meetings?limit=501', headers=auth_headers(admin_token))
+        assert response.status_code == 200
+        assert response.get_json()['pagination']['limit'] == 500
+
+    def test_ndjson_export(self, client, admin_token, auth_headers, participants):
+        """Test that the NDJSON export streams one serialized meeting per line"""
+        buyer_id, seller_id = participants
+        created_ids = {m.id for m in create_meetings(buyer_id, seller_id, 3)}
+
+        response = client.get('/api/meetings/export?format=ndjson', headers=auth_headers(admin_token))
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        assert response.is_streamed
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert created_ids <= {row['id'] for row in rows}
+        assert all(row['time_slot']['user_id'] == seller_id for row in rows if row['id'] in created_ids)
+
+    def test_csv_export(self, client, admin_token, auth_headers, participants):
+        """Test that the CSV export has a header and a row per meeting"""
+        buyer_id, seller_id = participants
+        created_ids = {m.id for m in create_meetings(buyer_id, seller_id, 3)}
+
+        response = client.get('/api/meetings/export?format=csv', headers=auth_headers(admin_token))
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        assert created_ids <= {int(row['id']) for row in rows}
+        assert {row['buyer_username'] for row in rows if int(row['id']) in created_ids} == {'test_buyer'}
+
+    def test_export_requires_admin(self, client, buyer_token, auth_headers):
+        """Test that buyers cannot export meetings"""
+        response = client.get('/api/meetings/export', headers=auth_headers(buyer_token))
+
+        assert response.status_code == 403
@@ -0,0 +1,87 @@
+"""
+Seller directory API tests
+"""
+import pytest
+from app.models import db, User, UserRole, SellerProfile
+
+
+@pytest.mark.seller
+class TestSellerDirectory:
+    """Test filtering and keyset pagination of GET /api/sellers"""
+
+    @pytest.fixture
+    def directory_sellers(self, app):
+        """Create a handful of sellers with profiles; remove them afterwards."""
+        seller_ids = []
+        for i in range(5):
+            user = User(
+                username=f'dir_seller_{i}',
+                email=f'dir_seller_{i}@test.com',
+                password='seller123',
+                role=UserRole.SELLER,
+                business_name=f'Directory Stay {i}'
+            )
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(SellerProfile(
+                user_id=user.id,
+                business_name=f'Directory Stay {i}',
+                seller_type='Homestay' if i % 2 == 0 else 'Resort',
+                target_market='Domestic'
+            ))
+            seller_ids.append(user.id)
+        db.session.commit()
+
+        yield seller_ids
+
+        SellerProfile.query.filter(SellerProfile.user_id.in_(seller_ids)).delete(synchronize_session=False)
+        User.query.filter(User.id.in_(seller_ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+    def test_keyset_pagination_walks_all_pages(self, client, buyer_token, auth_headers, directory_sellers):
+        """Test that following next_cursor returns every matching seller exactly once"""
+        seen = []
+        cursor = None
+        while True:
+            url = '/api/sellers?name=directory%20stay&limit=2'
+            if cursor:
+                url += f'&cursor={cursor}'
+            response = client.get(url, headers=auth_headers(buyer_token))
+            assert response.status_code == 200
+            data = response.get_json()
+            assert len(data['sellers']) <= 2
+            seen.extend(s['user_id'] for s in data['sellers'])
+            cursor = data['pagination']['next_cursor']
+            if not data['pagination']['has_next']:
+                assert cursor is None
+                break
+
+        assert sorted(seen) == sorted(directory_sellers)
+
+    def test_filters_are_applied(self, client, buyer_token, auth_headers, directory_sellers):
+        """Test seller_type and target_market filters"""
+        response = client.get('/api/sellers?name=Directory&seller_type=Homestay&target_market=Domestic',
+                              headers=auth_headers(buyer_token))
+
+        assert response.status_code == 200
+        sellers = response.get_json()['sellers']
+        assert {s['user_id'] for s in sellers} == set(directory_sellers[0::2])
+        assert all(s['seller_type'] == 'Homestay' for s in sellers)
+
+    def test_limit_is_validated_and_clamped(self, client, buyer_token, auth_headers, directory_sellers):
+        """Test that limit below 1 is refused and limits above the maximum are clamped"""
+        response = client.get('/api/sellers?limit=0', headers=auth_headers(buyer_token))
+        assert response.status_code == 400
+
+        response = client.get('/api/sellers?name=Directory&limit=500', headers=auth_headers(buyer_token))
+        assert response.status_code == 200
+        assert response.get_json()['pagination']['limit'] == 100
+
+    def test_without_limit_or_cursor_every_seller_is_returned(self, client, buyer_token, auth_headers, directory_sellers):
+        """Test that callers that do not page get the whole filtered directory"""
+        response = client.get('/api/sellers?name=Directory', headers=auth_headers(buyer_token))
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [s['user_id'] for s in data['sellers']] == directory_sellers
+        assert 'pagination' not in data
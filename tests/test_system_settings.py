@@ -0,0 +1,71 @@
+"""
+System settings cache tests
+"""
+import pytest
+from app.models import db, SystemSetting
+from app.utils.system_settings import SettingsCache, get_setting, get_int_setting, invalidate_settings
+
+
+@pytest.fixture
+def setting_keys(app):
+    """Collect setting keys created during a test; they are removed afterwards."""
+    keys = []
+    yield keys
+    db.session.rollback()
+    SystemSetting.query.filter(SystemSetting.key.in_(keys)).delete(synchronize_session=False)
+    db.session.commit()
+    invalidate_settings()
+
+
+@pytest.mark.system
+class TestSystemSettingsCache:
+    """Test the process-level system settings cache"""
+
+    def test_reads_are_served_from_memory(self, app, setting_keys, query_counter):
+        """Test that settings are loaded in one query and then cached"""
+        setting_keys.append('test_cache_limit')
+        db.session.add(SystemSetting(key='test_cache_limit', value='42'))
+        db.session.commit()
+        invalidate_settings()
+
+        with query_counter() as first_read:
+            assert get_int_setting('test_cache_limit') == 42
+        with query_counter() as later_reads:
+            for _ in range(10):
+                assert get_int_setting('test_cache_limit') == 42
+                assert get_setting('test_cache_missing', 'fallback') == 'fallback'
+
+        assert len(first_read) == 1
+        assert later_reads == []
+
+    def test_put_settings_invalidates_cache(self, client, admin_token, auth_headers, setting_keys):
+        setting_keys.append('test_cache_value')
+        assert get_setting('test_cache_value') is None
+
+        response = client.put('/api/system/settings', json={'test_cache_value': 'updated'},
+                              headers=auth_headers(admin_token))
+
+        assert response.status_code == 200
+        assert get_setting('test_cache_value') == 'updated'
+
+    def test_changes_from_other_workers_are_picked_up(self, app, setting_keys):
+        """Test that another process's write is noticed at the next version check"""
+        other_worker = SettingsCache(check_interval=0)
+        this_worker = SettingsCache(check_interval=3600)
+        assert 'test_cache_shared' not in other_worker.values()
+        assert 'test_cache_shared' not in this_worker.values()
+
+        setting_keys.append('test_cache_shared')
+        db.session.add(SystemSetting(key='test_cache_shared', value='on'))
+        db.session.commit()
+
+        assert other_worker.values()['test_cache_shared'] == 'on'
+        assert 'test_cache_shared' not in this_worker.values()
+
+    def test_meeting_metadata_defaults(self, client, buyer_token, auth_headers):
+        response = client.get('/api/system/meeting-metadata', headers=auth_headers(buyer_token))
+
+        assert response.status_code == 200
+        metadata = response.get_json()['metadata']
+        assert set(metadata) >= {'meeting_duration', 'meeting_interval', 'day_start_time', 'day_end_time',
+                                 'meeting_breaks', 'max_seller_attendees_per_day', 'max_buyer_meetings_per_day'}
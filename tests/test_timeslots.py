@@ -0,0 +1,154 @@
+"""
+Time slot generation API tests
+"""
+import pytest
+from datetime import datetime, timedelta
+from app.models import db, User, TimeSlot
+from app.utils.slot_planner import get_schedule_template, regenerate_slots
+from app.utils.system_settings import MEETING_METADATA_DEFAULTS
+
+
+def slots_per_day():
+    return len(get_schedule_template().slots)
+
+
+def future_date(days):
+    return (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+@pytest.fixture
+def seller_id(app):
+    """The test seller; slots created from day 30 onwards are removed afterwards."""
+    seller_id = User.query.filter_by(username='test_seller').first().id
+    yield seller_id
+    db.session.rollback()
+    TimeSlot.query.filter(
+        TimeSlot.user_id == seller_id,
+        TimeSlot.start_time >= datetime.strptime(future_date(30), '%Y-%m-%d'),
+        TimeSlot.meeting_id.is_(None)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+@pytest.mark.timeslots
+class TestTimeSlotGeneration:
+    """Test set-based time slot generation"""
+
+    def test_create_is_idempotent(self, client, seller_token, auth_headers, seller_id):
+        """Test that creating the same range twice only creates slots once"""
+        payload = {'start_date': future_date(30), 'end_date': future_date(32)}
+
+        response = client.post('/api/timeslots', json=payload, headers=auth_headers(seller_token))
+        assert response.status_code == 201
+        assert response.get_json()['created_slots'] == 3 * slots_per_day()
+
+        response = client.post('/api/timeslots', json=payload, headers=auth_headers(seller_token))
+        assert response.status_code == 201
+        assert response.get_json()['created_slots'] == 0
+
+        slots = TimeSlot.query.filter(
+            TimeSlot.user_id == seller_id,
+            TimeSlot.start_time >= datetime.strptime(future_date(30), '%Y-%m-%d')
+        ).order_by(TimeSlot.start_time).all()
+        assert len(slots) == 3 * slots_per_day()
+
+    def test_existing_slots_are_kept(self, client, seller_token, auth_headers, seller_id):
+        """Test that only missing slots are added to a partly filled day"""
+        day = datetime.strptime(future_date(30), '%Y-%m-%d')
+        first_start, first_end = get_schedule_template().slots_for_day(day.date())[0]
+        db.session.add(TimeSlot(user_id=seller_id, start_time=first_start, end_time=first_end, is_available=False))
+        db.session.commit()
+
+        response = client.post('/api/timeslots', json={'start_date': future_date(30), 'end_date': future_date(30)},
+                               headers=auth_headers(seller_token))
+
+        assert response.status_code == 201
+        assert response.get_json()['created_slots'] == slots_per_day() - 1
+        existing = TimeSlot.query.filter_by(user_id=seller_id, start_time=first_start).one()
+        assert existing.is_available is False
+
+    def test_query_count_does_not_grow_with_range(self, client, seller_token, auth_headers, seller_id,
+                                                   query_counter):
+        """Test that generating more days does not issue more statements"""
+        with query_counter() as one_day_queries:
+            client.post('/api/timeslots', json={'start_date': future_date(30), 'end_date': future_date(30)},
+                        headers=auth_headers(seller_token))
+        with query_counter() as many_days_queries:
+            client.post('/api/timeslots', json={'start_date': future_date(31), 'end_date': future_date(35)},
+                        headers=auth_headers(seller_token))
+
+        assert len(many_days_queries) == len(one_day_queries)
+
+    def test_admin_bulk_create(self, client, admin_token, auth_headers, seller_id):
+        """Test that admins can generate slots for several sellers"""
+        payload = {'start_date': future_date(30), 'end_date': future_date(30), 'seller_ids': [seller_id]}
+
+        response = client.post('/api/timeslots/bulk-create', json=payload, headers=auth_headers(admin_token))
+
+        assert response.status_code == 201
+        data = response.get_json()
+        assert data['created_slots'] == slots_per_day()
+        assert data['created_slots_by_seller'] == {str(seller_id): slots_per_day()}
+
+    def test_bulk_create_rejects_invalid_seller_ids(self, client, admin_token, auth_headers):
+        for seller_ids in ('all', [1, 'two']):
+            response = client.post('/api/timeslots/bulk-create',
+                                   json={'start_date': future_date(30), 'end_date': future_date(30), 'seller_ids': seller_ids},
+                                   headers=auth_headers(admin_token))
+            assert response.status_code == 400
+
+    def test_bulk_create_requires_admin(self, client, seller_token, auth_headers):
+        response = client.post('/api/timeslots/bulk-create',
+                               json={'start_date': future_date(30), 'end_date': future_date(30)},
+                               headers=auth_headers(seller_token))
+
+        assert response.status_code == 403
+
+
+@pytest.mark.timeslots
+class TestSchedulePlanning:
+    """Test slot planning from the meeting metadata settings"""
+
+    def test_template_follows_meeting_metadata(self):
+        """Test duration, interval, day bounds and breaks"""
+        metadata = dict(MEETING_METADATA_DEFAULTS, meeting_duration=20, meeting_interval=10,
+                        day_start_time='9:00 AM', day_end_time='12:00 PM',
+                        meeting_breaks=[{'id': 1, 'label': 'Tea', 'startTime': '10:00 AM', 'endTime': '10:30 AM'}])
+
+        template = get_schedule_template(metadata)
+
+        day = datetime(2030, 1, 1)
+        starts = [start.strftime('%H:%M') for start, _ in template.slots_for_day(day.date())]
+        assert starts == ['09:00', '09:30', '10:30', '11:00', '11:30']
+        assert all(end - start == timedelta(minutes=20) for start, end in template.slots_for_day(day.date()))
+
+    def test_template_is_compiled_once_per_settings_version(self):
+        metadata = dict(MEETING_METADATA_DEFAULTS)
+
+        assert get_schedule_template(metadata) is get_schedule_template(dict(metadata))
+        assert get_schedule_template(metadata) is not get_schedule_template(dict(metadata, meeting_interval=0))
+
+    def test_regenerate_replaces_free_slots_and_keeps_booked(self, app, seller_id):
+        """Test that regenerating after a settings change only rewrites free slots"""
+        start = end = datetime.strptime(future_date(30), '%Y-%m-%d')
+        old_template = get_schedule_template(dict(MEETING_METADATA_DEFAULTS, meeting_duration=15, meeting_interval=0))
+        new_template = get_schedule_template(dict(MEETING_METADATA_DEFAULTS, meeting_duration=30, meeting_interval=0))
+
+        regenerate_slots([seller_id], start, end, old_template)
+        booked = TimeSlot.query.filter_by(user_id=seller_id, start_time=start.replace(hour=9, minute=15)).one()
+        booked.is_available = False
+        db.session.commit()
+
+        created, deleted = regenerate_slots([seller_id], start, end, new_template)
+        db.session.commit()
+
+        slots = TimeSlot.query.filter(
+            TimeSlot.user_id == seller_id,
+            TimeSlot.start_time >= start,
+            TimeSlot.start_time < start + timedelta(days=1)
+        ).all()
+        free = sorted((s.start_time, s.end_time) for s in slots if s.is_available)
+        assert deleted == len(old_template.slots) - 1
+        assert free == sorted(new_template.slots_for_day(start.date()))
+        assert created[seller_id] == len(new_template.slots)
+        assert any(s.id == booked.id and not s.is_available for s in slots)
@@ -0,0 +1,71 @@
+"""
+Token blocklist tests
+"""
+import time
+import uuid
+import pytest
+from datetime import datetime, timedelta
+from app.models import db, RevokedToken
+from app.utils.token_blocklist import DatabaseTokenBlocklist
+
+
+@pytest.fixture
+def revoked_jtis(app):
+    """Collect jtis revoked during a test; their rows are removed afterwards."""
+    jtis = []
+    yield jtis
+    db.session.rollback()
+    RevokedToken.query.filter(RevokedToken.jti.in_(jtis)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+@pytest.mark.auth
+class TestTokenBlocklist:
+    """Test the database-backed token blocklist"""
+
+    def test_revocation_is_shared_between_workers(self, app, revoked_jtis):
+        """Test that a token revoked by one worker is rejected by another after a sync"""
+        first_worker = DatabaseTokenBlocklist(sync_interval=0)
+        second_worker = DatabaseTokenBlocklist(sync_interval=0)
+        jti = str(uuid.uuid4())
+        revoked_jtis.append(jti)
+
+        assert not second_worker.is_revoked(jti)
+
+        first_worker.revoke(jti, time.time() + 3600)
+
+        assert first_worker.is_revoked(jti)
+        assert second_worker.is_revoked(jti)
+
+    def test_lookups_between_syncs_do_not_query(self, app, revoked_jtis, query_counter):
+        """Test that checking tokens between syncs is served from memory"""
+        blocklist = DatabaseTokenBlocklist(sync_interval=3600)
+        blocklist.sync()
+
+        with query_counter() as queries:
+            for _ in range(10):
+                assert not blocklist.is_revoked(str(uuid.uuid4()))
+
+        assert queries == []
+
+    def test_expired_tokens_are_evicted(self, app, revoked_jtis):
+        """Test that expired revocations are dropped from memory and the table"""
+        blocklist = DatabaseTokenBlocklist(sync_interval=0)
+        expired_jti, live_jti = str(uuid.uuid4()), str(uuid.uuid4())
+        revoked_jtis.extend([expired_jti, live_jti])
+
+        db.session.add(RevokedToken(jti=expired_jti, expires_at=datetime.utcnow() - timedelta(minutes=1)))
+        db.session.commit()
+        blocklist.revoke(live_jti, time.time() + 3600)
+
+        assert not blocklist.is_revoked(expired_jti)
+        assert RevokedToken.query.get(expired_jti) is None
+        assert RevokedToken.query.get(live_jti) is not None
+
+    def test_logged_out_token_is_rejected(self, client, buyer_token, auth_headers):
+        """Test that a token cannot be used after logout"""
+        response = client.post('/api/auth/logout', headers=auth_headers(buyer_token))
+        assert response.status_code == 200
+
+        response = client.get('/api/auth/me', headers=auth_headers(buyer_token))
+        assert response.status_code == 401
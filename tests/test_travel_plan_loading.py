@@ -0,0 +1,133 @@
+"""
+Travel plan serialization tests
+"""
+import uuid
+from datetime import datetime, date
+import pytest
+from app.models import (
+    db, User, UserRole, BuyerProfile, TravelPlan, Transportation, Accommodation,
+    GroundTransportation, HostProperty, TransportType
+)
+
+
+@pytest.fixture
+def logistics(app):
+    """A host property and a vehicle type; buyers created with make_buyers are removed afterwards."""
+    run = uuid.uuid4().hex[:8]
+    host_property = HostProperty(property_name=f'Test Homestay {run}', rooms_allotted=20)
+    vehicle = TransportType(transport_type=f'Test Van {run}', capacity=8)
+    db.session.add_all([host_property, vehicle])
+    db.session.commit()
+    property_id, vehicle_id = host_property.property_id, vehicle.transport_type_id
+    buyer_ids = []
+
+    def make_buyers(count):
+        for i in range(count):
+            user = User(username=f'itinerary_{run}_{len(buyer_ids)}', email=f'itinerary-{run}-{len(buyer_ids)}@example.com',
+                        password='buyer123', role=UserRole.BUYER)
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(BuyerProfile(user_id=user.id, name=f'Buyer {i}', organization='Test Travels'))
+            plan = TravelPlan(user_id=user.id, event_name='Splash', event_start_date=date(2030, 7, 11),
+                              event_end_date=date(2030, 7, 13), venue='Wayanad', status='Planned')
+            plan.transportation = Transportation(
+                type='flight', outbound_carrier='AI', outbound_number='101',
+                outbound_departure_location='DEL', outbound_departure_datetime=datetime(2030, 7, 10, 8),
+                outbound_arrival_location='CCJ', outbound_arrival_datetime=datetime(2030, 7, 10, 11),
+                outbound_booking_reference='OUT1', return_carrier='AI', return_number='102',
+                return_departure_location='CCJ', return_departure_datetime=datetime(2030, 7, 14, 8),
+                return_arrival_location='DEL', return_arrival_datetime=datetime(2030, 7, 14, 11),
+                return_booking_reference='RET1'
+            )
+            plan.accommodation = Accommodation(
+                check_in_datetime=datetime(2030, 7, 10, 14), check_out_datetime=datetime(2030, 7, 14, 10),
+                room_type='Double', booking_reference='ACC1', host_property_id=property_id,
+                buyer_id=user.id
+            )
+            plan.ground_transportation = GroundTransportation(
+                pickup_location='CCJ', pickup_datetime=datetime(2030, 7, 10, 11, 30), pickup_vehicle_type=vehicle_id,
+                dropoff_location='CCJ', dropoff_datetime=datetime(2030, 7, 14, 6), dropoff_vehicle_type=vehicle_id
+            )
+            db.session.add(plan)
+            buyer_ids.append(user.id)
+        db.session.commit()
+        return list(buyer_ids)
+
+    yield make_buyers
+
+    db.session.rollback()
+    plan_ids = [plan.id for plan in TravelPlan.query.filter(TravelPlan.user_id.in_(buyer_ids))]
+    for model in (Transportation, Accommodation, GroundTransportation):
+        model.query.filter(model.travel_plan_id.in_(plan_ids)).delete(synchronize_session=False)
+    TravelPlan.query.filter(TravelPlan.id.in_(plan_ids)).delete(synchronize_session=False)
+    BuyerProfile.query.filter(BuyerProfile.user_id.in_(buyer_ids)).delete(synchronize_session=False)
+    User.query.filter(User.id.in_(buyer_ids)).delete(synchronize_session=False)
+    HostProperty.query.filter_by(property_id=property_id).delete()
+    TransportType.query.filter_by(transport_type_id=vehicle_id).delete()
+    db.session.commit()
+
+
+@pytest.mark.buyer
+class TestTravelPlanSerialization:
+    """Test eager loading of travel itineraries"""
+
+    def test_itineraries_match_to_dict(self, app, logistics):
+        """Test that eager-loaded plans serialize exactly like lazily loaded ones"""
+        buyer_ids = logistics(2)
+
+        db.session.expunge_all()
+        expected = [plan.to_dict() for plan in TravelPlan.query.filter(TravelPlan.user_id.in_(buyer_ids))
+                    .order_by(TravelPlan.user_id)]
+
+        db.session.expunge_all()
+        assert [plan.to_dict() for plan in TravelPlan.itineraries(buyer_ids)] == expected
+        assert expected[0]['ground_transportation']['pickup']['vehicle_type'] is not None
+        assert expected[0]['accommodation']['buyer']['name'] == 'Buyer 0'
+
+    def test_itineraries_use_fixed_query_count(self, app, logistics, query_counter):
+        """Test that loading and serializing more itineraries does not issue more queries"""
+        buyer_ids = logistics(2)
+        db.session.expunge_all()
+        with query_counter() as few_plans_queries:
+            [plan.to_dict() for plan in TravelPlan.itineraries(buyer_ids)]
+
+        buyer_ids = logistics(8)
+        db.session.expunge_all()
+        with query_counter() as many_plans_queries:
+            plans = [plan.to_dict() for plan in TravelPlan.itineraries(buyer_ids)]
+
+        assert len(plans) == 10
+        assert len(few_plans_queries) == len(many_plans_queries) == 2
+
+    def test_buyer_travel_plans_endpoint(self, client, buyer_token, auth_headers, query_counter):
+        """Test that a buyer's itinerary is loaded by a single plan query"""
+        client.get('/api/buyer/travel-plans', headers=auth_headers(buyer_token))
+        db.session.expunge_all()
+
+        with query_counter() as statements:
+            response = client.get('/api/buyer/travel-plans', headers=auth_headers(buyer_token))
+
+        assert response.status_code == 200
+        assert len(response.get_json()['travel_plans']) >= 1
+        assert sum('FROM travel_plans' in statement for statement in statements) == 1
+        assert not any(statement.lstrip().startswith('SELECT') and 'FROM transportation' in statement
+                       and 'travel_plans' not in statement for statement in statements)
+
+    def test_admin_travel_plans_use_fixed_query_count(self, client, admin_token, auth_headers,
+                                                      logistics, query_counter):
+        """Test that GET /api/admin/travel-plans does not lazy-load per plan"""
+        logistics(2)
+        db.session.expunge_all()
+        with query_counter() as few_plans_queries:
+            response = client.get('/api/admin/travel-plans', headers=auth_headers(admin_token))
+        assert response.status_code == 200
+
+        logistics(6)
+        db.session.expunge_all()
+        with query_counter() as many_plans_queries:
+            response = client.get('/api/admin/travel-plans', headers=auth_headers(admin_token))
+        assert response.status_code == 200
+
+        plans = response.get_json()['travel_plans']
+        assert len(many_plans_queries) == len(few_plans_queries)
+        assert any(plan['buyer']['name'] == 'Buyer 5' for plan in plans)